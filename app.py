@@ -24,6 +24,7 @@ import pygame.display
 import pygame.time
 import pygame.event
 
+import quality
 import screen
 
 # so we can have a centered window
@@ -36,6 +37,21 @@ class AppState(object):
     DISPLAY_HEIGHT = 600
     FRAMERATE = 60
     WINDOWED = True
+    # the game is drawn at this fraction of the display
+    # size and stretched to fit, or at RENDER_RESOLUTION
+    # if it is given as (width, height). The display's
+    # shape is kept, so a RENDER_RESOLUTION of another
+    # shape is only met along the side it is smaller on.
+    RENDER_SCALE = 1.0
+    RENDER_RESOLUTION = None
+    # seconds drawing the game may take each frame; if
+    # set, the scale drops below the one above when
+    # drawing takes longer, e.g. 0.5/FRAMERATE
+    RENDER_BUDGET = None
+    # a quality.Governor cuts back on looks and collision
+    # substeps when frames take longer than this
+    QUALITY_GOVERNOR = True
+    QUALITY_BUDGET = 1.0/FRAMERATE
 
     # state vars
     display = None
@@ -48,6 +64,8 @@ class AppState(object):
     # previous frame's time taken in seconds   
     frametime = 1.0/FRAMERATE
     
+    governor = None
+    
 
     def setup_display(self):
         '''
@@ -69,6 +87,30 @@ class AppState(object):
         self.clock = pygame.time.Clock()
 
     
+    def get_render_scale(self):
+        '''
+        fraction of the display size the game
+        is drawn at; the same for width and height,
+        so the smaller ratio of RENDER_RESOLUTION
+        to the display size is used
+        '''
+        if self.RENDER_RESOLUTION != None:
+            width, height = self.RENDER_RESOLUTION
+            return min(float(width)/self.DISPLAY_WIDTH, float(height)/self.DISPLAY_HEIGHT)
+        return self.RENDER_SCALE
+    
+    def get_render_budget(self):
+        return self.RENDER_BUDGET
+    
+    def get_quality_level(self):
+        '''
+        the governor's quality level, or the
+        best without one
+        '''
+        if self.governor == None:
+            return 0
+        return self.governor.get_level()
+    
     def set_frametime(self,milliseconds):
         '''
         store frametime in correct units
@@ -150,6 +192,12 @@ class AppState(object):
             millis =  self.clock.tick(self.FRAMERATE) # limit app speed
             self.set_frametime(millis) 
             
+            # the time the frame took without the wait
+            # for the frame rate
+            governor = self.governor
+            if governor != None and governor.update(self.clock.get_rawtime()/1000.0) == True:
+                screen.set_quality_level(governor.get_level())
+            
             screen = self.get_open_screen()
             if screen == None:
                 self.active = False
@@ -161,6 +209,8 @@ class AppState(object):
         '''
         pygame.init()
         self.setup_display()
+        if self.QUALITY_GOVERNOR == True:
+            self.governor = quality.Governor(self.QUALITY_BUDGET)
         
         titleScreen = screen.TitleScreen(self.DISPLAY_WIDTH, self.DISPLAY_HEIGHT, self, self.display)
         titleScreen.activate()
@@ -0,0 +1,222 @@
+#
+# autopilot.py - play the game without a player
+#
+# Space Travel
+#     Copyright (C) 2014  Eric Eveleigh
+#
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU General Public License as published by
+#     the Free Software Foundation, either version 3 of the License, or
+#     (at your option) any later version.
+#
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU General Public License for more details.
+#
+#     You should have received a copy of the GNU General Public License
+#     along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+# imports
+import math
+import random
+
+import pygame
+
+# the game modules load images and sounds when imported,
+# so headless.init() or the display has to be set up
+# before autopilot is imported
+import entity
+
+# the keys an Autopilot plays with
+AUTOPILOT_THRUST = pygame.K_w
+AUTOPILOT_LEFT = pygame.K_a
+AUTOPILOT_RIGHT = pygame.K_d
+AUTOPILOT_FIRE = pygame.K_SPACE
+AUTOPILOT_KEYS = (AUTOPILOT_THRUST, AUTOPILOT_LEFT, AUTOPILOT_RIGHT, AUTOPILOT_FIRE)
+
+class Autopilot(object):
+    '''
+    Plays a Game through key_down and key_up like
+    a player would. Each Autopilot has a random.Random
+    of its own, so it never changes the random
+    numbers the Game gets.
+    '''
+    def __init__(self, seed):
+        self.random = random.Random(seed)
+        # keys being held down
+        self.held = set()
+
+    def choose_keys(self, game_, frametime):
+        '''
+        the set of keys to hold down for the
+        next update of game_
+        '''
+        return self.held
+
+    def update(self, game_, frametime):
+        '''
+        press and release keys before game_
+        is updated with frametime
+        '''
+        keys = self.choose_keys(game_, frametime)
+        # in key order, so a run only depends on the seed
+        for key in sorted(self.held - keys):
+            game_.key_up(key)
+        for key in sorted(keys - self.held):
+            game_.key_down(key)
+        self.held = set(keys)
+
+# how many times a second a RandomAutopilot
+# presses or releases a key, on average
+RANDOM_KEY_RATE = 5.0
+
+class RandomAutopilot(Autopilot):
+    '''
+    Mashes the keys
+    '''
+    def choose_keys(self, game_, frametime):
+        keys = set(self.held)
+        if self.random.random() < RANDOM_KEY_RATE*frametime:
+            key = self.random.choice(AUTOPILOT_KEYS)
+            if key in keys:
+                keys.remove(key)
+            else:
+                keys.add(key)
+        return keys
+
+# how long a RandomWalkAutopilot keeps the same
+# keys held, on average, in seconds
+WALK_MEAN_HOLD = 0.5
+
+class RandomWalkAutopilot(Autopilot):
+    '''
+    Holds a random set of keys for a random
+    time, then picks another
+    '''
+    def __init__(self, seed):
+        Autopilot.__init__(self, seed)
+        self.hold_time = 0.0
+        
+    def choose_keys(self, game_, frametime):
+        self.hold_time -= frametime
+        if self.hold_time > 0.0:
+            return self.held
+        self.hold_time = self.random.expovariate(1.0/WALK_MEAN_HOLD)
+        return set([key for key in AUTOPILOT_KEYS if self.random.random() < 0.5])
+
+def angle_to(player, x, y):
+    '''
+    how far player has to turn to face the point
+    x, y; positive is clockwise, like turning right
+    '''
+    angle = math.atan2(y - player.position.y, x - player.position.x) - player.orientation
+    return math.atan2(math.sin(angle), math.cos(angle))
+
+def turn_keys(angle, tolerance):
+    '''
+    the key that turns through angle, if it
+    is more than tolerance
+    '''
+    if angle > tolerance:
+        return set([AUTOPILOT_RIGHT])
+    elif angle < -tolerance:
+        return set([AUTOPILOT_LEFT])
+    return set()
+
+def find_nearest(game_, kind, x, y):
+    '''
+    the Entity of class kind in game_
+    nearest to x, y, or None
+    '''
+    nearest = None
+    nearest_distance = 0.0
+    for ent in game_.entity_list:
+        if isinstance(ent, kind) == False:
+            continue
+        distance = (ent.position.x - x)**2 + (ent.position.y - y)**2
+        if nearest == None or distance < nearest_distance:
+            nearest = ent
+            nearest_distance = distance
+    return nearest
+
+# AimAutopilots turn until within AIM_TOLERANCE radians of
+# the nearest Asteroid, fire when within AIM_FIRE_ANGLE and
+# fly towards it when it is more than AIM_RANGE away
+AIM_TOLERANCE = 0.08
+AIM_FIRE_ANGLE = 0.25
+AIM_RANGE = 350.0
+
+class AimAutopilot(Autopilot):
+    '''
+    Turns to the nearest Asteroid and shoots it.
+    With nothing to shoot it wanders like a
+    RandomWalkAutopilot.
+    '''
+    def __init__(self, seed):
+        Autopilot.__init__(self, seed)
+        self.walk = RandomWalkAutopilot(self.random.getrandbits(32))
+    
+    def choose_keys(self, game_, frametime):
+        player = game_.player
+        target = find_nearest(game_, entity.Asteroid, player.position.x, player.position.y)
+        if target == None:
+            self.walk.held = self.held
+            return self.walk.choose_keys(game_, frametime)
+        
+        # lead the target by how long a shot takes to get there
+        dx = target.position.x - player.position.x
+        dy = target.position.y - player.position.y
+        distance = math.sqrt(dx*dx + dy*dy)
+        flight = distance/entity.PLAYER_SHOT_SPEED
+        angle = angle_to(player, target.position.x + target.velocity.x*flight,
+                         target.position.y + target.velocity.y*flight)
+        
+        keys = turn_keys(angle, AIM_TOLERANCE)
+        if math.fabs(angle) < AIM_FIRE_ANGLE:
+            keys.add(AUTOPILOT_FIRE)
+            if distance > AIM_RANGE:
+                keys.add(AUTOPILOT_THRUST)
+        return keys
+
+# DodgeAutopilots run from Holes closer than DODGE_RANGE,
+# thrusting once within DODGE_TOLERANCE radians of the
+# way out
+DODGE_RANGE = 200.0
+DODGE_TOLERANCE = 0.5
+
+class DodgeAutopilot(AimAutopilot):
+    '''
+    Flies away from the nearest Hole when it 
+    gets close, and otherwise fights like an
+    AimAutopilot
+    '''
+    def choose_keys(self, game_, frametime):
+        player = game_.player
+        x = player.position.x
+        y = player.position.y
+        hole = find_nearest(game_, entity.Hole, x, y)
+        if hole == None or (hole.position.x - x)**2 + (hole.position.y - y)**2 > DODGE_RANGE**2:
+            return AimAutopilot.choose_keys(self, game_, frametime)
+        
+        # face straight away from the Hole
+        angle = angle_to(player, 2*x - hole.position.x, 2*y - hole.position.y)
+        keys = turn_keys(angle, AIM_TOLERANCE)
+        if math.fabs(angle) < DODGE_TOLERANCE:
+            keys.add(AUTOPILOT_THRUST)
+        return keys
+
+# Autopilots by name
+autopilots = {'random': RandomAutopilot,
+              'walk': RandomWalkAutopilot,
+              'aim': AimAutopilot,
+              'dodge': DodgeAutopilot}
+
+def get_names():
+    return sorted(autopilots.keys())
+
+def create(name, seed):
+    '''
+    a new Autopilot of the kind called name
+    '''
+    return autopilots[name](seed)
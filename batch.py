@@ -0,0 +1,260 @@
+#
+# batch.py - play many games at once to tune the difficulty
+#
+# Space Travel
+#     Copyright (C) 2014  Eric Eveleigh
+#
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU General Public License as published by
+#     the Free Software Foundation, either version 3 of the License, or
+#     (at your option) any later version.
+#
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU General Public License for more details.
+#
+#     You should have received a copy of the GNU General Public License
+#     along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+# imports
+import csv
+import math
+import multiprocessing
+import optparse
+import sys
+import time
+
+import headless
+
+# every run is stepped with this frametime
+BATCH_FRAMETIME = 1.0/60
+# runs stop after this many frames if the game isn't over
+BATCH_MAX_FRAMES = 60*60*5
+BATCH_RUNS = 100
+
+BATCH_DIFFICULTIES = ('easy', 'medium', 'hard')
+BATCH_MODES = ('normal', 'endurance')
+# the names autopilot.create knows; autopilot is only
+# imported in the workers, so the parent stays free of pygame
+BATCH_AUTOPILOTS = ('random', 'walk', 'aim', 'dodge')
+
+# columns of the per-run and aggregated CSV
+RUN_FIELDS = ('difficulty', 'mode', 'autopilot', 'seed', 'frames', 'game_over',
+              'won', 'distance', 'points', 'regens_left', 'spawns_deferred',
+              'spawns_dropped', 'mean_frame_ms', 'max_frame_ms')
+SUMMARY_FIELDS = ('difficulty', 'mode', 'autopilot', 'runs', 'game_over', 'won',
+                  'mean_distance', 'min_distance', 'median_distance', 'max_distance',
+                  'mean_points', 'mean_frames', 'mean_frame_ms', 'p95_frame_ms',
+                  'max_frame_ms')
+
+class Run(object):
+    '''
+    What to play in one headless session
+    '''
+    def __init__(self, difficulty, mode, autopilot, seed, max_frames):
+        self.difficulty = difficulty
+        self.mode = mode
+        self.autopilot = autopilot
+        self.seed = seed
+        self.max_frames = max_frames
+
+class RunResult(object):
+    '''
+    How one session went
+    '''
+    def __init__(self, run):
+        self.run = run
+        self.frames = 0
+        self.game_over = False
+        self.won = False
+        self.distance = 0.0
+        self.points = 0
+        self.regens_left = 0
+        self.spawns_deferred = 0
+        self.spawns_dropped = 0
+        # seconds the Game.update calls took
+        self.total_frame_time = 0.0
+        self.max_frame_time = 0.0
+
+    def get_mean_frame_time(self):
+        if self.frames == 0:
+            return 0.0
+        return self.total_frame_time/self.frames
+
+    def get_row(self):
+        run = self.run
+        return (run.difficulty, run.mode, run.autopilot, run.seed, self.frames,
+                int(self.game_over), int(self.won), '%.2f' % self.distance,
+                self.points, self.regens_left,
+                self.spawns_deferred, self.spawns_dropped,
+                '%.4f' % (self.get_mean_frame_time()*1000),
+                '%.4f' % (self.max_frame_time*1000))
+
+def init_worker():
+    '''
+    Set up a worker process. Everything a run
+    touches is made in the worker, so workers
+    share nothing with each other or the parent.
+    '''
+    headless.init()
+
+def play(run):
+    '''
+    play one Run to the end or max_frames
+    and return its RunResult
+    '''
+    import autopilot
+    import game
+
+    difficulty = getattr(game, 'GAME_DIFF_' + run.difficulty.upper())
+    mode = getattr(game, 'GAME_MODE_' + run.mode.upper())
+    game_ = headless.create_game(difficulty, mode, run.seed)
+    pilot = autopilot.create(run.autopilot, run.seed)
+
+    result = RunResult(run)
+    while result.frames < run.max_frames and game_.game_over == False:
+        pilot.update(game_, BATCH_FRAMETIME)
+        start = time.time()
+        game_.update(BATCH_FRAMETIME)
+        frame_time = time.time() - start
+
+        result.total_frame_time += frame_time
+        if frame_time > result.max_frame_time:
+            result.max_frame_time = frame_time
+        result.frames += 1
+
+    result.game_over = game_.game_over
+    result.won = game_.game_over and game_.get_game_won()
+    result.distance = game_.distance_travelled
+    result.points = game_.player.get_points()
+    result.regens_left = game_.player.get_regens_left()
+    result.spawns_deferred = game_.get_spawns_deferred()
+    result.spawns_dropped = game_.get_spawns_dropped()
+    return result
+
+def percentile(values, fraction):
+    '''
+    value at fraction of the way through
+    the sorted values
+    '''
+    values = sorted(values)
+    index = int(math.ceil(fraction*len(values))) - 1
+    return values[min(max(index, 0), len(values) - 1)]
+
+def summarize(results):
+    '''
+    one SUMMARY_FIELDS row for each difficulty,
+    mode and autopilot played
+    '''
+    groups = {}
+    for result in results:
+        run = result.run
+        groups.setdefault((run.difficulty, run.mode, run.autopilot), []).append(result)
+
+    rows = []
+    for key in sorted(groups.keys()):
+        group = groups[key]
+        runs = len(group)
+        distances = [result.distance for result in group]
+        frame_times = [result.get_mean_frame_time() for result in group]
+        rows.append(key + (runs,
+                           sum([int(result.game_over) for result in group]),
+                           sum([int(result.won) for result in group]),
+                           '%.2f' % (sum(distances)/runs),
+                           '%.2f' % min(distances),
+                           '%.2f' % percentile(distances, 0.5),
+                           '%.2f' % max(distances),
+                           '%.2f' % (float(sum([result.points for result in group]))/runs),
+                           '%.1f' % (float(sum([result.frames for result in group]))/runs),
+                           '%.4f' % (sum(frame_times)/runs*1000),
+                           '%.4f' % (percentile(frame_times, 0.95)*1000),
+                           '%.4f' % (max([result.max_frame_time for result in group])*1000)))
+    return rows
+
+def write_csv(filename, fields, rows):
+    '''
+    write rows under a header of fields to
+    filename, or stdout for -
+    '''
+    if filename == '-':
+        out = sys.stdout
+    else:
+        out = open(filename, 'wb')
+    writer = csv.writer(out)
+    writer.writerow(fields)
+    writer.writerows(rows)
+    if out != sys.stdout:
+        out.close()
+
+def main(argv):
+    '''
+    play runs of every difficulty, mode and autopilot
+    asked for in a pool of processes and write the
+    aggregated results as CSV
+    '''
+    parser = optparse.OptionParser(usage="usage: batch.py [options]")
+    parser.add_option('-n', '--runs', type='int', default=BATCH_RUNS,
+                      help="runs of each difficulty, mode and autopilot [%default]")
+    parser.add_option('-j', '--jobs', type='int', default=multiprocessing.cpu_count(),
+                      help="worker processes [%default]")
+    parser.add_option('-d', '--difficulty', default=','.join(BATCH_DIFFICULTIES),
+                      help="difficulties to play [%default]")
+    parser.add_option('-m', '--mode', default=','.join(BATCH_MODES),
+                      help="game modes to play [%default]")
+    parser.add_option('-a', '--autopilot', default='dodge',
+                      help="autopilots to play with [%default]")
+    parser.add_option('-f', '--max-frames', type='int', default=BATCH_MAX_FRAMES,
+                      help="frames a run may last [%default]")
+    parser.add_option('-s', '--seed', type='int', default=1,
+                      help="seed of the first run; the others follow it [%default]")
+    parser.add_option('-o', '--output', default='-',
+                      help="aggregated CSV file [stdout]")
+    parser.add_option('-r', '--run-output', default=None,
+                      help="CSV file with a row for every run")
+    options, args = parser.parse_args(argv[1:])
+
+    difficulties = options.difficulty.split(',')
+    modes = options.mode.split(',')
+    pilots = options.autopilot.split(',')
+    for name, names, known in (('difficulty', difficulties, BATCH_DIFFICULTIES),
+                               ('mode', modes, BATCH_MODES),
+                               ('autopilot', pilots, BATCH_AUTOPILOTS)):
+        for value in names:
+            if value not in known:
+                parser.error("unknown %s %s" % (name, value))
+
+    # the same seeds for every difficulty, mode and
+    # autopilot, so they are compared on equal games
+    runs = []
+    for difficulty in difficulties:
+        for mode in modes:
+            for pilot in pilots:
+                for i in xrange(options.runs):
+                    runs.append(Run(difficulty, mode, pilot, options.seed + i, options.max_frames))
+
+    start = time.time()
+    workers = multiprocessing.Pool(options.jobs, init_worker)
+    try:
+        results = list(workers.imap_unordered(play, runs, max(1, len(runs)/(options.jobs*8))))
+        workers.close()
+    except:
+        workers.terminate()
+        raise
+    finally:
+        workers.join()
+    elapsed = time.time() - start
+
+    results.sort(key=lambda result: (result.run.difficulty, result.run.mode,
+                                     result.run.autopilot, result.run.seed))
+    if options.run_output != None:
+        write_csv(options.run_output, RUN_FIELDS, [result.get_row() for result in results])
+    write_csv(options.output, SUMMARY_FIELDS, summarize(results))
+
+    frames = sum([result.frames for result in results])
+    sys.stderr.write("%d runs, %d frames in %.1f s with %d processes\n" % (
+        len(results), frames, elapsed, options.jobs))
+    return 0
+
+if __name__=="__main__":
+    sys.exit(main(sys.argv))
@@ -0,0 +1,534 @@
+#
+# bench.py - time canned scenes and catch slowdowns
+#
+# Space Travel
+#     Copyright (C) 2014  Eric Eveleigh
+#
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU General Public License as published by
+#     the Free Software Foundation, either version 3 of the License, or
+#     (at your option) any later version.
+#
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU General Public License for more details.
+#
+#     You should have received a copy of the GNU General Public License
+#     along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+# imports
+import gc
+import json
+import math
+import optparse
+import platform
+import random
+import sys
+import time
+
+# before pygame, to keep its banner quiet
+import headless
+
+import pygame
+
+import render
+
+# every scene is stepped with this frametime
+BENCH_FRAMETIME = 1.0/60
+BENCH_SEED = 1
+BENCH_OUTPUT = 'bench.json'
+# version of the results file
+BENCH_RESULTS_VERSION = 1
+# percent slower a scene may get before compare fails
+BENCH_THRESHOLD = 10.0
+# phases quicker than this, in ms per call, are too
+# noisy to fail a compare with --phases
+BENCH_MIN_PHASE_MS = 0.05
+
+# asteroid_storm starts with a grid of asteroids on a
+# playfield big enough that they can spin without touching;
+# the row the Player starts in is left empty
+BENCH_STORM_ASTEROIDS = (25, 21)
+BENCH_STORM_SIZE = (2800, 2310)
+# hole_swarm places its holes and bodies in grids
+BENCH_SWARM_HOLES = (5, 2)
+BENCH_SWARM_BODIES = (20, 15)
+# explosion_swarm fills the playfield with a grid of
+# SpriteActors playing the explosion animation over
+# and over, drifting slowly
+BENCH_EXPLOSION_GRID = (20, 15)
+BENCH_EXPLOSION_SPEED = 10.0
+BENCH_HISCORES_ENTRIES = 10000
+
+class PhaseRecorder(object):
+    '''
+    Keeps the time and the allocations of every
+    phase marked, and of every frame.
+
+    Allocations are the net change in the garbage
+    collector's count of new container objects,
+    which is disabled while a scene runs so the
+    count isn't reset by a collection.
+    '''
+    def __init__(self):
+        # phase names in the order first marked
+        self.phases = []
+        self.calls = {}
+        self.times = {}
+        self.allocations = {}
+        self.frame_times = []
+        self.frame_allocations = 0
+
+        self.last_time = 0.0
+        self.last_count = 0
+        self.frame_start = 0.0
+
+    def start(self):
+        self.last_time = time.time()
+        self.last_count = gc.get_count()[0]
+
+    def mark(self, phase):
+        now = time.time()
+        count = gc.get_count()[0]
+        if phase not in self.calls:
+            self.phases.append(phase)
+            self.calls[phase] = 0
+            self.times[phase] = 0.0
+            self.allocations[phase] = 0
+        self.calls[phase] += 1
+        self.times[phase] += now - self.last_time
+        self.allocations[phase] += count - self.last_count
+        self.frame_allocations += count - self.last_count
+        self.last_time = now
+        self.last_count = count
+
+    def start_frame(self):
+        self.frame_start = time.time()
+        self.start()
+
+    def end_frame(self):
+        self.frame_times.append(time.time() - self.frame_start)
+
+    def get_results(self):
+        '''
+        the times in ms, as saved in a results file
+        '''
+        frames = len(self.frame_times)
+        frame_times = sorted(self.frame_times)
+        phases = {}
+        for phase in self.phases:
+            calls = self.calls[phase]
+            phases[phase] = {'calls': calls,
+                             'total_ms': self.times[phase]*1000,
+                             'mean_ms': self.times[phase]*1000/calls,
+                             'allocations': self.allocations[phase]}
+        return {'frames': frames,
+                'total_ms': sum(frame_times)*1000,
+                'mean_frame_ms': sum(frame_times)*1000/max(frames, 1),
+                'median_frame_ms': frame_times[frames/2]*1000 if frames > 0 else 0.0,
+                'p95_frame_ms': frame_times[int(frames*0.95)]*1000 if frames > 0 else 0.0,
+                'max_frame_ms': frame_times[-1]*1000 if frames > 0 else 0.0,
+                'allocations': self.frame_allocations,
+                'phase_order': list(self.phases),
+                'phases': phases}
+
+class Scene(object):
+    '''
+    Something to time for a number of frames.
+    Everything it does comes from its seed.
+    '''
+    frames = 600
+
+    def __init__(self, seed):
+        self.seed = seed
+        self.recorder = PhaseRecorder()
+
+    def build(self):
+        '''
+        set up the scene; not timed
+        '''
+        pass
+
+    def step(self, frame, frametime):
+        '''
+        run one frame, marking the phases
+        on self.recorder
+        '''
+        pass
+
+    def run(self, frames):
+        '''
+        build the scene and time frames of it
+        '''
+        self.build()
+
+        gc.collect()
+        gc.disable()
+        try:
+            for frame in xrange(frames):
+                self.recorder.start_frame()
+                self.step(frame, BENCH_FRAMETIME)
+                self.recorder.end_frame()
+        finally:
+            gc.enable()
+        return self.recorder.get_results()
+
+class GameScene(Scene):
+    '''
+    Times the phases of Game.tick and
+    drawing the Game, at scale
+    '''
+    size = (headless.DISPLAY_WIDTH, headless.DISPLAY_HEIGHT)
+    scale = 1.0
+
+    def build(self):
+        import game
+
+        width, height = self.size
+        self.game = headless.create_game(game.GAME_DIFF_MEDIUM, game.GAME_MODE_ENDURANCE,
+                                         self.seed, width, height)
+        self.game.set_phase_timer(self.recorder)
+        self.surface = pygame.Surface(self.size)
+        self.view = render.ScaledView(self.surface, self.scale)
+        self.populate(self.game)
+
+    def populate(self, game_):
+        '''
+        add the scene's Entitys to game_
+        '''
+        pass
+
+    def step(self, frame, frametime):
+        self.game.update(frametime)
+        self.game.draw_scene(self.view.get_surface(), self.view.get_scale())
+        self.view.present()
+        self.recorder.mark('draw_present')
+        self.game.draw_hud(self.surface)
+        self.recorder.mark('draw')
+
+class AsteroidStormScene(GameScene):
+    '''
+    A playfield full of spinning Asteroids. They
+    all fly left at the same speed and pass the
+    Player by, so the scene times checking them
+    rather than a pile-up.
+    '''
+    frames = 240
+    size = BENCH_STORM_SIZE
+
+    def populate(self, game_):
+        import entity
+        from vector import Vector2D
+
+        width, height = self.size
+        columns, rows = BENCH_STORM_ASTEROIDS
+        speed = (entity.ASTEROID_VELOCITY_MIN + entity.ASTEROID_VELOCITY_MAX)/2.0
+        spread = entity.ASTEROID_DIRECTION_SPREAD
+        for i in xrange(columns*rows):
+            if i/columns == rows/2:
+                continue
+            position = Vector2D((i%columns + 0.5)*width/columns, (i/columns + 0.5)*height/rows)
+            ang_velocity = game_.random_float(-spread, spread)
+            game_.add_entity(game_.asteroid_pool.acquire(entity.ASTEROID_HP, position,
+                                                         Vector2D(-speed, 0.0), 0.0, ang_velocity))
+
+class HoleSwarmScene(GameScene):
+    '''
+    Holes that stay put, among bodies
+    they all pull on
+    '''
+    frames = 300
+
+    def populate(self, game_):
+        import entity
+        from vector import Vector2D
+
+        width = headless.DISPLAY_WIDTH
+        height = headless.DISPLAY_HEIGHT
+
+        columns, rows = BENCH_SWARM_HOLES
+        for i in xrange(columns*rows):
+            position = Vector2D((i%columns + 0.5)*width/columns, (i/columns + 0.5)*height/rows)
+            game_.add_entity_bottom(entity.Hole(position, Vector2D(0, 0), 0.0, 0.0))
+
+        # the bodies are powerups; they don't collide with
+        # each other, so only the gravity is timed
+        columns, rows = BENCH_SWARM_BODIES
+        for i in xrange(columns*rows):
+            position = Vector2D((i%columns + 0.25)*width/columns, (i/columns + 0.25)*height/rows)
+            if i%2 == 0:
+                body = entity.ShieldPowerup(position, Vector2D(0, 0), 0.0, 0.0)
+            else:
+                body = entity.WeaponPowerup(position, Vector2D(0, 0), 0.0, 0.0)
+            game_.add_entity(body)
+
+class ShotSpamScene(GameScene):
+    '''
+    The Player upgraded until it shoots
+    every frame, spinning as it fires
+    '''
+    def populate(self, game_):
+        player = game_.player
+        while player.shot_time > BENCH_FRAMETIME:
+            player.increase_shot_frequency()
+        game_.update_weapon_display()
+
+        game_.key_down(pygame.K_d)
+        game_.key_down(pygame.K_SPACE)
+
+class ExplosionSwarmScene(GameScene):
+    '''
+    Explosions everywhere, which only
+    move and animate
+    '''
+    frames = 300
+
+    def populate(self, game_):
+        import entity
+        import particles
+        from vector import Vector2D
+
+        width = headless.DISPLAY_WIDTH
+        height = headless.DISPLAY_HEIGHT
+        columns, rows = BENCH_EXPLOSION_GRID
+        for i in xrange(columns*rows):
+            position = Vector2D((i%columns + 0.5)*width/columns, (i/columns + 0.5)*height/rows)
+            explosion = entity.SpriteActor(position, Vector2D(0.0, BENCH_EXPLOSION_SPEED),
+                                           game_.random_float(-math.pi, math.pi), 0.0)
+            for filename in particles.EXPLOSION_IMAGES:
+                explosion.load_frame(filename, particles.EXPLOSION_COLORKEY)
+            explosion.set_frame_time(particles.EXPLOSION_FRAME_TIME)
+            # loop for longer than the scene, starting
+            # at different frames
+            explosion.set_animation_loops(self.frames)
+            explosion.set_cur_frame(i%len(explosion.frames))
+            explosion.set_animate(True)
+            game_.add_actor(explosion)
+
+class HalfExplosionSwarmScene(ExplosionSwarmScene):
+    '''
+    explosion_swarm drawn at half size
+    and stretched
+    '''
+    scale = 0.5
+
+class HiscoresScene(Scene):
+    '''
+    The hiscores screen scrolling through
+    BENCH_HISCORES_ENTRIES scores; the
+    text is made on the first frame
+    '''
+    frames = 120
+
+    def build(self):
+        import screen
+
+        width = headless.DISPLAY_WIDTH
+        height = headless.DISPLAY_HEIGHT
+        self.surface = pygame.Surface((width, height))
+        self.screen = screen.HiscoresScreen(width, height, None, self.surface)
+
+        rand = random.Random(self.seed)
+        entries = []
+        for i in xrange(BENCH_HISCORES_ENTRIES):
+            name = ''.join([rand.choice('ABCDEFGHIJKLMNOPQRSTUVWXYZ') for j in xrange(rand.randint(3, 12))])
+            entries.append(screen.HiscoresScreen.ScoreEntry(name, rand.uniform(0.0, 4800.0),
+                                                            rand.randint(0, 100)*100))
+        self.screen.score_entries = entries
+        self.screen.scroll_pause_timer = 0.0
+        self.screen.set_scroll(True)
+
+    def step(self, frame, frametime):
+        if frame == 0:
+            self.screen.create_scores_text()
+            self.recorder.mark('text')
+        self.screen.update(frametime)
+        self.recorder.mark('update')
+        self.screen.draw()
+        self.recorder.mark('draw')
+
+# Scenes by name
+scenes = {'asteroid_storm': AsteroidStormScene,
+          'hole_swarm': HoleSwarmScene,
+          'shot_spam': ShotSpamScene,
+          'explosion_swarm': ExplosionSwarmScene,
+          'explosion_swarm_half': HalfExplosionSwarmScene,
+          'hiscores_10k': HiscoresScene}
+
+def get_names():
+    return sorted(scenes.keys())
+
+def run_scene(name, seed, frames=None):
+    '''
+    the results of running the scene called
+    name, for its own number of frames unless
+    frames is given
+    '''
+    scene = scenes[name](seed)
+    if frames == None:
+        frames = scene.frames
+    results = scene.run(frames)
+    results['seed'] = seed
+    return results
+
+def load_results(filename):
+    results = open(filename, 'r')
+    try:
+        return json.load(results)
+    finally:
+        results.close()
+
+def save_results(filename, results):
+    '''
+    write results to filename, or stdout for -
+    '''
+    if filename == '-':
+        out = sys.stdout
+    else:
+        out = open(filename, 'w')
+    json.dump(results, out, indent=2, sort_keys=True)
+    out.write('\n')
+    if out != sys.stdout:
+        out.close()
+
+def change(old, new):
+    '''
+    percent new is slower than old
+    '''
+    if old <= 0.0:
+        return 0.0
+    return (new - old)*100.0/old
+
+def compare(old, new, threshold, phases):
+    '''
+    print how each scene in both old and new
+    changed and return the slowdowns past
+    threshold percent
+    '''
+    regressions = []
+    for name in sorted(set(old['scenes'].keys()) ^ set(new['scenes'].keys())):
+        print "%-16s only in %s results" % (name, "old" if name in old['scenes'] else "new")
+    for name in sorted(set(old['scenes'].keys()) & set(new['scenes'].keys())):
+        old_scene = old['scenes'][name]
+        new_scene = new['scenes'][name]
+
+        slower = change(old_scene['mean_frame_ms'], new_scene['mean_frame_ms'])
+        failed = slower > threshold
+        if failed == True:
+            regressions.append(name)
+        print "%-16s %10.4f ms %10.4f ms %+8.1f%%%s" % (name, old_scene['mean_frame_ms'],
+                                                      new_scene['mean_frame_ms'], slower,
+                                                      "  SLOWER" if failed else "")
+
+        for phase in new_scene['phase_order']:
+            if phase not in old_scene['phases']:
+                continue
+            old_phase = old_scene['phases'][phase]
+            new_phase = new_scene['phases'][phase]
+            slower = change(old_phase['mean_ms'], new_phase['mean_ms'])
+            failed = (phases == True and slower > threshold and
+                      old_phase['mean_ms'] >= BENCH_MIN_PHASE_MS)
+            if failed == True:
+                regressions.append(name + '.' + phase)
+            print "  %-14s %10.4f ms %10.4f ms %+8.1f%% %+9d allocs%s" % (
+                phase, old_phase['mean_ms'], new_phase['mean_ms'], slower,
+                new_phase['allocations'] - old_phase['allocations'],
+                "  SLOWER" if failed else "")
+    return regressions
+
+def run_scenes(names, options):
+    '''
+    the results of running the scenes names
+    with the run command's options
+    '''
+    headless.init()
+
+    results = {'version': BENCH_RESULTS_VERSION,
+               'python': platform.python_version(),
+               'pygame': pygame.version.ver,
+               'platform': platform.platform(),
+               'frametime': BENCH_FRAMETIME,
+               'scenes': {}}
+    for name in names:
+        best = None
+        for i in xrange(max(options.repeat, 1)):
+            scene_results = run_scene(name, options.seed, options.frames)
+            if best == None or scene_results['mean_frame_ms'] < best['mean_frame_ms']:
+                best = scene_results
+        results['scenes'][name] = best
+        sys.stderr.write("%-22s %6d frames %10.4f ms/frame\n" % (
+            name, best['frames'], best['mean_frame_ms']))
+    return results
+
+def main(argv):
+    '''
+    bench.py run [options] [scene ...]
+        time scenes and save the results as JSON
+    bench.py compare [options] old.json new.json
+        exit with 1 if new is slower than old
+    bench.py list
+        show the scenes
+    '''
+    parser = optparse.OptionParser(usage="usage: bench.py run [options] [scene ...]\n"
+                                         "       bench.py compare [options] old.json new.json\n"
+                                         "       bench.py list")
+    parser.add_option('-s', '--seed', type='int', default=BENCH_SEED,
+                      help="seed of every scene [%default]")
+    parser.add_option('-f', '--frames', type='int', default=None,
+                      help="frames to run each scene for [each scene's own]")
+    parser.add_option('-r', '--repeat', type='int', default=1,
+                      help="run each scene this many times and keep the quickest [%default]")
+    parser.add_option('-o', '--output', default=BENCH_OUTPUT,
+                      help="results file, or - for stdout [%default]")
+    parser.add_option('-t', '--threshold', type='float', default=BENCH_THRESHOLD,
+                      help="percent slower that fails a compare [%default]")
+    parser.add_option('-p', '--phases', action='store_true', default=False,
+                      help="fail a compare on slower phases too")
+    options, args = parser.parse_args(argv[1:])
+
+    if len(args) == 0:
+        parser.error("no command given")
+    command = args[0]
+    args = args[1:]
+
+    if command == 'list':
+        for name in get_names():
+            print name, scenes[name].frames
+        return 0
+
+    elif command == 'compare':
+        if len(args) != 2:
+            parser.error("compare needs an old and a new results file")
+        regressions = compare(load_results(args[0]), load_results(args[1]),
+                              options.threshold, options.phases)
+        if len(regressions) > 0:
+            sys.stderr.write("%d slower than %.1f%%: %s\n" % (
+                len(regressions), options.threshold, ', '.join(regressions)))
+            return 1
+        return 0
+
+    elif command == 'run':
+        names = args
+        if len(names) == 0:
+            names = get_names()
+        for name in names:
+            if name not in scenes:
+                parser.error("unknown scene %s" % name)
+
+        # anything the scenes print goes to stderr
+        # when the results go to stdout
+        stdout = sys.stdout
+        if options.output == '-':
+            sys.stdout = sys.stderr
+        try:
+            results = run_scenes(names, options)
+        finally:
+            sys.stdout = stdout
+        save_results(options.output, results)
+        return 0
+
+    parser.error("unknown command %s" % command)
+
+if __name__=="__main__":
+    sys.exit(main(sys.argv))
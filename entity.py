@@ -20,23 +20,110 @@
 import math
 
 from physics import Object2D
+from physics import COLLIDE_NONE
+from physics import Circle, Capsule
 from vector import Vector2D
+import surfaces
 
 import pygame
 
-class Entity(Object2D):
+# sounds can be turned off for runs without a window
+sound_enabled = True
+
+def set_sound_enabled(enabled):
     '''
-    An movable, colidable, displayable object of form in
-    the Game.
+    turn playing of game sounds on or off
     '''
-    def __init__(self, hp, geometry, position, velocity, orientation, ang_velocity, mass):
-        Object2D.__init__(self, position, velocity, orientation, ang_velocity, mass)
-        
-        self.hp = hp
-        self.alive = True
-        self.set_geometry(geometry)
-        
-        # images to be displayed as the Entity
+    global sound_enabled
+    sound_enabled = enabled
+    
+def play_sound(sound):
+    '''
+    play sound if sounds are turned on
+    '''
+    if sound_enabled == True:
+        sound.play()
+
+# activity states of entities: only active ones
+# collide, the others just drift
+ACTIVITY_STAGING = 0 # not on the playfield yet
+ACTIVITY_ACTIVE = 1
+ACTIVITY_LEAVING = 2 # has left the playfield
+
+# collision categories of the entities
+COLLIDE_PLAYER = 1
+COLLIDE_SHOT = 2
+COLLIDE_ASTEROID = 4
+COLLIDE_HOLE = 8
+COLLIDE_POWERUP = 16
+COLLIDE_EFFECT = 32
+
+'''
+Which categories each category interacts with.
+Must agree with the collision handler table: pairs
+left out here never reach the narrow phase, so only
+leave out pairs where neither handler does anything
+and the collision is not resolved physically.
+'''
+COLLISION_MASKS = {
+    COLLIDE_PLAYER: COLLIDE_ASTEROID | COLLIDE_HOLE | COLLIDE_POWERUP,
+    COLLIDE_SHOT: COLLIDE_ASTEROID | COLLIDE_HOLE,
+    COLLIDE_ASTEROID: COLLIDE_PLAYER | COLLIDE_SHOT | COLLIDE_ASTEROID | COLLIDE_HOLE,
+    # holes consume everything
+    COLLIDE_HOLE: COLLIDE_PLAYER | COLLIDE_SHOT | COLLIDE_ASTEROID | COLLIDE_HOLE | COLLIDE_POWERUP,
+    COLLIDE_POWERUP: COLLIDE_PLAYER | COLLIDE_HOLE,
+    COLLIDE_EFFECT: COLLIDE_NONE,
+    }
+
+'''
+Collision handler table, keyed by (type hit, type
+hitting it). Entries are (handler, physical):
+handler(hit, by) is called if it is not None and
+physical says whether the collision is then resolved
+with impulses. Subclasses use the entry of their
+closest registered base classes.
+'''
+collision_handlers = {}
+# (type, type) pairs already looked up, including subclasses
+collision_dispatch = {}
+# used for pairs with no entry at all
+COLLISION_DEFAULT = (None, True)
+
+def register_collision(hit_type, by_type, handler, physical):
+    '''
+    set what happens when an object of hit_type
+    is hit by an object of by_type
+    '''
+    collision_handlers[(hit_type, by_type)] = (handler, physical)
+    collision_dispatch.clear()
+
+def get_collision_handler(hit_type, by_type):
+    '''
+    (handler, physical) entry for a collision
+    between objects of the given types
+    '''
+    key = (hit_type, by_type)
+    entry = collision_dispatch.get(key)
+    if entry == None:
+        entry = COLLISION_DEFAULT
+        for hit_base in hit_type.__mro__:
+            for by_base in by_type.__mro__:
+                if (hit_base, by_base) in collision_handlers:
+                    entry = collision_handlers[(hit_base, by_base)]
+                    break
+            else:
+                continue
+            break
+        collision_dispatch[key] = entry
+    return entry
+
+class Animated(object):
+    '''
+    Images shown one after another at the
+    position and orientation of an object
+    '''
+    def init_animation(self):
+        # images to be displayed as the object
         self.frames = []
         self.curframe = 0
         self.frame_time = 1.0
@@ -45,13 +132,35 @@ class Entity(Object2D):
         self.anim_num_loops = 0
         self.anim_loop_num = 0
         
+        # the last frame drawn, rotated, and the
+        # (frame, angle, scale) it was made for
+        self.sprite = None
+        self.sprite_offset = (0, 0)
+        self.sprite_key = None
+        
+    def reset_animation(self):
+        '''
+        back to the first frame, keeping
+        the images
+        '''
+        self.curframe = 0
+        self.frametimer = self.frame_time
+        self.animate = False
+        self.anim_loop_num = 0
+        
     def add_frame(self, image, colorkey):
         '''
         Insert one frame of animation
         '''
-        img = image.convert()
-        img.set_colorkey(colorkey)
-        self.frames.append(img)
+        self.frames.append(surfaces.optimise(image, colorkey, False))
+        
+    def load_frame(self, filename, colorkey):
+        '''
+        Insert one frame of animation from an
+        image file, shared with everything else
+        showing it
+        '''
+        self.frames.append(surfaces.load_image(filename, colorkey, False))
         
     def get_cur_frame(self):
         '''
@@ -78,7 +187,7 @@ class Entity(Object2D):
             
     def go_next_frame(self):
         '''
-        Animate the entity
+        Animate the object
         '''
         self.curframe += 1
         if self.curframe == len(self.frames):
@@ -91,7 +200,7 @@ class Entity(Object2D):
             
     def set_animate(self, animate):
         '''
-        Set whether to animate this entity
+        Set whether to animate this object
         '''
         self.animate = animate
         if self.animate == True:
@@ -117,6 +226,146 @@ class Entity(Object2D):
         new = pygame.transform.rotate(surface, 180 * -radians / math.pi)
         return new
     
+    def update_animation(self, dt):
+        '''
+        go through the frames while animating
+        '''
+        if self.animate == True:
+            self.frametimer -= dt
+            if self.frametimer <= 0.0:
+                self.go_next_frame()
+                self.frametimer += self.frame_time
+        
+    def get_sprite(self, scale=1.0, angle_step=1):
+        '''
+        The current frame turned to the orientation,
+        in steps of angle_step degrees, and resized by
+        scale. It is only rotated again when the frame,
+        the angle or the scale change.
+        '''
+        angle = int(round(math.degrees(self.orientation)/angle_step))*angle_step % 360
+        key = (self.curframe, angle, scale)
+        if key != self.sprite_key:
+            frame = surfaces.get_scaled(self.frames[self.curframe], scale)
+            image = surfaces.encode(pygame.transform.rotate(frame, -angle))
+            self.sprite = image
+            self.sprite_offset = (image.get_width()/2, image.get_height()/2)
+            self.sprite_key = key
+        return self.sprite
+    
+    def get_sprite_destination(self, scale=1.0):
+        '''
+        where the sprite goes to be centred
+        on the position, scaled by scale
+        '''
+        offset = self.sprite_offset
+        return (int(self.position.x*scale) - offset[0], int(self.position.y*scale) - offset[1])
+        
+    def submit(self, queue, layer, scale=1.0):
+        '''
+        Add the object to a render.RenderQueue,
+        drawn at scale
+        '''
+        if len(self.frames) > 0:
+            image = self.get_sprite(scale, queue.angle_step)
+            queue.submit(image, self.get_sprite_destination(scale), layer)
+        
+    def draw(self, surface):
+        '''
+        Draw the object
+        '''
+        if len(self.frames) > 0:
+            image = self.get_sprite()
+            surface.blit(image, self.get_sprite_destination())
+        
+class SpriteActor(Animated):
+    '''
+    Something only to be looked at. It flies
+    and spins at a constant rate and has no
+    mass, geometry or collisions, so the Game
+    moves it without the physics.
+    '''
+    def __init__(self, position, velocity, orientation, ang_velocity):
+        self.position = position.copy()
+        self.velocity = velocity.copy()
+        self.orientation = orientation
+        self.ang_velocity = ang_velocity
+        self.alive = True
+        
+        self.init_animation()
+        
+    def get_position(self):
+        return self.position
+    
+    def get_velocity(self):
+        return self.velocity
+    
+    def get_orientation(self):
+        return self.orientation
+        
+    def set_alive(self, alive):
+        self.alive = alive
+    
+    def get_alive(self):
+        return self.alive
+        
+    def update(self, dt):
+        '''
+        Move, turn and animate
+        '''
+        self.position.x += self.velocity.x*dt
+        self.position.y += self.velocity.y*dt
+        self.orientation += self.ang_velocity*dt
+        
+        self.update_animation(dt)
+        
+class Entity(Object2D, Animated):
+    '''
+    An movable, colidable, displayable object of form in
+    the Game.
+    '''
+    def __init__(self, hp, geometry, position, velocity, orientation, ang_velocity, mass):
+        Object2D.__init__(self, position, velocity, orientation, ang_velocity, mass)
+        
+        self.hp = hp
+        self.alive = True
+        self.set_geometry(geometry)
+        
+        self.init_animation()
+        
+        self.activity = ACTIVITY_ACTIVE
+        
+    def reset_entity(self, hp, position, velocity, orientation, ang_velocity):
+        '''
+        Put this Entity back in the state of a
+        new one so it can be reused. Images and
+        geometry are kept.
+        '''
+        self.reset_state(position, velocity, orientation, ang_velocity)
+        
+        self.hp = hp
+        self.alive = True
+        
+        self.reset_animation()
+        
+        self.activity = ACTIVITY_ACTIVE
+        
+    def get_activity(self):
+        return self.activity
+    
+    def set_activity(self, activity):
+        '''
+        Set the activity state. Drifting leaves the
+        oriented geometry behind, so it is brought
+        up to date when the Entity becomes active.
+        '''
+        if activity == ACTIVITY_ACTIVE and self.activity != ACTIVITY_ACTIVE:
+            self.phys_geom_oriented, self.oriented_faces = self.get_oriented_geometry(self.orientation)
+        self.activity = activity
+        
+    def is_active(self):
+        return self.activity == ACTIVITY_ACTIVE
+        
     def get_hp(self):
         return self.hp
     
@@ -141,45 +390,24 @@ class Entity(Object2D):
         '''
         Update state of this entity
         '''
-        Object2D.update(self, dt)
-        
-        if self.animate == True:
-            self.frametimer -= dt
-            if self.frametimer <= 0.0:
-                self.go_next_frame()
-                self.frametimer += self.frame_time
-        
-    def draw(self, surface):
-        '''
-        Draw the entity
-        '''
-        if len(self.frames) > 0:
-            image = self.rotate_image(self.get_cur_frame_image(), self.get_orientation())
-            center = image.get_rect().center
-            pos =self.get_position().get_int()
-            x = pos[0]-center[0]
-            y = pos[1]-center[1]
-            surface.blit(image, (x,y))
+        if self.activity == ACTIVITY_ACTIVE:
+            Object2D.update(self, dt)
+        else:
+            self.drift(dt)
         
-        #self.draw_phys(surface)
+        self.update_animation(dt)
         
     def hit_by(self, obj, collision):
         '''
         Handle Entity-Entity collisions
+        through the collision handler table
         '''
-        do_collision = True
-        if isinstance(obj, Entity):
-            do_collision = self.hit_by_entity(obj)
+        handler, physical = get_collision_handler(self.__class__, obj.__class__)
+        if handler != None:
+            handler(self, obj)
             
-        if do_collision == True:
+        if physical == True:
             Object2D.hit_by(self, obj, collision)
-            
-    def hit_by_entity(self, entity):
-        '''
-        Return True to indicate that 
-        collision should be resolved
-        '''
-        return True
         
         
 # number of seconds player is invulnerable after spawning
@@ -192,6 +420,9 @@ PLAYER_SHOT_SPEED = 1000.0
 PLAYER_SHOT_DAMAGE = 20
 PLAYER_SHOT_TIME = 0.5
 PLAYER_SHIELD_TIME = 20.0
+# Shots collide as the segment they sweep, rounded
+# to the thickness of their 20x10 rectangle
+SHOT_COLLISION_SHAPE = Capsule(5.0, 5.0)
 pygame.mixer.init()
 SHOT_SOUND = pygame.mixer.Sound("snd/shot.wav")
 SHOT_SOUND.set_volume(0.20)
@@ -200,23 +431,30 @@ class Player(Entity):
     The Entity controlled by the player;
     the ship.
     '''
+    collision_category = COLLIDE_PLAYER
+    collision_mask = COLLISION_MASKS[COLLIDE_PLAYER]
+    
     class Shot(Entity):
         '''
         That which is projected from the weapon
         of the Player.
         '''
+        collision_category = COLLIDE_SHOT
+        collision_mask = COLLISION_MASKS[COLLIDE_SHOT]
+        
         def __init__(self, parent, damage, position, velocity, orientation):
             
             geometry = (Vector2D(-10,-5), Vector2D(10, -5), Vector2D(10, 5), Vector2D(-10, 5))
             
             Entity.__init__(self, 1, geometry, position, velocity, orientation, 0.0, 100.0)
+            self.set_collision_shape(SHOT_COLLISION_SHAPE)
             
-            self.add_frame(pygame.image.load("obj/shot.png"), (255,0,255))
+            self.load_frame("obj/shot.png", (255,0,255))
             
             self.damage = damage
             self.parent = parent
             
-            SHOT_SOUND.play()
+            play_sound(SHOT_SOUND)
             
         def get_damage(self):
             return self.damage
@@ -228,24 +466,18 @@ class Player(Entity):
             '''
             return self.parent
         
-        def hit_by_entity(self, entity):
+        def hit_by_asteroid(self, asteroid):
             '''
             Shots damage Asteroids and collide
             '''
-            if isinstance(entity, Asteroid):
-                entity.apply_damage(self.get_damage(), self)
-                self.set_alive(False)
-                return True
+            asteroid.apply_damage(self.get_damage(), self)
+            self.set_alive(False)
             
+        def hit_by_hole(self, hole):
             '''
             Holes consume shots
             '''
-            if isinstance(entity, Hole):
-                self.set_alive(False)
-                return False
-            
-        def draw(self, surface):
-            Entity.draw(self, surface)
+            self.set_alive(False)
         
     def __init__(self, hp, regens, position, velocity, orientation):
         geometry = (Vector2D(-20, 20), Vector2D(10, 15),
@@ -258,7 +490,7 @@ class Player(Entity):
         
         Entity.__init__(self, hp, geometry, position, velocity, orientation, 0.0, 1.0)
         
-        self.add_frame(pygame.image.load("obj/ship.png"), (255,0,255))
+        self.load_frame("obj/ship.png", (255,0,255))
         
         self.regens_left = regens
         self.invuln_time = 0.0
@@ -285,6 +517,13 @@ class Player(Entity):
         
         self.accelerate(False)
         
+        # Projectiles shoot fires shots into; set
+        # with set_projectiles before shooting
+        self.projectiles = None
+        
+    def set_projectiles(self, projectiles):
+        self.projectiles = projectiles
+        
     def respawn(self, hp, position, velocity, orientation):
         '''
         Spawn this Player and reset its
@@ -333,21 +572,36 @@ class Player(Entity):
             self.visible = not self.visible
             self.invuln_flash_time = PLAYER_INVULN_FLASH_PERIOD
             
-    def create_shot(self):
+    def get_shot_start(self):
         '''
-        Create a shot with the
-        proper position, velocity,
-        orientation and angular
-        velocity
+        the position, velocity and orientation
+        a shot leaves the weapon with
         '''
         direction = Vector2D(1, 0).rotate(self.orientation)
         shot_velocity = direction.scaled(self.shot_speed)
         shot_velocity.add(self.velocity)
         
         shot_position = self.position.copy().add(direction.scaled(30))
-        shot_orientation = self.orientation
-        
-        return Player.Shot(self, self.shot_damage, shot_position, shot_velocity, shot_orientation)
+        return (shot_position, shot_velocity, self.orientation)
+    
+    def create_shot(self):
+        '''
+        Fire a shot into the Projectiles
+        set with set_projectiles and
+        return its id there
+        '''
+        position, velocity, orientation = self.get_shot_start()
+        play_sound(SHOT_SOUND)
+        return self.projectiles.spawn(self, self.shot_damage, position, velocity, orientation)
+    
+    def create_shot_entity(self):
+        '''
+        A Shot fired like create_shot fires
+        one, as an Entity of its own, for
+        use without Projectiles
+        '''
+        position, velocity, orientation = self.get_shot_start()
+        return Player.Shot(self, self.shot_damage, position, velocity, orientation)
     
     def can_shoot(self):
         return self.shot_timer <= 0.0
@@ -477,35 +731,35 @@ class Player(Entity):
         else:
             Entity.apply_damage(self, damage, source)
         
-    def hit_by_entity(self, entity):
+    def hit_by_asteroid(self, asteroid):
         '''
         Player is damaged by Asteroids,
         Asteroid is destroyed by players
         '''
-        if isinstance(entity, Asteroid) == True:
-            self.apply_damage(entity.get_damage(), entity)
-            entity.set_alive(False)
-            return True
+        self.apply_damage(asteroid.get_damage(), asteroid)
+        asteroid.set_alive(False)
         
+    def hit_by_hole(self, hole):
         '''
         Player is destroyed by Holes
         '''
-        if isinstance(entity, Hole) == True:
-            self.set_alive(False)
-            return False
+        self.set_alive(False)
         
+    def hit_by_powerup(self, powerup):
         '''
         Player gains powerups
         '''
-        if isinstance(entity, Powerup) == True:
-            self.add_points(POWERUP_POINTS)
-            entity.give_to(self)
-            entity.set_alive(False)
-            return False
+        self.add_points(POWERUP_POINTS)
+        powerup.give_to(self)
+        powerup.set_alive(False)
         
     def draw(self, surface):
         if self.visible == True:
             Entity.draw(self, surface)
+            
+    def submit(self, queue, layer, scale=1.0):
+        if self.visible == True:
+            Entity.submit(self, queue, layer, scale)
 
     
 ASTEROID_DAMAGE = 25
@@ -518,6 +772,9 @@ class Asteroid(Entity):
     '''
     Avoid these
     '''
+    collision_category = COLLIDE_ASTEROID
+    collision_mask = COLLISION_MASKS[COLLIDE_ASTEROID]
+    
     def __init__(self, hp, position, velocity, orientation, ang_velocity):
         
         geometry = (Vector2D(-43, 0), Vector2D(-29, 21), 
@@ -527,7 +784,13 @@ class Asteroid(Entity):
         
         Entity.__init__(self, hp, geometry, position, velocity, orientation, ang_velocity, 1000.0)
         
-        self.add_frame(pygame.image.load("obj/aster.png"), (255,0,255))
+        self.load_frame("obj/aster.png", (255,0,255))
+        
+    def reset(self, hp, position, velocity, orientation, ang_velocity):
+        '''
+        reuse this Asteroid as if newly created
+        '''
+        self.reset_entity(hp, position, velocity, orientation, ang_velocity)
         
     def get_damage(self):
         return ASTEROID_DAMAGE
@@ -535,58 +798,57 @@ class Asteroid(Entity):
     def apply_damage(self, damage, source):
         '''
         Detect asteroid destruction by player
-        to assign points
+        to assign points. source is the Player
+        for shots from its Projectiles.
         '''
         was_alive = self.get_alive()
         Entity.apply_damage(self, damage, source)
         
         if isinstance(source, Player.Shot):
+            source = source.get_parent()
+        if isinstance(source, Player):
             if was_alive != self.get_alive(): # died after applying damage
-                source.get_parent().add_points(ASTEROID_POINTS)
+                source.add_points(ASTEROID_POINTS)
             
-    def hit_by_entity(self, entity):
+    def hit_by_player(self, player):
         '''
         Players are damaged by Asteroids but the 
         Asteroid is destroyed
         '''
-        if isinstance(entity, Player):
-            entity.apply_damage(self.get_damage(), self)
-            self.set_alive(False)
-            return True
+        player.apply_damage(self.get_damage(), self)
+        self.set_alive(False)
         
+    def hit_by_hole(self, hole):
         '''
         Asteroids are destroyed by Holes
         '''
-        if isinstance(entity, Hole):
-            self.set_alive(False)
-            return False
+        self.set_alive(False)
         
+    def hit_by_shot(self, shot):
         '''
         Asteroids are damaged by Shots from the 
         Player.
         '''
-        if isinstance(entity, Player.Shot):
-            self.apply_damage(entity.get_damage(), entity)
-            entity.set_alive(False)
-            return True
-        
-        '''
-        Asteroids simply bounce off other
-        Asteroids.
-        '''
-        if isinstance(entity, Asteroid):
-            return True
+        self.apply_damage(shot.get_damage(), shot)
+        shot.set_alive(False)
         
         
 HOLE_VELOCITY_MIN = 80
 HOLE_VELOCITY_MAX = 100
 HOLE_DIRECTION_SPREAD = math.pi/6 
+HOLE_RADIUS = 20
+# Holes collide as a true circle, the polygon 
+# geometry is only for mass properties
+HOLE_COLLISION_SHAPE = Circle(HOLE_RADIUS)
 HOLE_INCOMING = pygame.mixer.Sound("snd/hole_incoming.wav")
 HOLE_INCOMING.set_volume(0.5)
 class Hole(Entity):
     '''
     Really avoid these.
     '''
+    collision_category = COLLIDE_HOLE
+    collision_mask = COLLISION_MASKS[COLLIDE_HOLE]
+    
     def __init__(self, position, velocity, orientation, ang_velocity):
         '''
         Generates roughly circular
@@ -595,7 +857,7 @@ class Hole(Entity):
         geometry = [] # don't remove or exceptions will be raised
         npoints = 8
         arc = -2*math.pi/(npoints)
-        radius = 20
+        radius = HOLE_RADIUS
         i = 0
         while i < npoints:
             x = radius * math.cos(arc*i)
@@ -606,19 +868,19 @@ class Hole(Entity):
         # supermassive - important for the 'gravitational' force
         mass = 50000000.0
         Entity.__init__(self, 1, tuple(geometry), position, velocity, orientation, ang_velocity, mass)
+        self.set_collision_shape(HOLE_COLLISION_SHAPE)
         
-        self.add_frame(pygame.image.load("obj/hole.png"), (255,0,255))
+        self.load_frame("obj/hole.png", (255,0,255))
         
         # warn player about black hole
-        HOLE_INCOMING.play()
+        play_sound(HOLE_INCOMING)
         
-    def hit_by_entity(self, entity):
+    def consume(self, entity):
         '''
         Holes kill any entity, including other
         Holes, and are not affected by collisions
         '''
         entity.set_alive(False)
-        return False
     
 POWERUP_VELOCITY_MIN = 200
 POWERUP_VELOCITY_MAX = 300
@@ -628,6 +890,9 @@ class Powerup(Entity):
     '''
     Something beneficial to the Player
     '''
+    collision_category = COLLIDE_POWERUP
+    collision_mask = COLLISION_MASKS[COLLIDE_POWERUP]
+    
     def __init__(self, position, velocity, orientation, ang_velocity):
 
         geometry = (Vector2D(-15, -15), Vector2D(15, -15), 
@@ -641,22 +906,18 @@ class Powerup(Entity):
         Specific powerups override to
         implement their specific effect
         '''
-        POWERUP_SOUND.play()
+        play_sound(POWERUP_SOUND)
  
     
-    def hit_by_entity(self, entity):
+    def hit_by_player(self, player):
         '''
         Only affects a Player entity
         '''
-        if isinstance(entity, Player):
-            self.give_to(entity)
-            self.set_alive(False)
-            
-        if isinstance(entity, Hole):
-            self.set_alive(False)
-            
-        # does not interact physically
-        return False
+        self.give_to(player)
+        self.set_alive(False)
+        
+    def hit_by_hole(self, hole):
+        self.set_alive(False)
         
 class ShieldPowerup(Powerup):
     '''
@@ -664,7 +925,7 @@ class ShieldPowerup(Powerup):
     '''
     def __init__(self, position, velocity, orientation, ang_velocity):
         Powerup.__init__(self, position, velocity, orientation, ang_velocity)
-        self.add_frame(pygame.image.load("obj/shield.png"), (255,0,255))
+        self.load_frame("obj/shield.png", (255,0,255))
         
     def give_to(self, player):
         Powerup.give_to(self, player)
@@ -676,7 +937,7 @@ class WeaponPowerup(Powerup):
     '''
     def __init__(self, position, velocity, orientation, ang_velocity):
         Powerup.__init__(self, position, velocity, orientation, ang_velocity)
-        self.add_frame(pygame.image.load("obj/weapon.png"), (255,0,255))
+        self.load_frame("obj/weapon.png", (255,0,255))
         
     def give_to(self, player):
         Powerup.give_to(self, player)
@@ -684,41 +945,30 @@ class WeaponPowerup(Powerup):
     
 EXPLOSION_SOUND = pygame.mixer.Sound("snd/explosion.wav")
 EXPLOSION_SOUND.set_volume(0.50)
-class Explosion(Entity):
-    '''
-    Boom
-    '''
-    def __init__(self, position, velocity, orientation, ang_velocity):
-        geometry = (Vector2D(0,0), Vector2D(20, 20), Vector2D(20, -20))
-        Entity.__init__(self, 0, geometry, position, velocity, orientation, ang_velocity, 1.0)
-        
-        self.add_frame(pygame.image.load("obj/expl1.png"), (255,0,255))
-        self.add_frame(pygame.image.load("obj/expl2.png"), (255,0,255))
-        self.add_frame(pygame.image.load("obj/expl3.png"), (255,0,255))
-        self.add_frame(pygame.image.load("obj/expl4.png"), (255,0,255))
-        self.add_frame(pygame.image.load("obj/expl5.png"), (255,0,255))
-        self.set_frame_time(1.0/15.0)
-        self.set_animation_loops(0)
-        self.set_animate(True)
-        
-        self.set_collidable(False)
-        
-        EXPLOSION_SOUND.play()
-        
-    def update(self, dt):
-        '''
-        Fall through to the default Entity updater
-        '''
-        Entity.update(self, dt)
-        # update frames
-        
-        # have the game get rid of this Explosion when it's finished
-        if self.finished():
-            self.set_alive(False)
 
-    
-    def finished(self):
-        '''
-        is this Explosion still going?
-        '''
-        return self.get_is_animating() == False
+# Entities of unregistered types collide physically. The game's
+# Entities only do so for the pairs registered as physical below.
+register_collision(Entity, Entity, None, True)
+
+register_collision(Player, Entity, None, False)
+register_collision(Player, Asteroid, Player.hit_by_asteroid, True)
+register_collision(Player, Hole, Player.hit_by_hole, False)
+register_collision(Player, Powerup, Player.hit_by_powerup, False)
+
+register_collision(Player.Shot, Entity, None, False)
+register_collision(Player.Shot, Asteroid, Player.Shot.hit_by_asteroid, True)
+register_collision(Player.Shot, Hole, Player.Shot.hit_by_hole, False)
+
+register_collision(Asteroid, Entity, None, False)
+register_collision(Asteroid, Player, Asteroid.hit_by_player, True)
+register_collision(Asteroid, Hole, Asteroid.hit_by_hole, False)
+register_collision(Asteroid, Player.Shot, Asteroid.hit_by_shot, True)
+# Asteroids simply bounce off other Asteroids
+register_collision(Asteroid, Asteroid, None, True)
+
+register_collision(Hole, Entity, Hole.consume, False)
+
+# Powerups do not interact physically
+register_collision(Powerup, Entity, None, False)
+register_collision(Powerup, Player, Powerup.hit_by_player, False)
+register_collision(Powerup, Hole, Powerup.hit_by_hole, False)
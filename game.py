@@ -26,7 +26,12 @@ import pygame.draw
 from vector import Vector2D
 
 import entity
+import particles
 import physics
+import pool
+import projectile
+import quality
+import render
 import screen
 
     
@@ -111,24 +116,39 @@ class StarField(object):
             '''
             self.position.add(self.velocity.scaled(dt))
             
-    def __init__(self, width, height, num_stars):
+    def __init__(self, width, height, num_stars, seed):
         self.width = width
         self.height = height
-        self.num_stars = num_stars
+        self.num_stars = 0
         
         self.star_velocity = STAR_VELOCITY_MEAN
         
+        # stars are only for show, so they have random
+        # numbers of their own and how many there are
+        # doesn't change the Game
+        self.random = random.Random(seed)
+        
         '''
         Create the initial field
         '''
         self.stars = [] # raises exceptions when removed
-        i = 0
-        while i < self.num_stars:
+        self.set_num_stars(num_stars)
+        
+    def set_num_stars(self, num_stars):
+        '''
+        add stars anywhere, or take the
+        last ones away
+        '''
+        while len(self.stars) < num_stars:
             star = StarField.Star()
             self.distribute_horiz(star)
             self.distribute_vert(star)
             self.stars.append(star)
-            i += 1
+        del self.stars[num_stars:]
+        self.num_stars = num_stars
+        
+    def get_num_stars(self):
+        return self.num_stars
     
     def distribute_vert(self, star):
         '''
@@ -143,7 +163,7 @@ class StarField(object):
         that |factor| <= 1.0 (star on the screen)
         '''
         while math.fabs(factor) > 1.0:
-            factor = random.gauss(0.0, 0.75)
+            factor = self.random.gauss(0.0, 0.75)
             
         vertical = (factor * self.height/2) + self.height/2
             
@@ -160,7 +180,7 @@ class StarField(object):
         horizontally on the screen.
         Uniformly distributed (presumably)
         '''
-        horiz = random.random()*self.width
+        horiz = self.random.random()*self.width
     
         star.set_position_horiz(horiz)
         
@@ -168,7 +188,7 @@ class StarField(object):
         '''
         Because not all stars appear white
         '''
-        color = lambda: int(127 + random.random()*128)
+        color = lambda: int(127 + self.random.random()*128)
         r = color()
         g = color()
         b = color()
@@ -193,13 +213,14 @@ class StarField(object):
             if star.get_position_horiz() < 0:
                 self.wrap_star(star)
             
-    def draw(self, surface):
+    def draw(self, surface, scale=1.0):
         '''
-        Show all the Stars
+        Show all the Stars, at scale
         '''
         for star in self.stars:
-            pos = star.get_position().get_int()
-            pygame.draw.circle(surface, star.get_color(), pos, int(star.get_size()), 0)
+            position = star.get_position()
+            pos = (int(position.x*scale), int(position.y*scale))
+            pygame.draw.circle(surface, star.get_color(), pos, int(star.get_size()*scale), 0)
             
 # because
 pygame.font.init()
@@ -224,6 +245,8 @@ class InfoDisplay(object):
             self.static = self.create_static(static_text)
             self.value = initial_value
             self.value_text = self.create_static(str(initial_value))
+            # the value changed since value_text was made
+            self.dirty = False
             self.visible = visible
             
         def set_visible(self, visible):
@@ -240,10 +263,20 @@ class InfoDisplay(object):
         
         def set_value(self, value):
             '''
-            set the value displayed
+            set the value displayed; it is
+            shown once refresh is called
             '''
-            self.value = value
-            self.value_text.set_text(str(value))
+            if value != self.value:
+                self.value = value
+                self.dirty = True
+                
+        def refresh(self):
+            '''
+            make the text of a changed value
+            '''
+            if self.dirty == True:
+                self.value_text.set_text(str(self.value))
+                self.dirty = False
             
         def set_position(self, position):
             self.static.set_position(position)
@@ -283,6 +316,13 @@ class InfoDisplay(object):
                 text.set_position((pos_x,pos_y))
                 pos_y += text.get_height()
         
+    def refresh(self):
+        '''
+        show the values set since the last refresh
+        '''
+        for text in self.text_list:
+            text.refresh()
+        
     def draw(self, surface):
         '''
         Show all info
@@ -348,10 +388,83 @@ GAME_MODE_NORMAL = 1 # fly until destination reached
 GAME_MODE_ENDURANCE = 2 # fly until no regenerations left
 
 GAME_TRAVEL_VELOCITY = 10.0 # 10 units of distance per second
+# this G is made up because the real value is much too small for this purpose
+GAME_GRAVITY = 6.67 # x 10^-11
 GAME_SPAWN_PERIOD = 1.0 # how many seconds between spawning objects
 
+# kinds of Entity the spawner makes
+GAME_SPAWN_ASTEROID = 0
+GAME_SPAWN_HOLE = 1
+GAME_SPAWN_SHIELD = 2
+GAME_SPAWN_WEAPON = 3
+GAME_SPAWN_KINDS = 4
+GAME_SPAWN_CLASSES = {entity.Asteroid: GAME_SPAWN_ASTEROID,
+                      entity.Hole: GAME_SPAWN_HOLE,
+                      entity.ShieldPowerup: GAME_SPAWN_SHIELD,
+                      entity.WeaponPowerup: GAME_SPAWN_WEAPON}
+# the most of each kind alive at once, or None for
+# no limit; spawns over it are dropped
+GAME_SPAWN_CAPS = (24, 3, 2, 2)
+# spawns are held back while there are more Entitys than
+# this, or the last collision check found more pairs with
+# overlapping swept boxes; None for no limit. Work counted
+# rather than time taken, and before the pair cache, so it
+# only depends on where things are: replays and restored
+# snapshots play out the same on any machine.
+GAME_SPAWN_MAX_ENTITIES = 48
+GAME_SPAWN_MAX_COST = 256
+# spawn periods a held back spawn waits before it is dropped
+GAME_SPAWN_DEFER_PERIODS = 3
+
+# how many Asteroids to create before the
+# game starts, to be reused after that
+GAME_ASTEROID_POOL_SIZE = 8
+
+# whether Entitys off the playfield skip collisions and
+# gravity, and how far outside the screen they still
+# count as on the playfield
+GAME_ACTIVITY_STATES = True
+GAME_ACTIVITY_MARGIN = 0
+
+# whether pairs of Entitys that were far enough apart
+# skip collision checks until they might touch
+GAME_PAIR_CACHE = True
+
+# how collisions are resolved; one at a time as they are
+# found, or all of a step together with some passes
+GAME_CONTACT_SOLVER = physics.SOLVER_SEQUENTIAL
+GAME_CONTACT_ITERATIONS = physics.CONTACT_ITERATIONS
+
+# simulation steps per second, or None to
+# step once per frame with the frametime
+GAME_TICK_RATE = None
+# the most ticks run in one update; time past that is
+# dropped, so a long frame doesn't start a catch-up
+# that makes the next frame long too
+GAME_MAX_TICKS = 5
+
 GAME_SHOW_HISCORES = 26 # event injected to show hiscores
 GAME_SHOW_TITLE = 27 # event to show titlescreen
+
+class PhaseTimer(object):
+    '''
+    Told when each phase of Game.tick and
+    Game.draw ends. This one does nothing with
+    it; a benchmark gives the Game one that
+    keeps the times.
+    '''
+    def start(self):
+        '''
+        a tick is starting
+        '''
+        pass
+    
+    def mark(self, phase):
+        '''
+        phase of the tick just ended
+        '''
+        pass
+    
 class Game(object):
     '''
     The whole reason for creating every other class.
@@ -367,12 +480,20 @@ class Game(object):
             for attr in settings:
                 setattr(self, attr, settings[attr])
                 
-    def __init__(self, screen_rect, difficulty, mode):
+    def __init__(self, screen_rect, difficulty, mode, seed=None):
         self.default_settings()
         self.set_settings({'difficulty': difficulty, 'mode': mode})
         
+        # everything random in a game comes from this seed
+        # so a game can be played back exactly
+        if seed == None:
+            seed = random.getrandbits(32)
+        self.seed = seed
+        random.seed(self.seed)
+        
         self.screen_rect = screen_rect
-        self.star_field = StarField(screen_rect.width, screen_rect.height, 10)
+        self.star_field = StarField(screen_rect.width, screen_rect.height,
+                                    quality.get_quality(0).stars, self.seed)
         
         self.dynamics = physics.Dynamics()
         self.infodisplay = InfoDisplay((20,20))
@@ -384,6 +505,17 @@ class Game(object):
         self.hp_bar.set_position((hp_height*2, self.screen_rect.height-hp_height*2))
         
         self.entity_list = []
+        # Entitys taking part in collisions this tick
+        self.active_entities = []
+        # number of Entitys in each activity state
+        self.activity_counts = [0, 0, 0]
+        # Entitys removed during the current update
+        self.removed_entities = []
+        # SpriteActors, which are only moved and drawn
+        self.actor_list = []
+        self.phase_timer = PhaseTimer()
+        
+        self.create_pools()
         
         # Useful to remove entities that fly off the screen too far
         self.despawn_rect = pygame.Rect(self.screen_rect)
@@ -391,10 +523,37 @@ class Game(object):
         self.despawn_rect.height = self.screen_rect.height + 100
         self.despawn_rect.center = self.screen_rect.center
         
+        # explosions are effects, not Entitys; the player's 
+        # is the id of its effect, or None
+        self.explosions = particles.Effects(particles.get_explosion_frames(),
+                                            particles.EXPLOSION_FRAME_TIME, self.despawn_rect)
+        self.player_explosion = None
+        # the player's shots aren't Entitys either
+        self.shots = projectile.Projectiles(projectile.get_shot_image(), self.despawn_rect)
+        
+        # sprites are drawn through this in batches
+        self.render_queue = render.RenderQueue(render.RENDER_LAYERS)
+        
+        # frames since the info texts were redrawn
+        self.hud_frames = 0
+        self.set_quality_level(0)
+        
         self.start_game()
 
     def default_settings(self):
-        self.settings = Game.Settings({'difficulty': GAME_DIFF_MEDIUM, 'mode': GAME_MODE_NORMAL})
+        self.settings = Game.Settings({'difficulty': GAME_DIFF_MEDIUM, 'mode': GAME_MODE_NORMAL,
+                                       'asteroid_pool_size': GAME_ASTEROID_POOL_SIZE,
+                                       'tick_rate': GAME_TICK_RATE,
+                                       'max_ticks': GAME_MAX_TICKS,
+                                       'activity_states': GAME_ACTIVITY_STATES,
+                                       'activity_margin': GAME_ACTIVITY_MARGIN,
+                                       'pair_cache': GAME_PAIR_CACHE,
+                                       'contact_solver': GAME_CONTACT_SOLVER,
+                                       'contact_iterations': GAME_CONTACT_ITERATIONS,
+                                       'spawn_caps': GAME_SPAWN_CAPS,
+                                       'spawn_max_entities': GAME_SPAWN_MAX_ENTITIES,
+                                       'spawn_max_cost': GAME_SPAWN_MAX_COST,
+                                       'spawn_defer_periods': GAME_SPAWN_DEFER_PERIODS})
         
     def set_settings(self, settings):
         '''
@@ -415,6 +574,23 @@ class Game(object):
         else:
             self.settings.add(GAME_SETTINGS_EASY)
             
+    def create_pools(self):
+        '''
+        Create the Pools that short lived
+        Entitys are taken from
+        '''
+        settings = self.settings
+        nowhere = Vector2D()
+        
+        self.asteroid_pool = pool.Pool(entity.Asteroid, settings.asteroid_pool_size,
+                                       (entity.ASTEROID_HP, nowhere, nowhere, 0.0, 0.0))
+        
+        # pool of each class of pooled Entity
+        self.pools = {entity.Asteroid: self.asteroid_pool}
+        
+    def get_pools(self):
+        return self.pools
+        
     def populate_info_display(self):
         self.distance_text = InfoDisplay.Text(INFO_DISTANCE_TEXT, 0, True)
         self.add_info_text(self.distance_text)
@@ -473,6 +649,10 @@ class Game(object):
         self.distance_travelled = 0
         self.distance = self.settings.distance
         self.spawn_timer = 1.0
+        # [kind, periods waited] of spawns held back
+        self.deferred_spawns = []
+        self.spawns_deferred = 0
+        self.spawns_dropped = 0
         self.points = 0
         
         self.update_distance_display()
@@ -483,6 +663,13 @@ class Game(object):
         
         self.shooting = False
         
+        # frametime not simulated yet with a tick rate
+        self.tick_accumulator = 0.0
+        
+        self.dynamics.set_pair_cache_enabled(self.settings.pair_cache)
+        self.dynamics.set_contact_solver(self.settings.contact_solver,
+                                         self.settings.contact_iterations)
+        
         self.game_won = False
         self.game_over = False
         
@@ -517,7 +704,7 @@ class Game(object):
         velocity = Vector2D(-1.0, 0.0).rotate(self.random_float(-entity.ASTEROID_DIRECTION_SPREAD, entity.ASTEROID_DIRECTION_SPREAD)).scale(speed)
         ang_velocity = self.random_float(-entity.ASTEROID_DIRECTION_SPREAD, entity.ASTEROID_DIRECTION_SPREAD)
         
-        ent = entity.Asteroid(entity.ASTEROID_HP, position, velocity, 0.0, ang_velocity)
+        ent = self.asteroid_pool.acquire(entity.ASTEROID_HP, position, velocity, 0.0, ang_velocity)
         self.add_entity(ent)
         
     def spawn_hole(self):
@@ -548,6 +735,46 @@ class Game(object):
         ent = powerup_class(position, velocity, 0.0, 0.0)
         self.add_entity(ent)
     
+    def spawn_kind(self, kind):
+        if kind == GAME_SPAWN_ASTEROID:
+            # spawn an asteroid
+            self.spawn_asteroid()
+        elif kind == GAME_SPAWN_HOLE:
+            # spawn a black hole
+            self.spawn_hole()
+        elif kind == GAME_SPAWN_SHIELD:
+            # spawn a shield powerup
+            self.spawn_powerup(entity.ShieldPowerup)
+        else:
+            # spawn a weapon powerup
+            self.spawn_powerup(entity.WeaponPowerup)
+            
+    def count_spawn_kinds(self):
+        '''
+        number of live Entitys of each spawn kind
+        '''
+        counts = [0]*GAME_SPAWN_KINDS
+        classes = GAME_SPAWN_CLASSES
+        for ent in self.entity_list:
+            kind = classes.get(ent.__class__)
+            if kind != None:
+                counts[kind] += 1
+        return counts
+        
+    def is_spawn_overloaded(self, num_entities):
+        '''
+        should spawns be held back with
+        num_entities in the game?
+        '''
+        settings = self.settings
+        max_entities = settings.spawn_max_entities
+        if max_entities != None and num_entities > max_entities:
+            return True
+        max_cost = settings.spawn_max_cost
+        if max_cost != None and self.dynamics.get_broad_phase_pairs() > max_cost:
+            return True
+        return False
+        
     def update_spawner(self, dt):
         self.spawn_timer -= dt
         if self.spawn_timer <= 0.0:
@@ -555,24 +782,61 @@ class Game(object):
             
             settings = self.settings
             
+            # every chance is rolled each period, spawned
+            # or not, so the random numbers drawn don't
+            # depend on the load
             spawn_asteroid = self.probability_event(settings.aster_prob)
             spawn_hole = self.probability_event(settings.hole_prob)
             spawn_shield = self.probability_event(settings.shield_prob)
             spawn_weapon = self.probability_event(settings.weapon_prob)
             
-            if spawn_asteroid == True:
-                # spawn an asteroid
-                self.spawn_asteroid()
-            if spawn_hole == True:
-                # spawn a black hole
-                self.spawn_hole()
-            if spawn_shield == True:
-                # spawn a shield powerup
-                self.spawn_powerup(entity.ShieldPowerup)
-            if spawn_weapon == True:
-                # spawn a weapon powerup
-                self.spawn_powerup(entity.WeaponPowerup)
-                
+            # spawns held back before go first
+            pending = self.deferred_spawns
+            for kind, spawned in ((GAME_SPAWN_ASTEROID, spawn_asteroid),
+                                  (GAME_SPAWN_HOLE, spawn_hole),
+                                  (GAME_SPAWN_SHIELD, spawn_shield),
+                                  (GAME_SPAWN_WEAPON, spawn_weapon)):
+                if spawned == True:
+                    pending.append([kind, 0])
+            if len(pending) == 0:
+                return
+            
+            self.deferred_spawns = []
+            caps = settings.spawn_caps
+            counts = self.count_spawn_kinds()
+            num_entities = len(self.entity_list)
+            overloaded = self.is_spawn_overloaded(num_entities)
+            for spawn in pending:
+                kind = spawn[0]
+                if caps[kind] != None and counts[kind] >= caps[kind]:
+                    self.spawns_dropped += 1
+                elif overloaded == True:
+                    if spawn[1] < settings.spawn_defer_periods:
+                        spawn[1] += 1
+                        self.deferred_spawns.append(spawn)
+                        self.spawns_deferred += 1
+                    else:
+                        self.spawns_dropped += 1
+                else:
+                    self.spawn_kind(kind)
+                    counts[kind] += 1
+                    num_entities += 1
+                    overloaded = self.is_spawn_overloaded(num_entities)
+                    
+    def get_spawns_deferred(self):
+        '''
+        number of times a spawn was held back
+        for the load since the game started
+        '''
+        return self.spawns_deferred
+    
+    def get_spawns_dropped(self):
+        '''
+        number of spawns given up on since the game
+        started, over a cap or held back too long
+        '''
+        return self.spawns_dropped
+        
     def update_distance(self, dt):
         self.distance_travelled += GAME_TRAVEL_VELOCITY*dt
         self.update_distance_display()
@@ -584,6 +848,7 @@ class Game(object):
             
     def create_player(self):
         self.player = entity.Player(self.settings.default_hp, self.settings.default_regens, Vector2D(self.screen_rect.width/4, self.screen_rect.height/2), Vector2D(0,0), 0.0)
+        self.player.set_projectiles(self.shots)
         
     def spawn_player(self):
         self.player.respawn(self.settings.default_hp, Vector2D(self.screen_rect.width/4, self.screen_rect.height/2), Vector2D(0,0), 0.0)
@@ -625,23 +890,28 @@ class Game(object):
         
     def is_player_finished_exploding(self):
         '''
-        check if the player has exploded
+        check if the player has exploded; an
+        explosion that flew off the screen and
+        was removed has exploded too
         '''
-        return self.player_explosion.finished()
+        if self.player_explosion == None:
+            return True
+        return self.explosions.has(self.player_explosion) == False
 
     def show_explosion(self, ent):
         '''
-        explode an entity
+        explode an entity and return
+        the id of the explosion
         '''
-        expl = entity.Explosion(ent.get_position(), ent.get_velocity(), ent.get_orientation(), ent.get_ang_velocity())
-        self.add_entity(expl)
-        return expl
+        entity.play_sound(entity.EXPLOSION_SOUND)
+        return self.explosions.spawn(ent.get_position(), ent.get_velocity())
     
     def add_entity(self, entity):
         '''
         inserts a new entity into the game
         '''
         if entity != None:
+            self.stage_entity(entity)
             self.entity_list.append(entity)
 
     def add_entity_bottom(self, entity):
@@ -649,7 +919,120 @@ class Game(object):
         inserts a new entity below all others
         '''
         if entity != None:
+            self.stage_entity(entity)
             self.entity_list.insert(0, entity)
+            
+    def add_actor(self, actor):
+        '''
+        inserts a new SpriteActor into the game
+        '''
+        if actor != None:
+            self.actor_list.append(actor)
+            
+    def update_actors(self, dt):
+        '''
+        Move and animate the SpriteActors, then
+        remove the dead ones and those outside
+        of the allowable region. They skip the
+        physics and the Entity checks.
+        '''
+        if len(self.actor_list) == 0:
+            return
+        
+        rect = self.despawn_rect
+        left = rect.left
+        top = rect.top
+        right = rect.right
+        bottom = rect.bottom
+        
+        kept = []
+        for actor in self.actor_list:
+            actor.update(dt)
+            position = actor.position
+            if (actor.alive == True and position.x >= left and position.x < right and
+                    position.y >= top and position.y < bottom):
+                kept.append(actor)
+            else:
+                self.removed_entities.append(actor)
+        self.actor_list = kept
+        
+    def stage_entity(self, ent):
+        '''
+        new Entitys wait off the playfield
+        until they come onto it
+        '''
+        if self.settings.activity_states == True:
+            ent.set_activity(entity.ACTIVITY_STAGING)
+            
+    def update_activity(self):
+        '''
+        Set the activity state of every Entity from
+        where it is and collect the active ones
+        '''
+        counts = [0, 0, 0]
+        active = []
+        
+        if self.settings.activity_states == True:
+            margin = self.settings.activity_margin
+            left = self.screen_rect.left - margin
+            top = self.screen_rect.top - margin
+            right = self.screen_rect.right + margin
+            bottom = self.screen_rect.bottom + margin
+            
+            for ent in self.entity_list:
+                position = ent.position
+                radius = ent.get_collision_radius()
+                on_playfield = (position.x + radius >= left and position.x - radius <= right and
+                                position.y + radius >= top and position.y - radius <= bottom)
+                
+                activity = ent.activity
+                if on_playfield == True:
+                    if activity != entity.ACTIVITY_ACTIVE:
+                        ent.set_activity(entity.ACTIVITY_ACTIVE)
+                        activity = entity.ACTIVITY_ACTIVE
+                elif activity == entity.ACTIVITY_ACTIVE:
+                    ent.set_activity(entity.ACTIVITY_LEAVING)
+                    activity = entity.ACTIVITY_LEAVING
+                    
+                counts[activity] += 1
+                if activity == entity.ACTIVITY_ACTIVE:
+                    active.append(ent)
+        else:
+            for ent in self.entity_list:
+                if ent.activity != entity.ACTIVITY_ACTIVE:
+                    ent.set_activity(entity.ACTIVITY_ACTIVE)
+            active = list(self.entity_list)
+            counts[entity.ACTIVITY_ACTIVE] = len(active)
+            
+        self.active_entities = active
+        self.activity_counts = counts
+        
+    def get_activity_counts(self):
+        '''
+        numbers of staging, active and leaving
+        Entitys in the last tick
+        '''
+        return tuple(self.activity_counts)
+        
+    def remove_entity(self, entity):
+        '''
+        takes an entity out of the game
+        '''
+        self.entity_list.remove(entity)
+        self.removed_entities.append(entity)
+        
+    def release_removed_entities(self):
+        '''
+        Give removed Entitys and SpriteActors
+        back to their Pools.
+        Done at the end of an update so nothing
+        still refers to them.
+        '''
+        for entity in self.removed_entities:
+            entity_pool = self.pools.get(entity.__class__)
+            if entity_pool != None:
+                entity_pool.release(entity)
+        del self.removed_entities[:]
     
     def key_down(self, key):
         '''
@@ -669,7 +1052,7 @@ class Game(object):
                     self.player.set_hp(0)
                     self.player.set_alive(False)
                     self.player_destroyed()
-                    self.entity_list.remove(self.player)
+                    self.remove_entity(self.player)
             '''
             elif key == pygame.K_p: # win the game
                 self.distance_travelled = self.distance
@@ -701,7 +1084,7 @@ class Game(object):
         '''
         if self.shooting:
             if self.player.can_shoot():
-                self.add_entity(self.player.shoot())
+                self.player.shoot()
             
     def remove_offscreen_entity(self, entity):
         '''
@@ -710,7 +1093,7 @@ class Game(object):
         -> Reduce lag
         '''
         if self.despawn_rect.colliderect(entity.get_bounding_rect()) == False:
-            self.entity_list.remove(entity)
+            self.remove_entity(entity)
             return True
         else:
             return False
@@ -723,8 +1106,7 @@ class Game(object):
         if entity.get_collidable() == False:
             return
 
-        # this G is made up because the real value is much too small for this purpose
-        G = 6.67 # x 10^-11
+        G = GAME_GRAVITY
         disp = hole.get_position().addition(entity.get_position().reversed())
         r_squared = disp.norm_squared()
         r_hat = disp.scaled(1/math.sqrt(r_squared))
@@ -798,6 +1180,9 @@ class Game(object):
         '''
         return self.final_distance
     
+    def get_seed(self):
+        return self.seed
+    
     def get_game_mode(self):
         return self.settings.mode
     
@@ -827,13 +1212,64 @@ class Game(object):
         self.game_over_message2.draw(surface)
         self.game_over_message3.draw(surface)
 
+    def set_quality_level(self, level):
+        '''
+        Cut back on the things a quality.Quality
+        covers. Only the collision substeps change
+        how the game plays out.
+        '''
+        self.quality_level = level
+        settings = quality.get_quality(level)
+        self.star_field.set_num_stars(settings.stars)
+        self.render_queue.set_angle_step(settings.angle_step)
+        self.explosions.set_max_drawn(settings.max_explosions)
+        self.hud_interval = settings.hud_interval
+        self.dynamics.max_substeps = settings.max_substeps
+        
+    def get_quality_level(self):
+        return self.quality_level
+    
+    def set_phase_timer(self, timer):
+        self.phase_timer = timer
+        
+    def get_phase_timer(self):
+        return self.phase_timer
+    
     def update(self, frametime):
         '''
-        Update EVERYTHING
+        Update EVERYTHING, in steps of the
+        tick rate if there is one
         '''
-        self.star_field.update(frametime)
+        tick_rate = self.settings.tick_rate
+        if tick_rate == None:
+            self.tick(frametime)
+            return
         
-        self.dynamics.resolve_collisions(self.entity_list, frametime)
+        # collisions are found at any step size, so the 
+        # simulation can run slower than the frame rate
+        tick_time = 1.0/tick_rate
+        self.tick_accumulator = min(self.tick_accumulator + frametime,
+                                    self.settings.max_ticks*tick_time)
+        while self.tick_accumulator >= tick_time:
+            self.tick_accumulator -= tick_time
+            self.tick(tick_time)
+            
+    def tick(self, frametime):
+        '''
+        Step the game forward by frametime
+        '''
+        timer = self.phase_timer
+        timer.start()
+        
+        self.star_field.update(frametime)
+        timer.mark('stars')
+        
+        self.update_activity()
+        timer.mark('activity')
+        self.dynamics.resolve_collisions(self.active_entities, frametime)
+        timer.mark('collisions')
+        self.shots.step(frametime, self.active_entities, self.dynamics)
+        timer.mark('shots')
         for entity1 in self.entity_list:
             entity1.update(frametime)
             
@@ -848,7 +1284,7 @@ class Game(object):
                     self.show_explosion(entity1)
                 self.update_points_display()
                     
-                self.entity_list.remove(entity1)
+                self.remove_entity(entity1)
                 continue # we don't need to do anything more with a dead Entity
             
             # remove Entitys that are outside of 
@@ -859,18 +1295,28 @@ class Game(object):
             # do Entity type-specific updates
             if isinstance(entity1, entity.Player):
                 self.wrap_player(entity1)
-            elif isinstance(entity1, entity.Hole):
-                # every entity1 is attracted to the hole
+            elif isinstance(entity1, entity.Hole) and entity1.is_active() == True:
+                # every active entity1 is attracted to the hole
                 for entity2 in self.entity_list:
-                    if entity2 == entity1:
+                    if entity2 == entity1 or entity2.is_active() == False:
                         continue # avoid divn by zero in hole_gravity_force (zero separation between ent and itself)
                     self.hole_gravity_force(entity1, entity2)
+                # and so are the shots
+                self.shots.attract(entity1.get_position(), GAME_GRAVITY*entity1.get_mass(), frametime)
+        timer.mark('entities')
+        
+        self.update_actors(frametime)
+        timer.mark('actors')
+        
+        self.explosions.update(frametime)
+        timer.mark('effects')
                     
         # update shield powerup display
         self.update_shield_display()
                     
         # update HP bar, regardless of if dead or not
         self.hp_bar.set_value(self.player.get_hp())
+        timer.mark('displays')
         
         '''
         Do the spawning and distance updates
@@ -887,6 +1333,10 @@ class Game(object):
                 # spawn the player when they finish exploding
                 if self.is_player_finished_exploding():
                     self.spawn_player()
+        timer.mark('spawning')
+                    
+        self.release_removed_entities()
+        timer.mark('release')
                     
                 
     def draw(self, surface):
@@ -895,12 +1345,43 @@ class Game(object):
         entities on top, basically.
         draw info texts and hp bar as well
         '''
+        self.draw_scene(surface)
+        self.draw_hud(surface)
+        
+    def draw_scene(self, surface, scale=1.0):
+        '''
+        Draw the star field and the entities,
+        with world coordinates multiplied by
+        scale, so a smaller surface can be
+        drawn and stretched to the display
+        '''
+        timer = self.phase_timer
+        
         surface.fill((0,0,0))
-        self.star_field.draw(surface)
-        for entity in self.entity_list:
-            entity.draw(surface)
-            
+        self.star_field.draw(surface, scale)
+        timer.mark('draw_stars')
+        
+        queue = self.render_queue
+        for ent in self.entity_list:
+            ent.submit(queue, render.RENDER_LAYER_ENTITIES, scale)
+        for actor in self.actor_list:
+            actor.submit(queue, render.RENDER_LAYER_ACTORS, scale)
+        self.shots.submit(queue, render.RENDER_LAYER_SHOTS, scale)
+        self.explosions.submit(queue, render.RENDER_LAYER_EFFECTS, scale)
+        timer.mark('draw_submit')
+        queue.flush(surface)
+        timer.mark('draw_blits')
+        
+    def draw_hud(self, surface):
+        '''
+        draw info texts and hp bar, or the
+        game over texts, at display size
+        '''
         if self.game_over == False:
+            self.hud_frames += 1
+            if self.hud_frames >= self.hud_interval:
+                self.infodisplay.refresh()
+                self.hud_frames = 0
             self.hp_bar.draw(surface)
             self.infodisplay.draw(surface)
         else:
@@ -0,0 +1,60 @@
+#
+# headless.py - run the game without a window
+#
+# Space Travel
+#     Copyright (C) 2014  Eric Eveleigh
+#
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU General Public License as published by
+#     the Free Software Foundation, either version 3 of the License, or
+#     (at your option) any later version.
+#
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU General Public License for more details.
+#
+#     You should have received a copy of the GNU General Public License
+#     along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+# imports
+import os
+
+# pygame prints a banner when it is first imported,
+# which would get mixed into output meant for other
+# programs; import this module before pygame
+os.environ['PYGAME_HIDE_SUPPORT_PROMPT'] = '1'
+
+import pygame
+import pygame.display
+
+DISPLAY_WIDTH = 800
+DISPLAY_HEIGHT = 600
+
+def init():
+    '''
+    Set up pygame with dummy video and audio
+    drivers. Must be called before the game
+    modules are imported because they load
+    fonts, images and sounds when imported.
+    '''
+    os.environ['SDL_VIDEODRIVER'] = 'dummy'
+    os.environ['SDL_AUDIODRIVER'] = 'dummy'
+
+    pygame.init()
+
+    # images are converted to the display format
+    # so some display mode has to be set
+    display = pygame.display.set_mode((1, 1))
+
+    import entity
+    entity.set_sound_enabled(False)
+
+    return display
+
+def create_game(difficulty, mode, seed, width=DISPLAY_WIDTH, height=DISPLAY_HEIGHT):
+    '''
+    create a Game as InGameScreen would
+    '''
+    import game
+    return game.Game(pygame.Rect(0, 0, width, height), difficulty, mode, seed)
@@ -0,0 +1,188 @@
+#
+# particles.py - short lived effects kept out of the entity list
+#
+# Space Travel
+#     Copyright (C) 2014  Eric Eveleigh
+#
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU General Public License as published by
+#     the Free Software Foundation, either version 3 of the License, or
+#     (at your option) any later version.
+#
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU General Public License for more details.
+#
+#     You should have received a copy of the GNU General Public License
+#     along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+# imports
+import pygame
+
+import render
+import surfaces
+
+EXPLOSION_IMAGES = ("obj/expl1.png", "obj/expl2.png", "obj/expl3.png",
+                    "obj/expl4.png", "obj/expl5.png")
+EXPLOSION_COLORKEY = (255,0,255)
+EXPLOSION_FRAME_TIME = 1.0/15.0
+
+def load_frames(filenames, colorkey):
+    '''
+    the images of an animation, loaded
+    like Entity.load_frame does
+    '''
+    return [surfaces.load_image(filename, colorkey) for filename in filenames]
+
+# frames shared by every Game, loaded when first needed
+# because the display has to be set up to convert them
+explosion_frames = None
+
+def get_explosion_frames():
+    global explosion_frames
+    if explosion_frames == None:
+        explosion_frames = load_frames(EXPLOSION_IMAGES, EXPLOSION_COLORKEY)
+    return explosion_frames
+
+class Effects(object):
+    '''
+    Animations that fly in a straight line and
+    play once, like explosions. They don't take
+    part in collisions or gravity, so instead of
+    an Entity each one is a slot in flat lists
+    that are all updated and drawn together.
+    '''
+    def __init__(self, frames, frame_time, bounds):
+        self.frames = frames
+        self.frame_time = frame_time
+        # frames and the offsets that centre them on
+        # a position, by the scale they are drawn at
+        self.scaled = {}
+        # the most effects drawn, newest first,
+        # or None for all of them
+        self.max_drawn = None
+        # effects outside this Rect are removed
+        self.bounds = pygame.Rect(bounds)
+
+        self.clear()
+
+    def clear(self):
+        '''
+        remove every effect
+        '''
+        self.x = []
+        self.y = []
+        self.vx = []
+        self.vy = []
+        # seconds each effect has been playing
+        self.age = []
+        self.frame = []
+        self.ids = []
+        self.next_id = 0
+
+    def __len__(self):
+        return len(self.ids)
+
+    def spawn(self, position, velocity):
+        '''
+        start an effect at position and return
+        its id
+        '''
+        effect_id = self.next_id
+        self.next_id += 1
+
+        self.x.append(position.x)
+        self.y.append(position.y)
+        self.vx.append(velocity.x)
+        self.vy.append(velocity.y)
+        self.age.append(0.0)
+        self.frame.append(0)
+        self.ids.append(effect_id)
+        return effect_id
+
+    def has(self, effect_id):
+        '''
+        is the effect with effect_id still playing?
+        '''
+        return effect_id in self.ids
+
+    def update(self, dt):
+        '''
+        move and animate every effect, then remove
+        the finished ones and those out of bounds
+        '''
+        if len(self.ids) == 0:
+            return
+
+        self.x = [x + vx*dt for x, vx in zip(self.x, self.vx)]
+        self.y = [y + vy*dt for y, vy in zip(self.y, self.vy)]
+        self.age = [age + dt for age in self.age]
+
+        # a frame lasts frame_time, like Entity animations
+        frame_time = self.frame_time
+        self.frame = [int(age/frame_time) for age in self.age]
+
+        num_frames = len(self.frames)
+        left = self.bounds.left
+        top = self.bounds.top
+        right = self.bounds.right
+        bottom = self.bounds.bottom
+        keep = [frame < num_frames and x >= left and x < right and y >= top and y < bottom
+                for x, y, frame in zip(self.x, self.y, self.frame)]
+        if False in keep:
+            self.remove(keep)
+
+    def remove(self, keep):
+        '''
+        keep only the effects whose entry
+        in keep is True
+        '''
+        for name in ('x', 'y', 'vx', 'vy', 'age', 'frame', 'ids'):
+            values = getattr(self, name)
+            setattr(self, name, [value for value, kept in zip(values, keep) if kept == True])
+
+    def get_frames(self, scale):
+        '''
+        the frames resized by scale, and the
+        offsets that centre them
+        '''
+        entry = self.scaled.get(scale)
+        if entry == None:
+            frames = [surfaces.get_scaled(frame, scale) for frame in self.frames]
+            offsets = [(frame.get_width()/2, frame.get_height()/2) for frame in frames]
+            entry = (frames, offsets)
+            self.scaled[scale] = entry
+        return entry
+
+    def set_max_drawn(self, max_drawn):
+        self.max_drawn = max_drawn
+
+    def get_batch(self, scale=1.0):
+        '''
+        (image, destination) of every effect
+        drawn at scale, up to max_drawn
+        '''
+        frames, offsets = self.get_frames(scale)
+        first = 0
+        if self.max_drawn != None:
+            first = max(len(self.ids) - self.max_drawn, 0)
+        batch = []
+        for x, y, frame in zip(self.x[first:], self.y[first:], self.frame[first:]):
+            offset = offsets[frame]
+            batch.append((frames[frame], (int(x*scale) - offset[0], int(y*scale) - offset[1])))
+        return batch
+
+    def submit(self, queue, layer, scale=1.0):
+        '''
+        add every effect to a render.RenderQueue
+        '''
+        if len(self.ids) > 0:
+            queue.extend(self.get_batch(scale), layer)
+
+    def draw(self, surface):
+        '''
+        draw every effect in one batch
+        '''
+        if len(self.ids) > 0:
+            render.blit_all(surface, self.get_batch())
@@ -20,12 +20,205 @@
 
 # imports
 import math
+from array import array
 import pygame.draw
 import pygame
 from vector import Vector2D
 
+# collision filter bits; objects in every category
+# colliding with every category by default
+COLLIDE_NONE = 0
+COLLIDE_ALL = 0xFFFF
+
+# added around swept boxes so rounding in the 
+# collision checks can't put a point outside
+SWEPT_BOX_MARGIN = 0.001
+
+# Bodies travelling farther than SUBSTEP_TRAVEL times their
+# collision radius, or turning more than SUBSTEP_ROTATION
+# radians, in one step are checked for collisions in up
+# to MAX_SUBSTEPS substeps
+SUBSTEP_TRAVEL = 0.5
+SUBSTEP_ROTATION = math.pi/8
+MAX_SUBSTEPS = 8
+
+# pairs whose separation is more than they can close
+# in a step skip the narrow phase; a separation has
+# to beat PAIR_CACHE_MIN_SEPARATION to be remembered
+PAIR_CACHE_MIN_SEPARATION = 0.5
+
+# contact solvers: resolve each collision in hit_by as
+# it is found, or gather the contacts of a step and 
+# solve their impulses together in CONTACT_ITERATIONS
+# passes, each from the velocities of the last
+SOLVER_SEQUENTIAL = 0
+SOLVER_BATCH = 1
+CONTACT_ITERATIONS = 4
+# coefficient of restitution of the batch solver
+CONTACT_RESTITUTION = 0.5
+
+# kinds of collision shape
+SHAPE_POLYGON = 0
+SHAPE_CIRCLE = 1
+SHAPE_CAPSULE = 2
+
+class Shape(object):
+    '''
+    Everything about a polygon that does not
+    depend on where an object is or how it is
+    turned. Objects with the same geometry
+    share one Shape, which must not be changed.
+    '''
+    kind = SHAPE_POLYGON
+    
+    def __init__(self, points):
+        # model space geometry
+        self.points = tuple([Vector2D(point.x, point.y) for point in points])
+        
+        # centroid; average of the points, used as CM
+        centroid = Vector2D()
+        npoints = len(self.points)
+        if npoints > 0:
+            for point in self.points:
+                centroid.x += point.x
+                centroid.y += point.y
+            centroid.scale(1.0/npoints)
+        self.centroid = centroid
+        
+        # points expressed as vectors from the centroid
+        self.phys_geom = tuple([point.addition(centroid.reversed()) for point in self.points])
+        
+        # face n goes from point n-1 to point n;
+        # edge vector and outward normal of each face
+        self.edges = tuple([self.phys_geom[n].addition(self.phys_geom[n-1].reversed())
+                            for n in xrange(npoints)])
+        self.normals = tuple([edge.normal() for edge in self.edges])
+        
+        # distance from the centroid to the farthest point
+        self.radius = 0.0
+        for point in self.phys_geom:
+            self.radius = max(self.radius, point.norm())
+        
+        # model space bounding box, always including the origin
+        self.bb_min = Vector2D()
+        self.bb_max = Vector2D()
+        for point in self.points:
+            if point.x < self.bb_min.x:
+                self.bb_min.x = point.x
+            if point.x > self.bb_max.x:
+                self.bb_max.x = point.x
+            if point.y < self.bb_min.y:
+                self.bb_min.y = point.y
+            if point.y > self.bb_max.y:
+                self.bb_max.y = point.y
+        
+        self.calc_mass_properties()
+        
+    def calc_mass_properties(self):
+        '''
+        area and moment of inertia about the
+        centroid for unit mass
+        http://en.wikipedia.org/wiki/List_of_moments_of_inertia
+        '''
+        points = list(self.phys_geom)
+        points.append(points[0])
+        sumtop = 0.0
+        sumbottom = 0.0
+        for n in xrange(len(self.phys_geom)):
+            cp = points[n]
+            np = points[n+1]
+            cross = np.cross2(cp)
+            sumtop += cross*(np.dot(np) + np.dot(cp) + cp.dot(cp)) 
+            sumbottom += cross
+        
+        self.area = math.fabs(sumbottom)/2.0
+        
+        # kept apart so get_moment gives exactly
+        # mass*sumtop/(60*sumbottom)
+        self.moment_top = sumtop
+        self.moment_bottom = 60.0 * sumbottom
+        self.unit_moment = self.get_moment(1.0)
+        
+    def get_moment(self, mass):
+        '''
+        moment of inertia of a body of
+        this Shape with mass
+        '''
+        try:
+            return (mass * self.moment_top) / self.moment_bottom
+        except ZeroDivisionError:
+            return float('+inf') # cause
+        
+    def get_area(self):
+        return self.area
+    
+    def get_centroid(self):
+        return self.centroid.copy()
+    
+class Circle(object):
+    '''
+    Collision shape of round objects: every
+    point within radius of the object's CM
+    '''
+    kind = SHAPE_CIRCLE
+    
+    def __init__(self, radius):
+        self.radius = radius
+        # distance from the CM to the farthest point
+        self.bounding_radius = radius
+        
+class Capsule(object):
+    '''
+    Collision shape of long thin objects: every 
+    point within radius of the segment from 
+    -half_length to half_length along the 
+    object's x axis through its CM
+    '''
+    kind = SHAPE_CAPSULE
+    
+    def __init__(self, half_length, radius):
+        self.half_length = half_length
+        self.radius = radius
+        # distance from the CM to the farthest point
+        self.bounding_radius = half_length + radius
+    
+# Shapes that have been made, by their points
+shapes = {}
+
+def get_shape(points):
+    '''
+    the shared Shape with points as
+    its geometry
+    '''
+    key = tuple([(point.x, point.y) for point in points])
+    shape = shapes.get(key)
+    if shape == None:
+        shape = Shape(points)
+        shapes[key] = shape
+    return shape
+
+# last uid given to an Object2D
+last_uid = 0
+
+def new_uid():
+    '''
+    a number no other Object2D has had, so an
+    object reset for reuse is not taken for
+    the one it was before
+    '''
+    global last_uid
+    last_uid += 1
+    return last_uid
+
 class Object2D(object):
+    # an Object2D's category has to be in the other object's
+    # mask, and the other way around, for the two to collide
+    collision_category = COLLIDE_ALL
+    collision_mask = COLLIDE_ALL
+    
     def __init__(self, position, velocity, orientation, ang_velocity, mass):
+        self.uid = new_uid()
+        
         self.position = Vector2D(position.get_x(), position.get_y())
         self.next_position = Vector2D()
         self.velocity = Vector2D(velocity.get_x(), velocity.get_y())
@@ -44,6 +237,12 @@ class Object2D(object):
 
         self.last_dt = 0.0
 
+        # shared Shape of the geometry
+        self.shape = None
+        # Circle or Capsule used for collisions instead
+        # of the geometry, which still gives the mass 
+        # properties; None to collide as the polygon
+        self.collision_shape = None
         # tuple of position vectors of polygon points
         self.geometry = ()
         
@@ -77,10 +276,61 @@ class Object2D(object):
         self.phys_geom = ()
         self.phys_geom_oriented = []
         self.oriented_faces = []
+        # the Shape's face normals turned to 
+        # normals_orientation, from get_oriented_normals
+        self.oriented_normals = ()
+        self.normals_orientation = None
+        
+        # what the collision checks of a frame use, from
+        # calc_swept_state: start and end of each vertex
+        # path over the step, faces at the next position
+        # as (start, end, face number) and the geometry
+        # at the next orientation
+        self.vertex_paths = []
+        self.next_faces = []
+        self.next_geom_oriented = []
         
         self.collided_with = []
         self.collidable = True
+
+    def reset_state(self, position, velocity, orientation, ang_velocity):
+        '''
+        Put the dynamic state back to that of a
+        new Object2D, keeping mass and geometry.
+        Used to reuse objects instead of creating
+        new ones, so vectors are set in place.
+        '''
+        self.uid = new_uid()
         
+        self.position.set(position.get_x(), position.get_y())
+        self.next_position.set()
+        self.velocity.set(velocity.get_x(), velocity.get_y())
+        self.next_velocity.set()
+        self.acceleration.set()
+        self.next_acceleration.set()
+
+        self.orientation = orientation
+        self.next_orientation = 0.0
+        self.ang_velocity = ang_velocity
+        self.next_ang_velocity = 0.0
+        self.ang_accel = 0.0
+        self.next_ang_accel = 0.0
+
+        self.last_dt = 0.0
+
+        self.force.set()
+        self.torque = 0.0
+
+        # unrotated, as after set_geometry
+        self.phys_geom_oriented = list(self.phys_geom)
+        self.calc_shape_bbox()
+
+        self.collided_with = []
+        self.collidable = True
+
+    def get_uid(self):
+        return self.uid
+    
     def get_position(self):
         return self.position.copy()
     
@@ -114,6 +364,37 @@ class Object2D(object):
     def get_collidable(self):
         return self.collidable
     
+    def set_collision_shape(self, shape):
+        '''
+        collide as a Circle or Capsule,
+        or as the geometry with None
+        '''
+        self.collision_shape = shape
+        
+    def get_collision_shape(self):
+        return self.collision_shape
+    
+    def get_collision_radius(self):
+        '''
+        distance from the CM to the farthest
+        point that can collide
+        '''
+        if self.collision_shape != None:
+            return self.collision_shape.bounding_radius
+        return self.shape.radius
+    
+    def set_collision_filter(self, category, mask):
+        self.collision_category = category
+        self.collision_mask = mask
+        
+    def can_collide_with(self, obj):
+        '''
+        do the collision filters of self
+        and obj allow them to collide?
+        '''
+        return ((self.collision_category & obj.collision_mask) != 0 and
+                (obj.collision_category & self.collision_mask) != 0)
+    
     def get_bounding_rect(self):
         left, top = self.bb_min.get_int()
         '''pos = self.get_position().get_int()
@@ -156,6 +437,14 @@ class Object2D(object):
                 self.bb_max.y = point.y
         self.bb_min.add(self.position)
         self.bb_max.add(self.position)
+        
+    def calc_shape_bbox(self):
+        '''
+        set bounding box from the unrotated Shape
+        '''
+        shape = self.shape
+        self.bb_min.set(shape.bb_min.x + self.position.x, shape.bb_min.y + self.position.y)
+        self.bb_max.set(shape.bb_max.x + self.position.x, shape.bb_max.y + self.position.y)
     
     def calc_cm(self, points):
         '''
@@ -174,70 +463,76 @@ class Object2D(object):
         self.cm = cm
 
 
-    def calc_moment(self):
-        '''
-        calculate moment of inertia about CM for rigid body
-        http://en.wikipedia.org/wiki/List_of_moments_of_inertia
-        '''
-        points = list(self.phys_geom)
-        points.append(points[0])
-        n = 0
-        sumtop = 0.0
-        sumbottom = 0.0
-        for point in self.phys_geom:
-            cp = points[n]
-            np = points[n+1]
-            cross = np.cross2(cp)
-            sumtop += cross*(np.dot(np) + np.dot(cp) + cp.dot(cp)) 
-            sumbottom += cross
-            n+=1
-        try:
-            self.moment = (self.mass * sumtop) / (60.0 * sumbottom)
-        except:
-            self.moment = float('+inf') # cause
-
     def get_oriented_geometry(self,orientation):
         '''
         calculate and return oriented 
         physics geometry and faces
         '''
-        n = 0
-        phys_geom_oriented = [None]*len(self.phys_geom)
-        oriented_faces = [None]*len(self.phys_geom)
-        for point in self.phys_geom:
-            phys_geom_oriented[n] = point.rotated(orientation)
-            point1 = phys_geom_oriented[n-1]
-            point2 = phys_geom_oriented[n]
-            oriented_faces[n] = (point1, point2)
-            n+=1
-        # loop does not get first face correctly
-        oriented_faces[0] = (phys_geom_oriented[-1], 
-                                  phys_geom_oriented[0])
+        # same rotation as Vector2D.rotate but only
+        # calculate cos/sin once for all the points
+        costheta = math.cos(orientation)
+        sintheta = math.sin(orientation)
+        phys_geom_oriented = [Vector2D(point.x*costheta - point.y*sintheta,
+                                       point.x*sintheta + point.y*costheta)
+                              for point in self.phys_geom]
+        # face n goes from point n-1 to point n
+        oriented_faces = [(phys_geom_oriented[n-1], phys_geom_oriented[n])
+                          for n in xrange(len(phys_geom_oriented))]
         return (phys_geom_oriented, oriented_faces)
+    
+    def orient_geometry(self):
+        '''
+        Turn the oriented geometry to the current
+        orientation. Points this Object2D has of its
+        own are set in place; the unrotated ones it
+        shares with its Shape are replaced.
+        '''
+        points = self.phys_geom_oriented
+        if len(points) == 0 or points[0] is self.phys_geom[0]:
+            self.phys_geom_oriented, self.oriented_faces = self.get_oriented_geometry(self.orientation)
+            return
+        costheta = math.cos(self.orientation)
+        sintheta = math.sin(self.orientation)
+        for point, base in zip(points, self.phys_geom):
+            point.x = base.x*costheta - base.y*sintheta
+            point.y = base.x*sintheta + base.y*costheta
+    
+    def get_oriented_normals(self, orientation):
+        '''
+        The outward normals of the faces at 
+        orientation. The Shape's normals are only
+        turned when asked for a new orientation, 
+        so the checks of a frame share them.
+        '''
+        if orientation != self.normals_orientation:
+            costheta = math.cos(orientation)
+            sintheta = math.sin(orientation)
+            self.oriented_normals = tuple([Vector2D(normal.x*costheta - normal.y*sintheta,
+                                                    normal.x*sintheta + normal.y*costheta)
+                                           for normal in self.shape.normals])
+            self.normals_orientation = orientation
+        return self.oriented_normals
 
-    def calc_phys_geom(self):
+    def set_shape(self, shape):
         '''
-        create physics geometry 
-        centered about CM
+        use shape as geometry and 
+        calculate BB and moment
         '''
-        self.phys_geom = []
-        for point in self.geometry:
-            self.phys_geom.append(point.addition(self.cm.reversed()))
+        self.shape = shape
+        self.geometry = shape.points
+        self.cm = shape.centroid
+        self.phys_geom = shape.phys_geom
         self.phys_geom_oriented = list(self.phys_geom)
         self.oriented_faces = [(Vector2D(),Vector2D())]*len(self.phys_geom_oriented)
-
-        self.phys_geom = tuple(self.phys_geom)
+        self.normals_orientation = None
+        self.calc_shape_bbox()
+        self.moment = shape.get_moment(self.mass)
     
-    # 
     def set_geometry(self, points):
         '''
         set geometry and calculate BB
         '''
-        self.geometry = points
-        self.calc_bbox(points)
-        self.calc_cm(points)
-        self.calc_phys_geom()
-        self.calc_moment()
+        self.set_shape(get_shape(points))
 
     def add_torque(self, r, force):
         '''
@@ -301,6 +596,35 @@ class Object2D(object):
         self.next_ang_velocity = self.ang_velocity + self.ang_accel*dt 
         self.next_ang_accel = self.torque/self.moment
         
+    def calc_swept_state(self, dt):
+        '''
+        Calculate next object state and the
+        geometry collisions are checked with:
+        the path of each vertex over dt and
+        the faces at the next position
+        '''
+        self.calc_next_state(dt)
+        
+        # Circles and Capsules are swept by Dynamics
+        # from the next state alone
+        if self.collision_shape != None:
+            return
+        
+        next_geom, next_faces = self.get_oriented_geometry(self.next_orientation)
+        self.next_geom_oriented = next_geom
+        
+        paths = []
+        i = 0
+        for vert in next_geom:
+            a1 = vert.addition(self.position)
+            a2 = a1.addition(self.vert_abs_velocity(i).scaled(dt))
+            paths.append((a1, a2))
+            i += 1
+        self.vertex_paths = paths
+        
+        next_position = self.next_position
+        self.next_faces = [(next_faces[n][0].addition(next_position), next_faces[n][1].addition(next_position), n)
+                           for n in xrange(len(next_faces))]
     
     def update(self, dt):
         '''
@@ -333,6 +657,30 @@ class Object2D(object):
         self.last_dt = dt
         
         self.collided_with = []
+        
+    def drift(self, dt):
+        '''
+        Cheap update for objects taking no part in
+        collisions: move with constant velocities, 
+        leaving the oriented geometry as it is. The
+        bounding box is set around the collision 
+        radius for despawning.
+        '''
+        self.position.x += self.velocity.x*dt
+        self.position.y += self.velocity.y*dt
+        self.orientation += self.ang_velocity*dt
+        self.limit_orientation()
+        
+        self.torque = 0
+        self.force.set(0.0,0.0)
+        
+        radius = self.get_collision_radius()
+        self.bb_min.set(self.position.x - radius, self.position.y - radius)
+        self.bb_max.set(self.position.x + radius, self.position.y + radius)
+        
+        self.last_dt = dt
+        
+        self.collided_with = []
 
     def point_abs_velocity(self, r):
         '''
@@ -388,6 +736,10 @@ class Object2D(object):
         
         This code cold be alot cleaner...
         '''
+        if collision.solver != None:
+            # solved with the step's other contacts
+            collision.solver.add_contact(self, obj, collision)
+            return
         
         r1 = collision.point.addition(self.position.reversed())
         r2 = collision.point.addition(obj.position.reversed())
@@ -462,9 +814,9 @@ class Object2D(object):
         
         # draw face normals
         faces = self.get_oriented_geometry(self.orientation)[1]
-        for face in faces:
+        normals = self.get_oriented_normals(self.orientation)
+        for face, normal in zip(faces, normals):
             vect = face[1].addition(face[0].reversed())
-            normal = vect.normal()
             midpoint = face[0].addition(vect.scaled(0.5)).addition(self.position)
             finalpoint = midpoint.addition(normal.scaled(10))
             pygame.draw.line(surface, (255,255,0), midpoint.get_int(), finalpoint.get_int())
@@ -484,22 +836,271 @@ class Object2D(object):
         
         pygame.draw.rect(surface, (255, 255, 255), bbox, 1)
 
+"""
+Closed form sweeps for Circles and Capsules. A point p moves 
+by d over the step; each returns the fraction t of d at which 
+it first comes within radius of the other shape, 0.0 if it 
+already is, or None if it does not in this step.
+"""
+def sweep_point_circle(px, py, dx, dy, cx, cy, radius):
+    '''
+    sweep p against the circle around c
+    '''
+    mx = px - cx
+    my = py - cy
+    c = mx*mx + my*my - radius*radius
+    if c <= 0.0:
+        return 0.0
+    b = mx*dx + my*dy
+    if b >= 0.0:
+        return None # moving away
+    a = dx*dx + dy*dy
+    disc = b*b - a*c
+    if disc < 0.0:
+        return None
+    t = (-b - math.sqrt(disc))/a
+    if t > 1.0:
+        return None
+    return t
+
+def sweep_point_capsule(px, py, dx, dy, ax, ay, bx, by, radius):
+    '''
+    sweep p against the capsule around
+    the segment from a to b
+    '''
+    t = sweep_point_circle(px, py, dx, dy, ax, ay, radius)
+    if t == 0.0:
+        return t
+    t_end = sweep_point_circle(px, py, dx, dy, bx, by, radius)
+    if t_end != None and (t == None or t_end < t):
+        t = t_end
+    
+    ux = bx - ax
+    uy = by - ay
+    length = math.sqrt(ux*ux + uy*uy)
+    if length == 0.0:
+        return t
+    ux /= length
+    uy /= length
+    
+    # signed distance from the segment's line
+    # now and its change over the step
+    s = (px - ax)*(-uy) + (py - ay)*ux
+    ds = dx*(-uy) + dy*ux
+    if math.fabs(s) <= radius:
+        t_side = 0.0
+    elif s > radius and ds < 0.0:
+        t_side = (radius - s)/ds
+    elif s < -radius and ds > 0.0:
+        t_side = (-radius - s)/ds
+    else:
+        return t
+    
+    if t_side <= 1.0 and (t == None or t_side < t):
+        along = (px + dx*t_side - ax)*ux + (py + dy*t_side - ay)*uy
+        if along >= 0.0 and along <= length:
+            t = t_side
+    return t
+
+def sweep_point_polygon(px, py, dx, dy, points, radius):
+    '''
+    sweep p against the convex polygon with 
+    points, grown by radius
+    '''
+    t = None
+    inside = True
+    npoints = len(points)
+    for n in xrange(npoints):
+        # face n goes from point n-1 to point n
+        ax, ay = points[n-1]
+        bx, by = points[n]
+        ex = bx - ax
+        ey = by - ay
+        length = math.sqrt(ex*ex + ey*ey)
+        if length == 0.0:
+            continue
+        # outward normal
+        nx = -ey/length
+        ny = ex/length
+        
+        s = (px - ax)*nx + (py - ay)*ny
+        ds = dx*nx + dy*ny
+        if s > 0.0:
+            inside = False
+            if s <= radius:
+                t_face = 0.0
+            elif ds < 0.0:
+                t_face = (radius - s)/ds
+            else:
+                t_face = None
+            if t_face != None and t_face <= 1.0 and (t == None or t_face < t):
+                along = ((px + dx*t_face - ax)*ex + (py + dy*t_face - ay)*ey)/length
+                if along >= 0.0 and along <= length:
+                    t = t_face
+        
+        if radius > 0.0:
+            t_corner = sweep_point_circle(px, py, dx, dy, ax, ay, radius)
+            if t_corner != None and (t == None or t_corner < t):
+                t = t_corner
+                
+    if inside == True:
+        return 0.0
+    return t
+
+def sweep_point_core(px, py, dx, dy, kind, points, radius):
+    '''
+    sweep p against a collision shape core 
+    of kind, grown by radius
+    '''
+    if kind == SHAPE_CIRCLE:
+        return sweep_point_circle(px, py, dx, dy, points[0][0], points[0][1], radius)
+    elif kind == SHAPE_CAPSULE:
+        return sweep_point_capsule(px, py, dx, dy, points[0][0], points[0][1],
+                                   points[1][0], points[1][1], radius)
+    else:
+        return sweep_point_polygon(px, py, dx, dy, points, radius)
+
+def closest_point_core(px, py, kind, points):
+    '''
+    Point of a collision shape core closest to
+    p and the distance to it, negative inside
+    polygons. Returns (x, y, distance, normal)
+    where normal is the outward face normal if
+    p is inside, else None.
+    '''
+    if kind == SHAPE_CIRCLE:
+        qx, qy = points[0]
+        return qx, qy, math.hypot(px - qx, py - qy), None
+    
+    if kind == SHAPE_CAPSULE:
+        segments = ((points[0], points[1]),)
+    else:
+        segments = [(points[n-1], points[n]) for n in xrange(len(points))]
+        
+    best = None
+    inside = (kind == SHAPE_POLYGON)
+    deepest = None
+    for (ax, ay), (bx, by) in segments:
+        ex = bx - ax
+        ey = by - ay
+        length_squared = ex*ex + ey*ey
+        if length_squared > 0.0:
+            along = ((px - ax)*ex + (py - ay)*ey)/length_squared
+            along = min(max(along, 0.0), 1.0)
+        else:
+            along = 0.0
+        qx = ax + ex*along
+        qy = ay + ey*along
+        distance = math.hypot(px - qx, py - qy)
+        if best == None or distance < best[2]:
+            best = (qx, qy, distance, None)
+        
+        if inside == True and length_squared > 0.0:
+            length = math.sqrt(length_squared)
+            nx = -ey/length
+            ny = ex/length
+            s = (px - ax)*nx + (py - ay)*ny
+            if s > 0.0:
+                inside = False
+            elif deepest == None or s > deepest[0]:
+                deepest = (s, nx, ny)
+                
+    if inside == True and deepest != None:
+        s, nx, ny = deepest
+        return px - nx*s, py - ny*s, s, Vector2D(nx, ny)
+    return best
+
+def project_core(points, radius, ax, ay):
+    '''
+    lowest and highest projection on the unit
+    axis a of a core with points grown by radius
+    '''
+    low = high = points[0][0]*ax + points[0][1]*ay
+    for px, py in points:
+        s = px*ax + py*ay
+        if s < low:
+            low = s
+        elif s > high:
+            high = s
+    return low - radius, high + radius
+
 class Dynamics(object):
     '''
     Produce the dynamic physics that looks
     good.
     '''
+    class PairCacheEntry(object):
+        '''
+        What is known about a pair that did not
+        collide: the cores were separation apart 
+        along the unit axis, from the first object
+        to the second, when the objects had the 
+        poses stored here.
+        '''
+        def __init__(self, frame, separation, axis, obj1, obj2):
+            # resolve_collisions call that last used it
+            self.frame = frame
+            self.separation = separation
+            self.axis = axis
+            self.pose1 = (obj1.position.x, obj1.position.y, obj1.orientation)
+            self.pose2 = (obj2.position.x, obj2.position.y, obj2.orientation)
+    
+    def __init__(self):
+        # per resolve_collisions call: pairs skipped by
+        # the collision filters, pairs whose swept boxes
+        # overlap and pairs that reached check_collisions
+        self.filtered_pairs = 0
+        self.broad_phase_pairs = 0
+        self.narrow_phase_calls = 0
+        # pairs checked in substeps
+        self.substepped_pairs = 0
+        # the most substeps a pair is checked in
+        self.max_substeps = MAX_SUBSTEPS
+        # pairs the pair cache let skip the narrow phase
+        # and pairs it could not
+        self.pair_cache_hits = 0
+        self.pair_cache_misses = 0
+        
+        # PairCacheEntrys of pairs whose swept boxes 
+        # overlap, by the uids of the objects, lowest 
+        # first; an entry is dropped when its pair is 
+        # not checked in a resolve_collisions
+        self.pair_cache = {}
+        self.pair_cache_enabled = True
+        self.frame = 0
+        self.pair_cache_kept = 0
+        
+        self.solver = SOLVER_SEQUENTIAL
+        self.contact_iterations = CONTACT_ITERATIONS
+        # (object hit, object hitting, Collision) of
+        # the step, for the batch solver
+        self.contacts = []
+        self.contacts_solved = 0
+        
+        # swept bounding box of each object in the last 
+        # resolve_collisions, by index in the object list:
+        # min x, min y, max x, max y
+        self.swept_boxes = array('d')
+        # whether calc_swept_state is up to date for
+        # the object at each index
+        self.swept_ready = array('b')
+        
     class Collision(object):
         '''
         Store collision data
         '''
         # obj1 is hitting obj2
-        def __init__(self, obj1, obj2, point, normal, time):
+        def __init__(self, obj1, obj2, point, normal, time, toi=0.0):
             self.obj1 = obj1
             self.obj2 = obj2
             self.point = point
             self.normal = normal
             self.time = time
+            # time of impact as a fraction of the step
+            self.toi = toi
+            # Dynamics gathering contacts for the batch
+            # solver, or None to resolve in hit_by
+            self.solver = None
     
         def resolve(self):
             self.obj2.hit_by(self.obj1, self)
@@ -508,12 +1109,54 @@ class Dynamics(object):
             return self.obj1 == obj1 and self.obj2 == obj2
 
     
-    def bbox_intersect(self,box1, box2):
+    def calc_swept_box(self, obj, dt, index):
+        '''
+        Store the box around everything check_collisions
+        can look at for obj over dt, however fast it
+        moves: vertex paths start within the Shape's
+        radius of the position and end, like the faces
+        at the next position, within the radius grown 
+        by the rotation of one step around the next 
+        position.
+        '''
+        radius = obj.get_collision_radius()
+        x = obj.position.x
+        y = obj.position.y
+        next_x = x + obj.velocity.x*dt
+        next_y = y + obj.velocity.y*dt
+        next_radius = radius + radius*math.fabs(obj.ang_velocity)*dt
+        
+        radius += SWEPT_BOX_MARGIN
+        next_radius += SWEPT_BOX_MARGIN
+        
+        boxes = self.swept_boxes
+        k = 4*index
+        boxes[k] = min(x - radius, next_x - next_radius)
+        boxes[k+1] = min(y - radius, next_y - next_radius)
+        boxes[k+2] = max(x + radius, next_x + next_radius)
+        boxes[k+3] = max(y + radius, next_y + next_radius)
+        
+        self.swept_ready[index] = 0
+        
+    def prepare_swept_state(self, obj, dt, index):
+        '''
+        calculate obj's next state and vertex
+        paths if not done since its box was
         '''
-        find if two Rects intersect
-        returns False if no intersection exists
+        if self.swept_ready[index] == 0:
+            obj.calc_swept_state(dt)
+            self.swept_ready[index] = 1
+        
+    def swept_boxes_intersect(self, index1, index2):
+        '''
+        do the swept boxes of the objects at
+        index1 and index2 overlap?
         '''
-        return box1.colliderect(box2)
+        boxes = self.swept_boxes
+        k1 = 4*index1
+        k2 = 4*index2
+        return (boxes[k1] <= boxes[k2+2] and boxes[k2] <= boxes[k1+2] and
+                boxes[k1+1] <= boxes[k2+3] and boxes[k2+1] <= boxes[k1+3])
 
     def check_collisions(self, obj1, obj2, dt):
         '''
@@ -525,60 +1168,515 @@ class Dynamics(object):
         http://en.wikipedia.org/wiki/Hyperplane_separation_theorem
         '''
         collision = None
-        geometry1 = obj1.get_oriented_geometry(obj1.next_orientation)
-        geometry2 = obj2.get_oriented_geometry(obj2.next_orientation)
 
-        # app for obj1 hitting obj2
-        faces = geometry2[1]
-        verts = geometry1[0]
-        i = 0
-        for vert in verts:
-            a1 = vert.addition(obj1.position)
-            a2 = a1.addition(obj1.vert_abs_velocity(i).scaled(dt))
-            i += 1
-            for face in faces:
-                b1 = face[0].addition(obj2.next_position)
-                b2 = face[1].addition(obj2.next_position)
-                
+        # app for obj1 hitting obj2;
+        # calc_swept_state has prepared both
+        faces = obj2.next_faces
+        for a1, a2 in obj1.vertex_paths:
+            for b1, b2, face in faces:
                 col = Vector2D.intersection(a1, a2, b1, b2)
                 if col != None and (collision == None or col[1] < collision.time):
-                    normal = face[1].addition(face[0].reversed()).normal() # collision normal
-                    collision = Dynamics.Collision(obj1, obj2, col[0], normal,  col[1])
+                    normal = obj2.get_oriented_normals(obj2.next_orientation)[face] # collision normal
+                    # col[1] is the distance along the vertex path
+                    length = math.hypot(a2.x - a1.x, a2.y - a1.y)
+                    if length > 0.0:
+                        toi = min(col[1]/length, 1.0)
+                    else:
+                        toi = 0.0
+                    collision = Dynamics.Collision(obj1, obj2, col[0], normal,  col[1], toi)
         return collision
         
     
+    def get_core(self, obj):
+        '''
+        The kind of obj's collision shape, the points
+        of its core at the current position and next
+        orientation and the radius around them
+        '''
+        shape = obj.collision_shape
+        x = obj.position.x
+        y = obj.position.y
+        if shape == None:
+            return SHAPE_POLYGON, [(point.x + x, point.y + y) for point in obj.next_geom_oriented], 0.0
+        elif shape.kind == SHAPE_CIRCLE:
+            return SHAPE_CIRCLE, [(x, y)], shape.radius
+        else:
+            half_x = math.cos(obj.next_orientation)*shape.half_length
+            half_y = math.sin(obj.next_orientation)*shape.half_length
+            return SHAPE_CAPSULE, [(x - half_x, y - half_y), (x + half_x, y + half_y)], shape.radius
+        
+    def sweep_shapes(self, obj1, obj2, dt):
+        '''
+        Collision of obj1 and obj2 when either has
+        a Circle or Capsule shape, swept in closed
+        form with obj2 at rest and obj1 moving by 
+        their relative velocity. Normal points away
+        from obj2, like a face normal of obj2 in
+        check_collisions.
+        '''
+        kind1, points1, radius1 = self.get_core(obj1)
+        kind2, points2, radius2 = self.get_core(obj2)
+        dx = (obj1.velocity.x - obj2.velocity.x)*dt
+        dy = (obj1.velocity.y - obj2.velocity.y)*dt
+        
+        '''
+        Contact between the grown cores first 
+        happens at a core point of one of them, 
+        so sweep the points of each against the 
+        other grown by both radii.
+        '''
+        radius = radius1 + radius2
+        t = None
+        for px, py in points1:
+            t_point = sweep_point_core(px, py, dx, dy, kind2, points2, radius)
+            if t_point != None and (t == None or t_point < t):
+                t = t_point
+        if t != 0.0:
+            for px, py in points2:
+                t_point = sweep_point_core(px, py, -dx, -dy, kind1, points1, radius)
+                if t_point != None and (t == None or t_point < t):
+                    t = t_point
+        if t == None:
+            return None
+        
+        # closest points of the cores at t, with obj1 moved
+        offset_x = dx*t
+        offset_y = dy*t
+        best = None
+        for px, py in points1:
+            px += offset_x
+            py += offset_y
+            qx, qy, distance, normal = closest_point_core(px, py, kind2, points2)
+            if best == None or distance < best[0]:
+                best = (distance, px, py, qx, qy, normal)
+        for qx, qy in points2:
+            px, py, distance, normal = closest_point_core(qx - offset_x, qy - offset_y, kind1, points1)
+            if best == None or distance < best[0]:
+                if normal != None:
+                    normal.reverse()
+                best = (distance, px + offset_x, py + offset_y, qx, qy, normal)
+        distance, px, py, qx, qy, normal = best
+        
+        if normal == None:
+            normal = Vector2D(px - qx, py - qy).direction()
+            if normal.x == 0.0 and normal.y == 0.0:
+                normal = Vector2D(-dx, -dy).direction()
+                if normal.x == 0.0 and normal.y == 0.0:
+                    normal = Vector2D(1.0, 0.0)
+        
+        point = Vector2D(qx + normal.x*radius2, qy + normal.y*radius2)
+        time = t*math.sqrt(dx*dx + dy*dy)
+        return Dynamics.Collision(obj1, obj2, point, normal, time, t)
+        
     def find_collision(self, obj1, obj2, dt):
         '''
         returns a Collision if obj1 and obj2 will
         collide next update. Returns None if not
         This /should/ be improved
+        
+        calc_swept_state must have been called on 
+        both, resolve_collisions does that.
+        '''
+        self.narrow_phase_calls += 1
+        if obj1.collision_shape != None or obj2.collision_shape != None:
+            return self.sweep_shapes(obj1, obj2, dt)
+        
+        collision12 = self.check_collisions(obj1, obj2, dt) # obj1 on 2
+        collision21 = self.check_collisions(obj2, obj1, dt) # obj2 on 1
+
+        '''
+        Check which collision happens sooner,
+        or at all.
         '''
-        # TODO: change to use next state bbox
-        obj1.calc_bbox(obj1.phys_geom_oriented)
-        obj2.calc_bbox(obj2.phys_geom_oriented)
-        bbox1 = obj1.get_bounding_rect()
-        bbox2 = obj2.get_bounding_rect()
+        if collision12 == None:
+            collision = collision21
+        elif collision21 == None:
+            collision = collision12
+        elif collision12.time < collision21.time:
+            collision = collision12
+        else:
+            collision = collision21
 
+        return collision
+    
+    def get_substeps(self, obj, dt, travel=True):
+        '''
+        How many substeps obj needs in a step of dt
+        so no collision is missed: fast bodies move
+        only part of their size and turn a little in
+        each. Swept Circles and Capsules don't need
+        substeps for travel, only for turning.
+        '''
+        steps = 1.0
+        if travel == True:
+            radius = obj.get_collision_radius()
+            if radius > 0.0:
+                distance = math.hypot(obj.velocity.x, obj.velocity.y)*dt
+                steps = max(steps, distance/(SUBSTEP_TRAVEL*radius))
+        steps = max(steps, math.fabs(obj.ang_velocity)*dt/SUBSTEP_ROTATION)
+        return min(int(math.ceil(steps)), self.max_substeps)
+    
+    def find_collision_substeps(self, obj1, obj2, dt, substeps):
+        '''
+        Check for the first collision of obj1 and obj2
+        in substeps equal parts of dt. Both move with
+        their current velocities to the start of each
+        substep. The Collision's point is moved back
+        with obj2 and its toi is a fraction of dt.
+        '''
+        position1 = obj1.position
+        orientation1 = obj1.orientation
+        position2 = obj2.position
+        orientation2 = obj2.orientation
+        
+        sub_dt = dt/substeps
         collision = None
-        if self.bbox_intersect(bbox1, bbox2) == True:
-            collision12 = self.check_collisions(obj1, obj2, dt) # obj1 on 2
-            collision21 = self.check_collisions(obj2, obj1, dt) # obj2 on 1
-
-            '''
-            Check which collision happens sooner,
-            or at all.
-            '''
-            if collision12 == None:
-                collision = collision21
-            elif collision21 == None:
-                collision = collision12
-            elif collision12.time < collision21.time:
-                collision = collision12
+        try:
+            for step in xrange(substeps):
+                elapsed = step*sub_dt
+                obj1.position = position1.addition(obj1.velocity.scaled(elapsed))
+                obj1.orientation = orientation1 + obj1.ang_velocity*elapsed
+                obj2.position = position2.addition(obj2.velocity.scaled(elapsed))
+                obj2.orientation = orientation2 + obj2.ang_velocity*elapsed
+                
+                obj1.calc_swept_state(sub_dt)
+                obj2.calc_swept_state(sub_dt)
+                collision = self.find_collision(obj1, obj2, sub_dt)
+                if collision != None:
+                    collision.point.add(position2).add(obj2.position.reversed())
+                    collision.toi = (step + collision.toi)/substeps
+                    break
+        finally:
+            obj1.position = position1
+            obj1.orientation = orientation1
+            obj2.position = position2
+            obj2.orientation = orientation2
+            
+        return collision
+    
+    def get_pose_core(self, obj):
+        '''
+        The points of obj's collision shape core at 
+        its current pose, the radius around them and
+        the axes that can separate it from others
+        '''
+        shape = obj.collision_shape
+        x = obj.position.x
+        y = obj.position.y
+        costheta = math.cos(obj.orientation)
+        sintheta = math.sin(obj.orientation)
+        if shape == None:
+            shape = obj.shape
+            points = [(point.x*costheta - point.y*sintheta + x, point.x*sintheta + point.y*costheta + y)
+                      for point in shape.phys_geom]
+            axes = [(normal.x, normal.y) for normal in obj.get_oriented_normals(obj.orientation)]
+            return points, 0.0, axes
+        elif shape.kind == SHAPE_CIRCLE:
+            return [(x, y)], shape.radius, []
+        else:
+            half_x = costheta*shape.half_length
+            half_y = sintheta*shape.half_length
+            return [(x - half_x, y - half_y), (x + half_x, y + half_y)], shape.radius, [(-sintheta, costheta)]
+    
+    def measure_separation(self, obj1, obj2, witness, needed):
+        '''
+        How far apart along some axis the collision
+        shapes of obj1 and obj2 are now, as 
+        (separation, axis from obj1 to obj2). The 
+        witness axis of the last measurement is 
+        tried first; only if it is not more than 
+        needed apart are the axis between the 
+        centres and the face axes searched.
+        '''
+        points1, radius1, axes1 = self.get_pose_core(obj1)
+        points2, radius2, axes2 = self.get_pose_core(obj2)
+        
+        best = None
+        if witness != None:
+            low1, high1 = project_core(points1, radius1, witness[0], witness[1])
+            low2, high2 = project_core(points2, radius2, witness[0], witness[1])
+            best = (low2 - high1, witness)
+            if best[0] > needed:
+                return best
+        
+        candidates = list(axes1) + axes2
+        dx = obj2.position.x - obj1.position.x
+        dy = obj2.position.y - obj1.position.y
+        distance = math.sqrt(dx*dx + dy*dy)
+        if distance > 0.0:
+            candidates.append((dx/distance, dy/distance))
+        for ax, ay in candidates:
+            low1, high1 = project_core(points1, radius1, ax, ay)
+            low2, high2 = project_core(points2, radius2, ax, ay)
+            # either side of the axis can separate them
+            if low2 - high1 >= low1 - high2:
+                separation = (low2 - high1, (ax, ay))
             else:
-                collision = collision21
+                separation = (low1 - high2, (-ax, -ay))
+            if best == None or separation[0] > best[0]:
+                best = separation
+        return best
         
-
-        return collision
+    def get_closing_bound(self, obj1, obj2, dt):
+        '''
+        How much closer than they are the collision
+        checks of obj1 and obj2 over dt can put any 
+        points of theirs: vertex paths start where
+        the object is but faces are where it will 
+        be, so either one may move alone, and the 
+        vertices turn once to the next orientation 
+        and then move with their rotation.
+        '''
+        vx1 = obj1.velocity.x
+        vy1 = obj1.velocity.y
+        vx2 = obj2.velocity.x
+        vy2 = obj2.velocity.y
+        travel = max(math.sqrt((vx1 - vx2)**2 + (vy1 - vy2)**2),
+                     math.sqrt(vx1*vx1 + vy1*vy1), math.sqrt(vx2*vx2 + vy2*vy2))*dt
+        turn1 = 2.0*math.fabs(obj1.ang_velocity)*dt + math.fabs(obj1.ang_accel)*dt*dt
+        turn2 = 2.0*math.fabs(obj2.ang_velocity)*dt + math.fabs(obj2.ang_accel)*dt*dt
+        return travel + obj1.get_collision_radius()*turn1 + obj2.get_collision_radius()*turn2
+    
+    def get_pair_key(self, obj1, obj2):
+        '''
+        key of obj1 and obj2 in the pair cache
+        and the two in the order of the key
+        '''
+        if obj1.uid < obj2.uid:
+            return (obj1.uid, obj2.uid), obj1, obj2
+        return (obj2.uid, obj1.uid), obj2, obj1
+    
+    def check_pair_cache(self, obj1, obj2, dt):
+        '''
+        Can obj1 and obj2 skip the narrow phase? 
+        They can if the separation last measured, 
+        less how far they have moved and turned 
+        since, is more than they can close in dt.
+        '''
+        key, obj1, obj2 = self.get_pair_key(obj1, obj2)
+        entry = self.pair_cache.get(key)
+        if entry == None:
+            return False
+        
+        x1, y1, orientation1 = entry.pose1
+        x2, y2, orientation2 = entry.pose2
+        # a point turned by an angle moves 
+        # 2*r*sin(angle/2) however many times over
+        moved = (math.hypot((obj1.position.x - x1) - (obj2.position.x - x2),
+                            (obj1.position.y - y1) - (obj2.position.y - y2)) +
+                 2.0*obj1.get_collision_radius()*math.fabs(math.sin((obj1.orientation - orientation1)/2.0)) +
+                 2.0*obj2.get_collision_radius()*math.fabs(math.sin((obj2.orientation - orientation2)/2.0)))
+        if entry.separation - moved > self.get_closing_bound(obj1, obj2, dt):
+            entry.frame = self.frame
+            self.pair_cache_kept += 1
+            return True
+        return False
+    
+    def update_pair_cache(self, obj1, obj2, dt, collision):
+        '''
+        remember how far apart obj1 and obj2 are
+        after the narrow phase found collision
+        '''
+        key, obj1, obj2 = self.get_pair_key(obj1, obj2)
+        entry = self.pair_cache.get(key)
+        if collision == None:
+            if entry != None:
+                witness = entry.axis
+            else:
+                witness = None
+            separation, axis = self.measure_separation(obj1, obj2, witness,
+                                                       self.get_closing_bound(obj1, obj2, dt))
+            if separation > PAIR_CACHE_MIN_SEPARATION:
+                self.pair_cache[key] = Dynamics.PairCacheEntry(self.frame, separation, axis, obj1, obj2)
+                self.pair_cache_kept += 1
+                return
+        if entry != None:
+            del self.pair_cache[key]
+            
+    def evict_pair_cache(self):
+        '''
+        drop the entries of pairs that were not 
+        checked in this resolve_collisions
+        '''
+        if len(self.pair_cache) > self.pair_cache_kept:
+            frame = self.frame
+            self.pair_cache = dict([(key, entry) for key, entry in self.pair_cache.iteritems()
+                                    if entry.frame == frame])
+    
+    def add_contact(self, obj1, obj2, collision):
+        '''
+        gather obj1 being hit by obj2 for
+        solve_contacts
+        '''
+        self.contacts.append((obj1, obj2, collision))
+        
+    def solve_contacts(self, dt):
+        '''
+        Solve the impulses of all the contacts of
+        a step together. Each pass works out the 
+        impulse of every contact from the velocities
+        left by the last pass, then applies them all,
+        shared out between the contacts of a body.
+        The contacts are put in order of the uids of
+        their objects first, so the result does not
+        depend on the order pairs were checked in.
+        Like resolve_at_impact, bodies then move back
+        by the change in velocity up to their 
+        earliest time of impact.
+        '''
+        contacts = self.contacts
+        self.contacts = []
+        self.contacts_solved = len(contacts)
+        if len(contacts) == 0:
+            return
+        contacts.sort(key=lambda contact: (contact[0].uid, contact[1].uid))
+        
+        # velocities, inverse mass and moment, contact 
+        # count and earliest time of impact of each body
+        bodies = []
+        body_index = {}
+        vx = array('d')
+        vy = array('d')
+        w = array('d')
+        inv_mass = array('d')
+        inv_moment = array('d')
+        count = array('i')
+        toi = array('d')
+        
+        # bodies, normal, moment arms, effective mass,
+        # target normal velocity and total impulse of
+        # each contact
+        index1 = array('i')
+        index2 = array('i')
+        nx = array('d')
+        ny = array('d')
+        rn1 = array('d')
+        rn2 = array('d')
+        r1x = array('d')
+        r1y = array('d')
+        r2x = array('d')
+        r2y = array('d')
+        inv_k = array('d')
+        target = array('d')
+        total = array('d')
+        
+        for obj1, obj2, collision in contacts:
+            for obj in (obj1, obj2):
+                if obj not in body_index:
+                    body_index[obj] = len(bodies)
+                    bodies.append(obj)
+                    vx.append(obj.velocity.x)
+                    vy.append(obj.velocity.y)
+                    w.append(obj.ang_velocity)
+                    inv_mass.append(1.0/obj.mass)
+                    inv_moment.append(1.0/obj.moment)
+                    count.append(0)
+                    toi.append(collision.toi)
+            i = body_index[obj1]
+            j = body_index[obj2]
+            count[i] += 1
+            count[j] += 1
+            toi[i] = min(toi[i], collision.toi)
+            toi[j] = min(toi[j], collision.toi)
+            
+            # the normal points away from obj1, 
+            # the object that was hit
+            normal = collision.normal
+            point = collision.point
+            ax = point.x - obj1.position.x
+            ay = point.y - obj1.position.y
+            bx = point.x - obj2.position.x
+            by = point.y - obj2.position.y
+            an = ax*normal.y - ay*normal.x
+            bn = bx*normal.y - by*normal.x
+            k = (inv_mass[i] + inv_mass[j] + 
+                 an*an*inv_moment[i] + bn*bn*inv_moment[j])
+            
+            index1.append(i)
+            index2.append(j)
+            nx.append(normal.x)
+            ny.append(normal.y)
+            rn1.append(an)
+            rn2.append(bn)
+            r1x.append(ax)
+            r1y.append(ay)
+            r2x.append(bx)
+            r2y.append(by)
+            if k > 0.0:
+                inv_k.append(1.0/k)
+            else:
+                inv_k.append(0.0)
+            
+            # bounce back if approaching
+            vn = ((vx[j] - w[j]*by - vx[i] + w[i]*ay)*normal.x + 
+                  (vy[j] + w[j]*bx - vy[i] - w[i]*ax)*normal.y)
+            target.append(max(-CONTACT_RESTITUTION*vn, 0.0))
+            total.append(0.0)
+            
+        ncontacts = len(contacts)
+        nbodies = len(bodies)
+        vx0 = array('d', vx)
+        vy0 = array('d', vy)
+        w0 = array('d', w)
+        impulse = array('d', [0.0])*ncontacts
+        
+        for iteration in xrange(self.contact_iterations):
+            for c in xrange(ncontacts):
+                i = index1[c]
+                j = index2[c]
+                vn = ((vx[j] - w[j]*r2y[c] - vx[i] + w[i]*r1y[c])*nx[c] + 
+                      (vy[j] + w[j]*r2x[c] - vy[i] - w[i]*r1x[c])*ny[c])
+                share = max(count[i], count[j])
+                # contacts only push
+                new_total = max(total[c] + (target[c] - vn)*inv_k[c]/share, 0.0)
+                impulse[c] = new_total - total[c]
+                total[c] = new_total
+                
+            for c in xrange(ncontacts):
+                j_c = impulse[c]
+                if j_c == 0.0:
+                    continue
+                i = index1[c]
+                j = index2[c]
+                vx[i] -= j_c*nx[c]*inv_mass[i]
+                vy[i] -= j_c*ny[c]*inv_mass[i]
+                w[i] -= j_c*rn1[c]*inv_moment[i]
+                vx[j] += j_c*nx[c]*inv_mass[j]
+                vy[j] += j_c*ny[c]*inv_mass[j]
+                w[j] += j_c*rn2[c]*inv_moment[j]
+        
+        for b in xrange(nbodies):
+            obj = bodies[b]
+            elapsed = toi[b]*dt
+            obj.velocity = Vector2D(vx[b], vy[b])
+            obj.ang_velocity = w[b]
+            obj.position.x += (vx0[b] - vx[b])*elapsed
+            obj.position.y += (vy0[b] - vy[b])*elapsed
+            obj.orientation += (w0[b] - w[b])*elapsed
+        
+    def resolve_at_impact(self, collision, dt):
+        '''
+        Resolve collision as happening at its time
+        of impact: both objects keep their old 
+        velocities until then and their new ones
+        for the rest of the step
+        '''
+        obj1 = collision.obj1
+        obj2 = collision.obj2
+        before1 = (obj1.velocity.x, obj1.velocity.y, obj1.ang_velocity)
+        before2 = (obj2.velocity.x, obj2.velocity.y, obj2.ang_velocity)
+        
+        # notify objects they need to do something
+        collision.resolve()
+        
+        # update moves the objects a whole step with 
+        # their new velocities, so move them back by
+        # the difference up to the time of impact
+        elapsed = collision.toi*dt
+        for obj, (vx, vy, w) in ((obj1, before1), (obj2, before2)):
+            obj.position.x += (vx - obj.velocity.x)*elapsed
+            obj.position.y += (vy - obj.velocity.y)*elapsed
+            obj.orientation += (w - obj.ang_velocity)*elapsed
             
 
     def resolve_collisions(self, objects, dt):
@@ -602,32 +1700,179 @@ class Dynamics(object):
         The outer loop is at least O(n^2) but
         the entire function is worse.
         '''
-        obj_list1 = objects
-        obj_list2 = list(objects)
-        for obj1 in obj_list1:
-            '''
-            Removing the first item in obj_list2
-            each time avoids checking if objects 
-            collide with themselves and also if 
-            two different objects have already 
-            been checked.
-            '''
-            obj_list2.pop(0)
-            for obj2 in obj_list2:
-                if obj1.get_collidable() == False:
-                    continue
+        self.filtered_pairs = 0
+        self.broad_phase_pairs = 0
+        self.narrow_phase_calls = 0
+        self.substepped_pairs = 0
+        self.pair_cache_hits = 0
+        self.pair_cache_misses = 0
+        self.pair_cache_kept = 0
+        self.frame += 1
+        pair_cache_enabled = self.pair_cache_enabled
+        if self.solver == SOLVER_BATCH:
+            solver = self
+        else:
+            solver = None
+        
+        nobjects = len(objects)
+        if len(self.swept_ready) < nobjects:
+            self.swept_boxes.extend([0.0]*(4*nobjects - len(self.swept_boxes)))
+            self.swept_ready.extend([0]*(nobjects - len(self.swept_ready)))
+        
+        # swept boxes once for the whole frame; the vertex
+        # paths only for objects that reach the narrow phase.
+        # bounding boxes are also used to despawn objects,
+        # so update them whether or not any pair gets checked
+        for i in xrange(nobjects):
+            obj = objects[i]
+            if obj.get_collidable() == True:
+                obj.calc_bbox(obj.phys_geom_oriented)
+                self.calc_swept_box(obj, dt, i)
+        
+        '''
+        Each object is checked against the objects
+        after it in the list, which avoids checking
+        if objects collide with themselves and also
+        if two different objects have already been
+        checked.
+        '''
+        for i in xrange(nobjects):
+            obj1 = objects[i]
+            if obj1.get_collidable() == False:
+                continue
+            category1 = obj1.collision_category
+            mask1 = obj1.collision_mask
+            for j in xrange(i+1, nobjects):
+                obj2 = objects[j]
                 if obj2.get_collidable() == False:
                     continue
-                '''
-                if obj1 == obj2:
+                # pairs which can never interact don't 
+                # need any geometry work
+                if (category1 & obj2.collision_mask) == 0 or (obj2.collision_category & mask1) == 0:
+                    self.filtered_pairs += 1
                     continue
-                if obj2.has_collided_with(obj1):
+                if self.swept_boxes_intersect(i, j) == False:
                     continue
-                '''
+                self.broad_phase_pairs += 1
+                
+                # pairs that were far enough apart for 
+                # how little they moved can't collide yet
+                if pair_cache_enabled == True:
+                    if self.check_pair_cache(obj1, obj2, dt) == True:
+                        self.pair_cache_hits += 1
+                        continue
+                    self.pair_cache_misses += 1
+                    
+                # swept shapes are exact for travel
+                travel = obj1.collision_shape == None and obj2.collision_shape == None
+                substeps = max(self.get_substeps(obj1, dt, travel),
+                               self.get_substeps(obj2, dt, travel))
+                if substeps > 1:
+                    self.substepped_pairs += 1
+                    collision = self.find_collision_substeps(obj1, obj2, dt, substeps)
+                    # the substeps left other predictions behind
+                    self.swept_ready[i] = 0
+                    self.swept_ready[j] = 0
+                else:
+                    self.prepare_swept_state(obj1, dt, i)
+                    self.prepare_swept_state(obj2, dt, j)
+                    collision = self.find_collision(obj1, obj2, dt)
+                
+                if pair_cache_enabled == True:
+                    self.update_pair_cache(obj1, obj2, dt, collision)
                     
-                obj1.calc_next_state(dt)
-                obj2.calc_next_state(dt)
-                collision = self.find_collision(obj1, obj2, dt)
                 if collision != None:
-                    # notify objects they need to do something
-                    collision.resolve()
+                    collision.solver = solver
+                    self.resolve_at_impact(collision, dt)
+                    # resolving changes velocities, so the
+                    # predictions of both are out of date
+                    self.calc_swept_box(obj1, dt, i)
+                    self.calc_swept_box(obj2, dt, j)
+        
+        self.evict_pair_cache()
+        
+        # the contacts the batch solver gathered
+        self.solve_contacts(dt)
+                    
+    def set_contact_solver(self, solver, iterations=CONTACT_ITERATIONS):
+        '''
+        SOLVER_SEQUENTIAL to resolve each collision 
+        as it is found or SOLVER_BATCH to solve them
+        together with iterations passes
+        '''
+        self.solver = solver
+        self.contact_iterations = iterations
+        
+    def get_contacts_solved(self):
+        '''
+        number of contacts the batch solver solved
+        in the last resolve_collisions
+        '''
+        return self.contacts_solved
+    
+    def set_pair_cache_enabled(self, enabled):
+        '''
+        use the pair cache or run the narrow
+        phase for every overlapping pair
+        '''
+        self.pair_cache_enabled = enabled
+        if enabled == False:
+            self.pair_cache = {}
+    
+    def get_pair_cache_hits(self):
+        '''
+        number of pairs the pair cache let skip the
+        narrow phase in the last resolve_collisions
+        '''
+        return self.pair_cache_hits
+    
+    def get_pair_cache_misses(self):
+        '''
+        number of overlapping pairs the pair cache 
+        could not skip in the last resolve_collisions
+        '''
+        return self.pair_cache_misses
+    
+    def get_pair_cache_hit_rate(self):
+        '''
+        part of the pairs looked up in the pair 
+        cache in the last resolve_collisions that
+        skipped the narrow phase
+        '''
+        lookups = self.pair_cache_hits + self.pair_cache_misses
+        if lookups == 0:
+            return 0.0
+        return float(self.pair_cache_hits)/lookups
+    
+    def get_pair_cache_size(self):
+        return len(self.pair_cache)
+        
+    def get_filtered_pairs(self):
+        '''
+        number of pairs the collision filters kept out
+        of the last resolve_collisions; narrow phase
+        calls avoided
+        '''
+        return self.filtered_pairs
+    
+    def get_substepped_pairs(self):
+        '''
+        number of pairs checked in substeps in 
+        the last resolve_collisions
+        '''
+        return self.substepped_pairs
+    
+    def get_broad_phase_pairs(self):
+        '''
+        number of pairs whose swept boxes overlapped
+        in the last resolve_collisions, whether or not
+        the pair cache let them skip the narrow phase
+        '''
+        return self.broad_phase_pairs
+    
+    def get_narrow_phase_calls(self):
+        '''
+        number of pairs checked with check_collisions
+        in the last resolve_collisions
+        '''
+        return self.narrow_phase_calls
@@ -0,0 +1,100 @@
+#
+# pool.py - reuse game objects instead of creating new ones
+#
+# Space Travel
+#     Copyright (C) 2014  Eric Eveleigh
+#
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU General Public License as published by
+#     the Free Software Foundation, either version 3 of the License, or
+#     (at your option) any later version.
+#
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU General Public License for more details.
+#
+#     You should have received a copy of the GNU General Public License
+#     along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import entity
+
+class Pool(object):
+    '''
+    Keeps released objects of one class so they can
+    be used again. The class needs a reset method
+    taking the same arguments as its constructor,
+    which puts the object back in the state a newly
+    constructed one would be in.
+    '''
+    def __init__(self, cls, warmup=0, warmup_args=()):
+        self.cls = cls
+        self.free = []
+
+        # objects given out and not released yet,
+        # and the most there ever were
+        self.in_use = 0
+        self.high_water = 0
+
+        # how many acquires created a new object
+        # and how many reused a released one
+        self.created = 0
+        self.reused = 0
+
+        self.warm_up(warmup, warmup_args)
+
+    def warm_up(self, count, args):
+        '''
+        create count objects up front with
+        constructor arguments args
+        '''
+        # creating objects should not make any noise
+        sound_enabled = entity.sound_enabled
+        entity.set_sound_enabled(False)
+        try:
+            for i in xrange(count):
+                self.free.append(self.cls(*args))
+        finally:
+            entity.set_sound_enabled(sound_enabled)
+
+    def acquire(self, *args):
+        '''
+        get an object as if constructed
+        with args
+        '''
+        if len(self.free) > 0:
+            obj = self.free.pop()
+            obj.reset(*args)
+            self.reused += 1
+        else:
+            obj = self.cls(*args)
+            self.created += 1
+
+        self.in_use += 1
+        if self.in_use > self.high_water:
+            self.high_water = self.in_use
+        return obj
+
+    def release(self, obj):
+        '''
+        give back an object that is not used
+        anywhere anymore
+        '''
+        self.free.append(obj)
+        if self.in_use > 0:
+            self.in_use -= 1
+
+    def get_in_use(self):
+        return self.in_use
+
+    def get_high_water(self):
+        return self.high_water
+
+    def get_num_free(self):
+        return len(self.free)
+
+    def get_created(self):
+        return self.created
+
+    def get_reused(self):
+        return self.reused
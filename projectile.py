@@ -0,0 +1,315 @@
+#
+# projectile.py - shots kept out of the entity list
+#
+# Space Travel
+#     Copyright (C) 2014  Eric Eveleigh
+#
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU General Public License as published by
+#     the Free Software Foundation, either version 3 of the License, or
+#     (at your option) any later version.
+#
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU General Public License for more details.
+#
+#     You should have received a copy of the GNU General Public License
+#     along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+# imports
+import math
+
+import pygame
+
+import entity
+import physics
+import render
+import surfaces
+
+SHOT_IMAGE = "obj/shot.png"
+SHOT_COLORKEY = (255,0,255)
+
+# how thick a shot is when it hits something,
+# like the Capsule Player.Shots collide as
+PROJECTILE_RADIUS = entity.SHOT_COLLISION_SHAPE.radius
+# shots knock Asteroids like a Player.Shot of this mass
+PROJECTILE_MASS = 100.0
+# seconds a shot flies before it is removed, so shots
+# caught circling a Hole don't stay forever
+PROJECTILE_LIFETIME = 3.0
+# size of the grid cells targets are sorted into
+PROJECTILE_CELL_SIZE = 128
+
+# the image shared by every Game, loaded when first needed
+# because the display has to be set up to convert it
+shot_image = None
+
+def get_shot_image():
+    global shot_image
+    if shot_image == None:
+        shot_image = surfaces.load_image(SHOT_IMAGE, SHOT_COLORKEY, False)
+    return shot_image
+
+def can_hit(obj):
+    '''
+    can a shot hit obj?
+    '''
+    return ((obj.collision_mask & entity.COLLIDE_SHOT) != 0 and
+            (obj.collision_category & entity.COLLISION_MASKS[entity.COLLIDE_SHOT]) != 0)
+
+class Projectiles(object):
+    '''
+    Shots flying in straight lines until they
+    hit something. Each one is a slot in flat
+    lists instead of an Entity: a shot is a
+    point as thick as PROJECTILE_RADIUS that
+    sweeps a segment every step, so it needs no
+    geometry, mass or rotation of its own.
+    '''
+    def __init__(self, image, bounds):
+        self.image = image
+        # shots outside this Rect are removed
+        self.bounds = pygame.Rect(bounds)
+        # rotated images by the whole degree shots
+        # face and the scale they are drawn at
+        self.images = {}
+
+        self.clear()
+
+    def clear(self):
+        '''
+        remove every shot
+        '''
+        self.x = []
+        self.y = []
+        self.vx = []
+        self.vy = []
+        # seconds each shot has left
+        self.lifetime = []
+        self.damage = []
+        # the Player each shot came from
+        self.owner = []
+        # which way each shot faces, in whole degrees
+        self.angle = []
+        self.ids = []
+        self.next_id = 0
+
+        # hits in the last step
+        self.hits = 0
+
+    def __len__(self):
+        return len(self.ids)
+
+    def spawn(self, owner, damage, position, velocity, orientation):
+        '''
+        fire a shot from owner and return its id
+        '''
+        shot_id = self.next_id
+        self.next_id += 1
+
+        self.x.append(position.x)
+        self.y.append(position.y)
+        self.vx.append(velocity.x)
+        self.vy.append(velocity.y)
+        self.lifetime.append(PROJECTILE_LIFETIME)
+        self.damage.append(damage)
+        self.owner.append(owner)
+        self.angle.append(int(round(math.degrees(orientation))) % 360)
+        self.ids.append(shot_id)
+        return shot_id
+
+    def get_image(self, angle, scale=1.0):
+        '''
+        the shot image rotated to angle degrees and
+        resized by scale, and the offset that centres it
+        '''
+        image = self.images.get((angle, scale))
+        if image == None:
+            rotated = surfaces.encode(pygame.transform.rotate(surfaces.get_scaled(self.image, scale), -angle))
+            image = (rotated, (rotated.get_width()/2, rotated.get_height()/2))
+            self.images[(angle, scale)] = image
+        return image
+
+    def find_targets(self, objects, boxes):
+        '''
+        the objects shots can hit, sorted into grid
+        cells by the swept boxes the Dynamics broad
+        phase made for them; boxes[4*i:4*i+4] is
+        the box of objects[i]
+        '''
+        cells = {}
+        cell_size = PROJECTILE_CELL_SIZE
+        radius = PROJECTILE_RADIUS
+        for i in xrange(len(objects)):
+            obj = objects[i]
+            if obj.get_collidable() == False or can_hit(obj) == False:
+                continue
+            k = 4*i
+            for cx in xrange(int(math.floor((boxes[k] - radius)/cell_size)),
+                             int(math.floor((boxes[k+2] + radius)/cell_size)) + 1):
+                for cy in xrange(int(math.floor((boxes[k+1] - radius)/cell_size)),
+                                 int(math.floor((boxes[k+3] + radius)/cell_size)) + 1):
+                    cell = cells.get((cx, cy))
+                    if cell == None:
+                        cells[(cx, cy)] = [obj]
+                    else:
+                        cell.append(obj)
+        return cells
+
+    def sweep(self, x, y, dx, dy, obj, cores, dynamics):
+        '''
+        when over the step a shot at x, y moving by
+        dx, dy relative to obj hits it, or None
+        '''
+        core = cores.get(obj)
+        if core == None:
+            points, radius, axes = dynamics.get_pose_core(obj)
+            shape = obj.collision_shape
+            if shape == None:
+                kind = physics.SHAPE_POLYGON
+            else:
+                kind = shape.kind
+            core = (kind, points, radius + PROJECTILE_RADIUS)
+            cores[obj] = core
+        kind, points, radius = core
+        return physics.sweep_point_core(x, y, dx, dy, kind, points, radius)
+
+    def step(self, dt, objects, dynamics):
+        '''
+        Hit the objects in the way of each shot
+        over dt, then move the shots that are
+        left. objects are the ones the Dynamics
+        just resolved collisions for.
+        '''
+        self.hits = 0
+        if len(self.ids) == 0:
+            return
+
+        cells = self.find_targets(objects, dynamics.swept_boxes)
+        cores = {}
+        keep = None
+        if len(cells) > 0:
+            cell_size = PROJECTILE_CELL_SIZE
+            keep = [True]*len(self.ids)
+            for i in xrange(len(self.ids)):
+                x = self.x[i]
+                y = self.y[i]
+                end_x = x + self.vx[i]*dt
+                end_y = y + self.vy[i]*dt
+
+                # the targets in the cells the segment's box covers,
+                # each once, in the order they were found
+                candidates = []
+                found = set()
+                for cx in xrange(int(math.floor(min(x, end_x)/cell_size)),
+                                 int(math.floor(max(x, end_x)/cell_size)) + 1):
+                    for cy in xrange(int(math.floor(min(y, end_y)/cell_size)),
+                                     int(math.floor(max(y, end_y)/cell_size)) + 1):
+                        cell = cells.get((cx, cy))
+                        if cell != None:
+                            for obj in cell:
+                                if obj not in found:
+                                    found.add(obj)
+                                    candidates.append(obj)
+                if len(candidates) == 0:
+                    continue
+
+                # the first thing the shot hits stops it
+                hit = None
+                hit_time = None
+                for obj in candidates:
+                    t = self.sweep(x, y, (self.vx[i] - obj.velocity.x)*dt,
+                                   (self.vy[i] - obj.velocity.y)*dt, obj, cores, dynamics)
+                    if t != None and (hit_time == None or t < hit_time):
+                        hit = obj
+                        hit_time = t
+                if hit != None:
+                    self.hit(i, hit)
+                    keep[i] = False
+
+        if keep != None and False in keep:
+            self.remove(keep)
+
+        self.x = [x + vx*dt for x, vx in zip(self.x, self.vx)]
+        self.y = [y + vy*dt for y, vy in zip(self.y, self.vy)]
+        self.lifetime = [lifetime - dt for lifetime in self.lifetime]
+
+        left = self.bounds.left
+        top = self.bounds.top
+        right = self.bounds.right
+        bottom = self.bounds.bottom
+        keep = [lifetime > 0.0 and x >= left and x < right and y >= top and y < bottom
+                for x, y, lifetime in zip(self.x, self.y, self.lifetime)]
+        if False in keep:
+            self.remove(keep)
+
+    def hit(self, i, obj):
+        '''
+        shot i hit obj. Asteroids take its damage
+        from its owner, so the owner scores them,
+        and are knocked along its path; anything
+        else just absorbs it.
+        '''
+        self.hits += 1
+        if isinstance(obj, entity.Asteroid):
+            obj.apply_damage(self.damage[i], self.owner[i])
+
+            share = (1.0 + physics.CONTACT_RESTITUTION)*PROJECTILE_MASS/(PROJECTILE_MASS + obj.get_mass())
+            obj.velocity.x += (self.vx[i] - obj.velocity.x)*share
+            obj.velocity.y += (self.vy[i] - obj.velocity.y)*share
+
+    def attract(self, position, strength, dt):
+        '''
+        pull every shot towards position, changing
+        its velocity by strength*dt*dt over the
+        squared distance, as Game.hole_gravity_force
+        does for an Entity
+        '''
+        px = position.x
+        py = position.y
+        scale = strength*dt*dt
+        for i in xrange(len(self.ids)):
+            dx = px - self.x[i]
+            dy = py - self.y[i]
+            r_squared = dx*dx + dy*dy
+            if r_squared == 0.0:
+                continue
+            pull = scale/(r_squared*math.sqrt(r_squared))
+            self.vx[i] += dx*pull
+            self.vy[i] += dy*pull
+
+    def remove(self, keep):
+        '''
+        keep only the shots whose entry
+        in keep is True
+        '''
+        for name in ('x', 'y', 'vx', 'vy', 'lifetime', 'damage', 'owner', 'angle', 'ids'):
+            values = getattr(self, name)
+            setattr(self, name, [value for value, kept in zip(values, keep) if kept == True])
+
+    def get_batch(self, scale=1.0, angle_step=1):
+        '''
+        (image, destination) of every shot
+        drawn at scale, turned in steps of
+        angle_step degrees
+        '''
+        batch = []
+        for x, y, angle in zip(self.x, self.y, self.angle):
+            image, offset = self.get_image(angle/angle_step*angle_step, scale)
+            batch.append((image, (int(x*scale) - offset[0], int(y*scale) - offset[1])))
+        return batch
+
+    def submit(self, queue, layer, scale=1.0):
+        '''
+        add every shot to a render.RenderQueue
+        '''
+        if len(self.ids) > 0:
+            queue.extend(self.get_batch(scale, queue.angle_step), layer)
+
+    def draw(self, surface):
+        '''
+        draw every shot in one batch
+        '''
+        if len(self.ids) > 0:
+            render.blit_all(surface, self.get_batch())
@@ -0,0 +1,121 @@
+#
+# quality.py - trade looks for speed when frames run long
+#
+# Space Travel
+#     Copyright (C) 2014  Eric Eveleigh
+#
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU General Public License as published by
+#     the Free Software Foundation, either version 3 of the License, or
+#     (at your option) any later version.
+#
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU General Public License for more details.
+#
+#     You should have received a copy of the GNU General Public License
+#     along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+# imports
+import physics
+
+class Quality(object):
+    '''
+    How much effort a Game puts into the things
+    that can be cut back when frames run long
+    '''
+    def __init__(self, stars, angle_step, max_explosions, hud_interval, max_substeps):
+        # stars in the StarField
+        self.stars = stars
+        # degrees sprites turn in, so the rotated
+        # images are made again less often
+        self.angle_step = angle_step
+        # explosions drawn at once, or None for all
+        self.max_explosions = max_explosions
+        # frames between redrawing the info texts
+        self.hud_interval = hud_interval
+        # the most substeps a collision check takes
+        self.max_substeps = max_substeps
+
+# from the best looking to the quickest
+QUALITY_LEVELS = (Quality(10, 1, None, 1, physics.MAX_SUBSTEPS),
+                  Quality(8, 2, 48, 2, 6),
+                  Quality(6, 4, 24, 4, 4),
+                  Quality(4, 8, 12, 8, 2))
+
+# frames the average frame time is taken over
+QUALITY_WINDOW = 30
+# the level drops when the average frame time is over
+# QUALITY_DEGRADE of the budget, and rises when it is
+# under QUALITY_IMPROVE
+QUALITY_DEGRADE = 1.0
+QUALITY_IMPROVE = 0.6
+# frames to wait after a change before another
+QUALITY_HOLD = 120
+
+def get_quality(level):
+    return QUALITY_LEVELS[level]
+
+class Governor(object):
+    '''
+    Watches the time frames take and steps through
+    QUALITY_LEVELS to keep them within budget
+    seconds. The gap between QUALITY_DEGRADE and
+    QUALITY_IMPROVE, and the wait after each change,
+    keep it from going back and forth.
+    '''
+    def __init__(self, budget):
+        self.budget = budget
+        self.level = 0
+        # the last QUALITY_WINDOW frame times
+        self.frame_times = []
+        self.total = 0.0
+        self.hold = 0
+
+    def get_level(self):
+        return self.level
+
+    def get_quality(self):
+        return QUALITY_LEVELS[self.level]
+
+    def get_average(self):
+        '''
+        average of the recent frame times
+        '''
+        if len(self.frame_times) == 0:
+            return 0.0
+        return self.total/len(self.frame_times)
+
+    def update(self, frame_time):
+        '''
+        add the seconds the last frame took;
+        True if the level changed
+        '''
+        self.frame_times.append(frame_time)
+        self.total += frame_time
+        if len(self.frame_times) > QUALITY_WINDOW:
+            self.total -= self.frame_times.pop(0)
+
+        if self.hold > 0:
+            self.hold -= 1
+            return False
+        if len(self.frame_times) < QUALITY_WINDOW:
+            return False
+
+        average = self.get_average()
+        level = self.level
+        if average > self.budget*QUALITY_DEGRADE and level < len(QUALITY_LEVELS) - 1:
+            level += 1
+        elif average < self.budget*QUALITY_IMPROVE and level > 0:
+            level -= 1
+        if level == self.level:
+            return False
+
+        self.level = level
+        # the frames before the change don't
+        # tell how the new level does
+        self.frame_times = []
+        self.total = 0.0
+        self.hold = QUALITY_HOLD
+        return True
@@ -0,0 +1,178 @@
+#
+# render.py - sprites drawn in batches
+#
+# Space Travel
+#     Copyright (C) 2014  Eric Eveleigh
+#
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU General Public License as published by
+#     the Free Software Foundation, either version 3 of the License, or
+#     (at your option) any later version.
+#
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU General Public License for more details.
+#
+#     You should have received a copy of the GNU General Public License
+#     along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+# imports
+import pygame
+
+# Surface.blits draws a whole list in one call,
+# but older pygames don't have it
+HAVE_BLITS = hasattr(pygame.Surface, 'blits')
+
+# layers of the Game, drawn bottom to top
+RENDER_LAYER_ENTITIES = 0
+RENDER_LAYER_ACTORS = 1
+RENDER_LAYER_SHOTS = 2
+RENDER_LAYER_EFFECTS = 3
+RENDER_LAYERS = 4
+
+# scales an AdaptiveScale steps through, largest first
+RENDER_SCALES = (1.0, 0.75, 0.5)
+# how quickly the average draw time follows the latest
+RENDER_SCALE_SMOOTHING = 0.1
+# the next larger scale is tried once the average
+# draw time is under this fraction of the budget
+RENDER_SCALE_RAISE = 0.5
+# frames to wait after a change before another
+RENDER_SCALE_HOLD = 60
+
+def blit_all(surface, batch):
+    '''
+    draw a list of (image, destination)
+    pairs onto surface
+    '''
+    if HAVE_BLITS == True:
+        surface.blits(batch, 0)
+    else:
+        for image, position in batch:
+            surface.blit(image, position)
+
+class RenderQueue(object):
+    '''
+    Collects the sprites of a frame by layer,
+    then draws each layer with one blit_all
+    '''
+    def __init__(self, num_layers):
+        self.layers = [[] for i in xrange(num_layers)]
+        # sprites drawn by the last flush
+        self.last_count = 0
+        # degrees sprites submitted turn in
+        self.angle_step = 1
+        
+    def set_angle_step(self, angle_step):
+        self.angle_step = angle_step
+        
+    def get_angle_step(self):
+        return self.angle_step
+
+    def submit(self, image, destination, layer):
+        '''
+        draw image at destination with layer
+        '''
+        self.layers[layer].append((image, destination))
+
+    def extend(self, batch, layer):
+        '''
+        draw a list of (image, destination)
+        pairs with layer
+        '''
+        self.layers[layer].extend(batch)
+
+    def flush(self, surface):
+        '''
+        draw everything submitted onto surface,
+        bottom layer first, and empty the queue
+        '''
+        count = 0
+        for batch in self.layers:
+            if len(batch) > 0:
+                blit_all(surface, batch)
+                count += len(batch)
+                del batch[:]
+        self.last_count = count
+
+    def get_last_count(self):
+        return self.last_count
+
+class ScaledView(object):
+    '''
+    A surface to draw the scene on at a fraction of
+    the display's size, stretched to fill the display
+    once a frame. At a scale of 1 it is the display.
+    '''
+    def __init__(self, display, scale):
+        self.display = display
+        self.set_scale(scale)
+
+    def set_scale(self, scale):
+        self.scale = scale
+        if scale == 1.0:
+            self.surface = self.display
+        else:
+            width, height = self.display.get_size()
+            size = (max(int(width*scale), 1), max(int(height*scale), 1))
+            self.surface = pygame.Surface(size).convert()
+
+    def get_scale(self):
+        return self.scale
+
+    def get_surface(self):
+        '''
+        the surface to draw on
+        '''
+        return self.surface
+
+    def present(self):
+        '''
+        stretch what was drawn over the display
+        '''
+        if self.surface is not self.display:
+            pygame.transform.scale(self.surface, self.display.get_size(), self.display)
+
+class AdaptiveScale(object):
+    '''
+    Picks the largest of largest and the smaller
+    RENDER_SCALES whose average draw time fits
+    in budget seconds
+    '''
+    def __init__(self, budget, largest=1.0):
+        self.budget = budget
+        self.scales = [largest] + [scale for scale in RENDER_SCALES if scale < largest]
+        self.level = 0
+        self.average = None
+        self.hold = 0
+
+    def get_scale(self):
+        return self.scales[self.level]
+
+    def update(self, draw_time):
+        '''
+        add the seconds the last frame took to
+        draw; True if the scale changed
+        '''
+        if self.average == None:
+            self.average = draw_time
+        else:
+            self.average += (draw_time - self.average)*RENDER_SCALE_SMOOTHING
+
+        if self.hold > 0:
+            self.hold -= 1
+            return False
+
+        level = self.level
+        if self.average > self.budget and level < len(self.scales) - 1:
+            level += 1
+        elif self.average < self.budget*RENDER_SCALE_RAISE and level > 0:
+            level -= 1
+        if level == self.level:
+            return False
+
+        self.level = level
+        self.average = None
+        self.hold = RENDER_SCALE_HOLD
+        return True
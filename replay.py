@@ -0,0 +1,239 @@
+#
+# replay.py - record games and play them back
+#
+# Space Travel
+#     Copyright (C) 2014  Eric Eveleigh
+#
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU General Public License as published by
+#     the Free Software Foundation, either version 3 of the License, or
+#     (at your option) any later version.
+#
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU General Public License for more details.
+#
+#     You should have received a copy of the GNU General Public License
+#     along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+# imports
+import struct
+import sys
+import time
+
+import headless
+
+REPLAY_MAGIC = 'STRP'
+# raised whenever a change to the game makes the same
+# keys play out differently, so old replays are refused
+REPLAY_VERSION = 5
+
+# magic, version, seed, difficulty, mode, width, height,
+# number of frames, final points, final distance
+REPLAY_HEADER = struct.Struct('<4sBIBBHHIid')
+# frametime, number of key events before the update
+REPLAY_FRAME = struct.Struct('<dB')
+# event kind, key or quality level
+REPLAY_EVENT = struct.Struct('<BI')
+
+REPLAY_KEY_DOWN = 0
+REPLAY_KEY_UP = 1
+# quality levels change the collision substeps
+REPLAY_QUALITY = 2
+
+class ReplayError(Exception):
+    '''
+    Raised for streams that are not replays
+    '''
+    pass
+
+class Recording(object):
+    '''
+    Everything needed to play a Game again:
+    the seed, the settings and every key
+    event, quality level and frametime
+    passed to the Game.
+    '''
+    def __init__(self, seed, difficulty, mode, width, height):
+        self.seed = seed
+        self.difficulty = difficulty
+        self.mode = mode
+        self.width = width
+        self.height = height
+
+        # one (frametime, events) tuple per Game.update
+        self.frames = []
+        self.events = []
+
+        self.points = 0
+        self.distance = 0.0
+
+    @staticmethod
+    def from_game(game):
+        '''
+        start a Recording of game
+        '''
+        rect = game.screen_rect
+        return Recording(game.get_seed(), game.get_game_difficulty(),
+                         game.get_game_mode(), rect.width, rect.height)
+
+    def key_down(self, key):
+        self.events.append((REPLAY_KEY_DOWN, key))
+
+    def key_up(self, key):
+        self.events.append((REPLAY_KEY_UP, key))
+
+    def set_quality_level(self, level):
+        self.events.append((REPLAY_QUALITY, level))
+
+    def update(self, frametime):
+        '''
+        end the current frame
+        '''
+        self.frames.append((frametime, tuple(self.events)))
+        self.events = []
+
+    def get_num_frames(self):
+        return len(self.frames)
+
+    def finish(self, game):
+        '''
+        store the result of the recorded Game
+        so playback can be checked against it
+        '''
+        self.points = game.player.get_points()
+        self.distance = game.distance_travelled
+
+    def to_string(self):
+        '''
+        pack into the binary replay format
+        '''
+        data = [REPLAY_HEADER.pack(REPLAY_MAGIC, REPLAY_VERSION, self.seed,
+                                   self.difficulty, self.mode,
+                                   self.width, self.height,
+                                   len(self.frames), self.points,
+                                   self.distance)]
+        for frametime, events in self.frames:
+            data.append(REPLAY_FRAME.pack(frametime, len(events)))
+            for kind, key in events:
+                data.append(REPLAY_EVENT.pack(kind, key))
+        return ''.join(data)
+
+    @staticmethod
+    def from_string(data):
+        '''
+        unpack from the binary replay format
+        '''
+        try:
+            header = REPLAY_HEADER.unpack_from(data, 0)
+        except struct.error:
+            raise ReplayError("replay is truncated")
+
+        magic, version, seed, difficulty, mode, width, height, nframes, points, distance = header
+        if magic != REPLAY_MAGIC:
+            raise ReplayError("not a replay")
+        if version != REPLAY_VERSION:
+            raise ReplayError("unsupported replay version %d" % version)
+
+        recording = Recording(seed, difficulty, mode, width, height)
+        recording.points = points
+        recording.distance = distance
+
+        offset = REPLAY_HEADER.size
+        frames = [None]*nframes
+        try:
+            for i in xrange(nframes):
+                frametime, nevents = REPLAY_FRAME.unpack_from(data, offset)
+                offset += REPLAY_FRAME.size
+                events = [None]*nevents
+                for j in xrange(nevents):
+                    events[j] = REPLAY_EVENT.unpack_from(data, offset)
+                    offset += REPLAY_EVENT.size
+                frames[i] = (frametime, tuple(events))
+        except struct.error:
+            raise ReplayError("replay is truncated")
+        recording.frames = frames
+
+        return recording
+
+    def save(self, filename):
+        replay_file = open(filename, "wb")
+        replay_file.write(self.to_string())
+        replay_file.close()
+
+    @staticmethod
+    def load(filename):
+        replay_file = open(filename, "rb")
+        data = replay_file.read()
+        replay_file.close()
+        return Recording.from_string(data)
+
+def play(recording, surface=None):
+    '''
+    Feed a Recording into a new Game as fast
+    as possible. headless.init() must have been
+    called. The Game is drawn on surface if
+    one is given. Returns the Game.
+    '''
+    game = headless.create_game(recording.difficulty, recording.mode,
+                                recording.seed, recording.width,
+                                recording.height)
+    for frametime, events in recording.frames:
+        for kind, key in events:
+            if kind == REPLAY_KEY_DOWN:
+                game.key_down(key)
+            elif kind == REPLAY_KEY_UP:
+                game.key_up(key)
+            else:
+                game.set_quality_level(key)
+        game.update(frametime)
+        if surface != None:
+            game.draw(surface)
+    return game
+
+def matches(recording, game):
+    '''
+    did the Game played back end the same
+    way as the recorded one?
+    '''
+    return (game.player.get_points() == recording.points and
+            game.distance_travelled == recording.distance)
+
+def main(argv):
+    '''
+    play back replay files given on the command line
+    '''
+    headless.init()
+
+    if len(argv) < 2:
+        print "usage: replay.py FILE..."
+        return 2
+
+    status = 0
+    for filename in argv[1:]:
+        recording = Recording.load(filename)
+
+        start = time.time()
+        game = play(recording)
+        elapsed = time.time() - start
+
+        frames = recording.get_num_frames()
+        if elapsed > 0.0:
+            rate = frames/elapsed
+        else:
+            rate = float('inf')
+
+        if matches(recording, game) == True:
+            result = "OK"
+        else:
+            result = "MISMATCH (points %d, distance %.2f)" % (game.player.get_points(), game.distance_travelled)
+            status = 1
+
+        print "%s: %d frames in %.3f s (%.1f frames/s), points %d, distance %.2f: %s" % (
+            filename, frames, elapsed, rate, recording.points, recording.distance, result)
+
+    return status
+
+if __name__=="__main__":
+    sys.exit(main(sys.argv))
@@ -18,12 +18,17 @@
 #     You should have received a copy of the GNU General Public License
 #     along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+import time
+
 import pygame.mixer
 import pygame.draw
 import pygame.image
 import pygame.font
 
 import game
+import render
+import replay
+import surfaces
 
 BGM_STOPPED = 25
 class BGM(object):
@@ -61,7 +66,7 @@ class BGImage(object):
         self.dimensions = (width, height)
         
         if filename != None:
-            self.image = pygame.image.load(filename).convert()
+            self.image = surfaces.convert(pygame.image.load(filename), surfaces.SURFACE_OPAQUE, None)
             self.image_scaled = pygame.transform.smoothscale(self.image, self.dimensions)
         else:
             self.image = None
@@ -112,9 +117,9 @@ class RenderedText(object):
         # required for font.render to function properly when None is
         # given for background
         if self.background == None:
-            self.surface = font.render(text, self.antialias, self.color).convert_alpha()
+            self.surface = surfaces.optimise(font.render(text, self.antialias, self.color))
         else:
-            self.surface = font.render(text, self.antialias, self.color, self.background).convert()
+            self.surface = surfaces.optimise(font.render(text, self.antialias, self.color, self.background))
         
         
     def get_width(self):
@@ -321,6 +326,14 @@ class Screen(object):
         self.set_should_draw_bg(False)
         
         self.bgm_wait = False
+        
+    def set_quality_level(self, level):
+        '''
+        The app's quality.Governor changed the
+        quality level
+        '''
+        pass
+        
     def get_width(self):
         return self.width
     
@@ -485,6 +498,9 @@ class TextScreen(Screen):
         
 
 TITLE_FONT = pygame.font.Font("fonts/Rase-GPL-Bold.otf", 50)
+# set to a filename to record every game played,
+# play it back with replay.py
+REPLAY_FILE = None
 class TitleScreen(Screen):
     '''
     Does the game's title screen.
@@ -617,6 +633,7 @@ class TitleScreen(Screen):
         difficulty
         '''
         gamescreen = InGameScreen(self.width, self.height, self.app_parent, self.display)
+        gamescreen.set_record_file(REPLAY_FILE)
         gamescreen.start_game(self.game_diff, self.game_mode)
         self.app_parent.screen_open(gamescreen)
             
@@ -690,6 +707,11 @@ class TitleScreen(Screen):
         self.title_text.draw(self.display)
         pygame.display.flip()
         
+# the game frame shown under the pause menu is
+# dimmed by drawing this color over it with this
+# alpha; None leaves it as it was
+PAUSE_DIM_COLOR = (0,0,0)
+PAUSE_DIM_ALPHA = 128
 
 class InGameScreen(Screen):
     '''
@@ -707,23 +729,106 @@ class InGameScreen(Screen):
 
         self.set_should_draw_bg(False)
         
+        # while paused the last game frame is kept in
+        # frozen_frame and the screen is only drawn
+        # again when the menu selection changes
+        self.frozen_frame = None
+        self.frozen_selection = None
+        self.set_pause_dim(PAUSE_DIM_ALPHA)
+        
         self.pause_menu = Menu("Paused")
         self.pause_menu.add_member(Menu("Quit to Title", InGameScreen.quit_title))
         self.pause_menu.set_position((self.display.get_width()/2, self.display.get_height()/3))
         
         self.set_paused(False)
         
+        self.recording = None
+        self.record_file = None
+        
+        # the game is drawn at a fraction of the display
+        # size, which adapts to the time drawing takes
+        # if the app gives a budget for it
+        scale = 1.0
+        budget = None
+        if app != None:
+            scale = app.get_render_scale()
+            budget = app.get_render_budget()
+        self.view = render.ScaledView(self.display, scale)
+        self.adaptive_scale = None
+        if budget != None:
+            self.adaptive_scale = render.AdaptiveScale(budget, scale)
+            self.view.set_scale(self.adaptive_scale.get_scale())
+        
     def start_game(self, difficulty, mode):
         self.game = game.Game(pygame.Rect(0, 0, self.display.get_width(), self.display.get_height()),difficulty, mode)
+        if self.record_file != None:
+            self.recording = replay.Recording.from_game(self.game)
+        if self.app_parent != None:
+            self.set_quality_level(self.app_parent.get_quality_level())
+            
+    def set_quality_level(self, level):
+        '''
+        pass the quality level on to the game,
+        recording the change
+        '''
+        if level == self.game.get_quality_level():
+            return
+        if self.recording != None:
+            self.recording.set_quality_level(level)
+        self.game.set_quality_level(level)
+            
+    def set_record_file(self, filename):
+        '''
+        Record the game to filename when this
+        screen closes. Set before start_game.
+        '''
+        self.record_file = filename
+        
+    def save_recording(self):
+        '''
+        write out the recorded game, if any
+        '''
+        if self.recording != None:
+            self.recording.finish(self.game)
+            self.recording.save(self.record_file)
+            self.recording = None
+            
+    def deactivate(self):
+        Screen.deactivate(self)
+        self.save_recording()
         
     def set_paused(self, paused):
         self.paused = paused
+        # a new frame is frozen each time
+        self.frozen_frame = None
+        self.frozen_selection = None
         
     def get_paused(self):
         return self.paused
     
     def toggle_paused(self):
-        self.paused = not self.paused
+        self.set_paused(not self.paused)
+        
+    def set_pause_dim(self, alpha):
+        '''
+        alpha of the PAUSE_DIM_COLOR drawn over
+        the game while paused, or None for none
+        '''
+        self.pause_dim = alpha
+        
+    def freeze_frame(self):
+        '''
+        draw the game once more and keep
+        a dimmed copy of it
+        '''
+        self.draw_game()
+        frame = self.display.copy()
+        if self.pause_dim != None:
+            dim = pygame.Surface(frame.get_size()).convert()
+            dim.fill(PAUSE_DIM_COLOR)
+            dim.set_alpha(self.pause_dim)
+            frame.blit(dim, (0,0))
+        self.frozen_frame = frame
         
     def handle_event(self, event):
         '''
@@ -738,6 +843,9 @@ class InGameScreen(Screen):
             self.show_hiscores()
         elif event.type == game.GAME_SHOW_TITLE:
             self.quit_title()
+        elif event.type == pygame.VIDEOEXPOSE:
+            # the window has to be drawn again
+            self.frozen_selection = None
 
     def key_down(self, key):
         '''
@@ -750,7 +858,13 @@ class InGameScreen(Screen):
         if self.paused:
             if key == pygame.K_RETURN:
                 self.pause_menu.enter(self)
+            elif key == pygame.K_DOWN or key == pygame.K_s:
+                self.pause_menu.select_next()
+            elif key == pygame.K_UP or key == pygame.K_w:
+                self.pause_menu.select_prev()
         else:
+            if self.recording != None:
+                self.recording.key_down(key)
             self.game.key_down(key)
     
     def key_up(self, key):
@@ -758,14 +872,30 @@ class InGameScreen(Screen):
         Notify game of key up
         '''
         if self.paused == False:
+            if self.recording != None:
+                self.recording.key_up(key)
             self.game.key_up(key)
         
     def update_game(self, frametime):
+        if self.recording != None:
+            self.recording.update(frametime)
         self.game.update(frametime)
     
     
     def draw_game(self):
-        self.game.draw(self.display)
+        '''
+        Draw the scene at the view's scale,
+        then the info over it at full size
+        '''
+        view = self.view
+        start = time.time()
+        self.game.draw_scene(view.get_surface(), view.get_scale())
+        view.present()
+        adaptive_scale = self.adaptive_scale
+        if adaptive_scale != None and adaptive_scale.update(time.time() - start) == True:
+            view.set_scale(adaptive_scale.get_scale())
+        
+        self.game.draw_hud(self.display)
     
     
     def update(self, frametime):
@@ -775,16 +905,33 @@ class InGameScreen(Screen):
         if self.paused == False:
             self.update_game(frametime)
     
+    def draw_paused(self):
+        '''
+        Draw the frozen game frame and the pause
+        menu, unless they are already showing
+        '''
+        selection = self.pause_menu.selected_index
+        if self.frozen_frame == None:
+            self.freeze_frame()
+        elif selection == self.frozen_selection:
+            return
+        self.frozen_selection = selection
+        
+        self.display.blit(self.frozen_frame, (0,0))
+        self.pause_menu.draw(self.display)
+        pygame.display.flip()
+        
     def draw(self):
         '''
         Draw game and pause menu
         if its open.
         '''
+        if self.paused == True:
+            self.draw_paused()
+            return
+        
         Screen.draw(self)
         self.draw_game()
-        if self.paused == True:
-            self.pause_menu.draw(self.display)
-            
         pygame.display.flip()
         
     def show_hiscores(self):
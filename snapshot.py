@@ -0,0 +1,582 @@
+#
+# snapshot.py - save and restore the whole Game world
+#
+# Space Travel
+#     Copyright (C) 2014  Eric Eveleigh
+#
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU General Public License as published by
+#     the Free Software Foundation, either version 3 of the License, or
+#     (at your option) any later version.
+#
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU General Public License for more details.
+#
+#     You should have received a copy of the GNU General Public License
+#     along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+# imports
+import random
+import struct
+import sys
+import time
+
+from vector import Vector2D
+
+# the game modules load images and sounds when they are
+# imported, so running this file needs pygame set up first
+if __name__=="__main__":
+    import headless
+    headless.init()
+
+import entity
+import game
+import physics
+
+SNAPSHOT_MAGIC = 'STSN'
+SNAPSHOT_VERSION = 8
+
+'''
+A snapshot is a header followed by fixed layout records:
+    game, rng, star rng, one star per star, player,
+    one entity per entity in Game.entity_list,
+    one explosion per explosion effect,
+    one shot per shot in Game.shots,
+    one spawn per spawn held back by the spawner
+Entity records are followed by an extension record for
+the types which have extra state. SpriteActors are left
+out; they are only decorations.
+'''
+# magic, version
+SNAPSHOT_HEADER = struct.Struct('<4sH')
+# distance travelled, distance, spawn timer, tick accumulator,
+# shooting, game over,
+# difficulty, mode, seed, player explosion id,
+# number of entities, number of stars,
+# number of explosions, next explosion id,
+# number of shots, next shot id, quality level,
+# number of spawns held back, spawns deferred, spawns dropped
+SNAPSHOT_GAME = struct.Struct('<ddddBBBBIiIHIIIIBHII')
+# random module and StarField random state:
+# version, 624 words + position, gauss_next
+SNAPSHOT_RNG = struct.Struct('<B625IBd')
+# position, velocity, size, color
+SNAPSHOT_STAR = struct.Struct('<dddddBBB')
+# type, flags, hp,
+# position, velocity, acceleration, force,
+# orientation, angular velocity, angular acceleration, torque, last dt,
+# bounding box min, max,
+# current frame, frame time, frame timer, animation loops, animation loop
+SNAPSHOT_ENTITY = struct.Struct('<BBd' + 'dddddddd' + 'ddddd' + 'dddd' + 'HddHH')
+# regens left, invulnerable time, invulnerable flash time, points,
+# shot time, shot damage, shot speed, shot timer, shield time, shield timer,
+# turn speed, thrust, weapon upgrades, flags
+SNAPSHOT_PLAYER = struct.Struct('<hddi' + 'dddddddd' + 'HB')
+# damage
+SNAPSHOT_SHOT = struct.Struct('<d')
+# position, velocity, age, frame, id
+SNAPSHOT_EFFECT = struct.Struct('<dddddHI')
+# position, velocity, lifetime, damage, angle, id;
+# every shot belongs to the player
+SNAPSHOT_PROJECTILE = struct.Struct('<ddddddHI')
+# spawn kind, periods waited
+SNAPSHOT_SPAWN = struct.Struct('<BH')
+
+# entity types
+SNAPSHOT_TYPE_PLAYER = 0 # refers to Game.player, which is stored once
+SNAPSHOT_TYPE_SHOT = 1
+SNAPSHOT_TYPE_ASTEROID = 2
+SNAPSHOT_TYPE_HOLE = 3
+SNAPSHOT_TYPE_SHIELD = 4
+SNAPSHOT_TYPE_WEAPON = 5
+
+# entity flags
+SNAPSHOT_ALIVE = 1
+SNAPSHOT_COLLIDABLE = 2
+SNAPSHOT_ANIMATE = 4
+
+# player flags
+SNAPSHOT_TURN_CW = 1
+SNAPSHOT_TURN_CCW = 2
+SNAPSHOT_VISIBLE = 4
+SNAPSHOT_ACCELERATING = 8
+
+ENTITY_TYPES = {entity.Player: SNAPSHOT_TYPE_PLAYER,
+                entity.Player.Shot: SNAPSHOT_TYPE_SHOT,
+                entity.Asteroid: SNAPSHOT_TYPE_ASTEROID,
+                entity.Hole: SNAPSHOT_TYPE_HOLE,
+                entity.ShieldPowerup: SNAPSHOT_TYPE_SHIELD,
+                entity.WeaponPowerup: SNAPSHOT_TYPE_WEAPON}
+
+class SnapshotError(Exception):
+    '''
+    Raised for data that is not a snapshot
+    this version can restore
+    '''
+    pass
+
+def create_prototype(type_code, player):
+    '''
+    Build one Entity of a type the
+    slow way. Restored ones are copies of it.
+    '''
+    zero = Vector2D()
+    if type_code == SNAPSHOT_TYPE_SHOT:
+        return entity.Player.Shot(player, 0, zero, zero, 0.0)
+    elif type_code == SNAPSHOT_TYPE_ASTEROID:
+        return entity.Asteroid(0, zero, zero, 0.0, 0.0)
+    elif type_code == SNAPSHOT_TYPE_HOLE:
+        return entity.Hole(zero, zero, 0.0, 0.0)
+    elif type_code == SNAPSHOT_TYPE_SHIELD:
+        return entity.ShieldPowerup(zero, zero, 0.0, 0.0)
+    elif type_code == SNAPSHOT_TYPE_WEAPON:
+        return entity.WeaponPowerup(zero, zero, 0.0, 0.0)
+    raise SnapshotError("unknown type %d" % type_code)
+
+# prototypes share their images and geometry with
+# the entities copied from them
+prototypes = {}
+
+def get_prototype(type_code, player):
+    proto = prototypes.get(type_code)
+    if proto == None:
+        # restoring should not make any noise
+        sound_enabled = entity.sound_enabled
+        entity.set_sound_enabled(False)
+        try:
+            proto = create_prototype(type_code, player)
+        finally:
+            entity.set_sound_enabled(sound_enabled)
+        prototypes[type_code] = proto
+    return proto
+
+def copy_prototype(proto, ent=None):
+    '''
+    Entity sharing the constant state of proto,
+    with its own uid and vectors to be filled in.
+    ent, an Entity of the same type no longer in
+    the game, is reused with its vectors if given,
+    like Object2D.reset_state does.
+    '''
+    if ent == None:
+        ent = proto.__class__.__new__(proto.__class__)
+        ent.__dict__.update(proto.__dict__)
+        ent.position = Vector2D()
+        ent.velocity = Vector2D()
+        ent.acceleration = Vector2D()
+        ent.force = Vector2D()
+        ent.bb_min = Vector2D()
+        ent.bb_max = Vector2D()
+    else:
+        position = ent.position
+        velocity = ent.velocity
+        acceleration = ent.acceleration
+        force = ent.force
+        bb_min = ent.bb_min
+        bb_max = ent.bb_max
+        geometry = (ent.orientation, ent.last_dt, ent.phys_geom_oriented, ent.oriented_faces)
+        ent.__dict__.update(proto.__dict__)
+        ent.position = position
+        ent.velocity = velocity
+        ent.acceleration = acceleration
+        ent.force = force
+        ent.bb_min = bb_min
+        ent.bb_max = bb_max
+        # kept in case the restored orientation is the same
+        ent.orientation, ent.last_dt, ent.phys_geom_oriented, ent.oriented_faces = geometry
+    # the pair cache and the contact solver
+    # tell objects apart by their uids
+    ent.uid = physics.new_uid()
+    ent.collided_with = []
+    return ent
+
+def pack_entity(type_code, ent):
+    flags = 0
+    if ent.alive == True:
+        flags |= SNAPSHOT_ALIVE
+    if ent.collidable == True:
+        flags |= SNAPSHOT_COLLIDABLE
+    if ent.animate == True:
+        flags |= SNAPSHOT_ANIMATE
+
+    position = ent.position
+    velocity = ent.velocity
+    acceleration = ent.acceleration
+    force = ent.force
+    return SNAPSHOT_ENTITY.pack(type_code, flags, ent.hp,
+                                position.x, position.y,
+                                velocity.x, velocity.y,
+                                acceleration.x, acceleration.y,
+                                force.x, force.y,
+                                ent.orientation, ent.ang_velocity,
+                                ent.ang_accel, ent.torque, ent.last_dt,
+                                ent.bb_min.x, ent.bb_min.y,
+                                ent.bb_max.x, ent.bb_max.y,
+                                ent.curframe, ent.frame_time, ent.frametimer,
+                                ent.anim_num_loops, ent.anim_loop_num)
+
+def unpack_entity(ent, record):
+    # the orientation ent's geometry is turned to, if it is
+    if ent.last_dt != 0.0:
+        oriented = ent.orientation
+    else:
+        oriented = None
+
+    (type_code, flags, ent.hp,
+     px, py, vx, vy, ax, ay, fx, fy,
+     ent.orientation, ent.ang_velocity, ent.ang_accel, ent.torque, ent.last_dt,
+     minx, miny, maxx, maxy,
+     ent.curframe, ent.frame_time, ent.frametimer,
+     ent.anim_num_loops, ent.anim_loop_num) = record
+
+    ent.alive = (flags & SNAPSHOT_ALIVE) != 0
+    ent.collidable = (flags & SNAPSHOT_COLLIDABLE) != 0
+    ent.animate = (flags & SNAPSHOT_ANIMATE) != 0
+
+    ent.position.x = px
+    ent.position.y = py
+    ent.velocity.x = vx
+    ent.velocity.y = vy
+    ent.acceleration.x = ax
+    ent.acceleration.y = ay
+    ent.force.x = fx
+    ent.force.y = fy
+    ent.bb_min.x = minx
+    ent.bb_min.y = miny
+    ent.bb_max.x = maxx
+    ent.bb_max.y = maxy
+
+    # entities that were never updated still have
+    # their unrotated geometry
+    if ent.last_dt != 0.0:
+        if ent.orientation != oriented:
+            ent.orient_geometry()
+    else:
+        ent.phys_geom_oriented = list(ent.phys_geom)
+    ent.collided_with = []
+
+def pack_player(player):
+    flags = 0
+    if player.turn_cw == True:
+        flags |= SNAPSHOT_TURN_CW
+    if player.turn_ccw == True:
+        flags |= SNAPSHOT_TURN_CCW
+    if player.visible == True:
+        flags |= SNAPSHOT_VISIBLE
+    if player.accelerating == True:
+        flags |= SNAPSHOT_ACCELERATING
+
+    return SNAPSHOT_PLAYER.pack(player.regens_left, player.invuln_time,
+                                player.invuln_flash_time, player.points,
+                                player.shot_time, player.shot_damage,
+                                player.shot_speed, player.shot_timer,
+                                player.shield_time, player.shield_timer,
+                                player.turn_speed, player.thrust,
+                                player.weapon_upgrades, flags)
+
+def unpack_player(player, record):
+    (player.regens_left, player.invuln_time, player.invuln_flash_time,
+     player.points, player.shot_time, player.shot_damage, player.shot_speed,
+     player.shot_timer, player.shield_time, player.shield_timer,
+     player.turn_speed, player.thrust, player.weapon_upgrades, flags) = record
+
+    player.turn_cw = (flags & SNAPSHOT_TURN_CW) != 0
+    player.turn_ccw = (flags & SNAPSHOT_TURN_CCW) != 0
+    player.visible = (flags & SNAPSHOT_VISIBLE) != 0
+    player.accelerating = (flags & SNAPSHOT_ACCELERATING) != 0
+
+def pack_rng(state):
+    rng_version, rng_state, gauss_next = state
+    has_gauss = gauss_next != None
+    if has_gauss == False:
+        gauss_next = 0.0
+    return SNAPSHOT_RNG.pack(*((rng_version,) + rng_state + (has_gauss, gauss_next)))
+
+def unpack_rng(record):
+    gauss_next = None
+    if record[-2] != 0:
+        gauss_next = record[-1]
+    return (record[0], record[1:-2], gauss_next)
+
+def save(game_):
+    '''
+    Pack the state of a Game into a string
+    '''
+    entity_list = game_.entity_list
+    stars = game_.star_field.stars
+    player = game_.player
+    settings = game_.settings
+    explosions = game_.explosions
+    shots = game_.shots
+
+    explosion_id = -1
+    if game_.player_explosion != None:
+        explosion_id = game_.player_explosion
+
+    data = [SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION),
+            SNAPSHOT_GAME.pack(game_.distance_travelled, game_.distance,
+                               game_.spawn_timer, game_.tick_accumulator,
+                               game_.shooting,
+                               game_.game_over, settings.difficulty,
+                               settings.mode, game_.seed, explosion_id,
+                               len(entity_list), len(stars),
+                               len(explosions), explosions.next_id,
+                               len(shots), shots.next_id,
+                               game_.quality_level, len(game_.deferred_spawns),
+                               game_.spawns_deferred, game_.spawns_dropped)]
+
+    data.append(pack_rng(random.getstate()))
+    data.append(pack_rng(game_.star_field.random.getstate()))
+
+    for star in stars:
+        color = star.color
+        data.append(SNAPSHOT_STAR.pack(star.position.x, star.position.y,
+                                       star.velocity.x, star.velocity.y,
+                                       star.size,
+                                       color[0], color[1], color[2]))
+
+    data.append(pack_entity(SNAPSHOT_TYPE_PLAYER, player))
+    data.append(pack_player(player))
+
+    types = ENTITY_TYPES
+    for ent in entity_list:
+        type_code = types[ent.__class__]
+        if type_code == SNAPSHOT_TYPE_PLAYER:
+            # just a reference, the player is stored above
+            data.append(chr(type_code))
+            continue
+        data.append(pack_entity(type_code, ent))
+        if type_code == SNAPSHOT_TYPE_SHOT:
+            data.append(SNAPSHOT_SHOT.pack(ent.damage))
+
+    pack = SNAPSHOT_EFFECT.pack
+    for record in zip(explosions.x, explosions.y, explosions.vx, explosions.vy,
+                      explosions.age, explosions.frame, explosions.ids):
+        data.append(pack(*record))
+
+    pack = SNAPSHOT_PROJECTILE.pack
+    for record in zip(shots.x, shots.y, shots.vx, shots.vy, shots.lifetime,
+                      shots.damage, shots.angle, shots.ids):
+        data.append(pack(*record))
+
+    pack = SNAPSHOT_SPAWN.pack
+    for kind, periods in game_.deferred_spawns:
+        data.append(pack(kind, periods))
+
+    return ''.join(data)
+
+def restore(game_, data):
+    '''
+    Put a Game back into the state
+    packed by save
+    '''
+    try:
+        magic, version = SNAPSHOT_HEADER.unpack_from(data, 0)
+    except struct.error:
+        raise SnapshotError("snapshot is truncated")
+    if magic != SNAPSHOT_MAGIC:
+        raise SnapshotError("not a snapshot")
+    if version != SNAPSHOT_VERSION:
+        raise SnapshotError("unsupported snapshot version %d" % version)
+
+    try:
+        restore_records(game_, data, SNAPSHOT_HEADER.size)
+    except struct.error:
+        raise SnapshotError("snapshot is truncated")
+
+def restore_records(game_, data, offset):
+    (game_.distance_travelled, game_.distance, game_.spawn_timer,
+     game_.tick_accumulator, shooting,
+     game_over, difficulty, mode, game_.seed, explosion_id,
+     num_entities, num_stars, num_explosions, next_explosion_id,
+     num_shots, next_shot_id, quality_level, num_spawns,
+     game_.spawns_deferred, game_.spawns_dropped) = SNAPSHOT_GAME.unpack_from(data, offset)
+    offset += SNAPSHOT_GAME.size
+    game_.shooting = shooting != 0
+    game_.set_settings({'difficulty': difficulty, 'mode': mode})
+
+    random.setstate(unpack_rng(SNAPSHOT_RNG.unpack_from(data, offset)))
+    offset += SNAPSHOT_RNG.size
+    star_field = game_.star_field
+    star_field.random.setstate(unpack_rng(SNAPSHOT_RNG.unpack_from(data, offset)))
+    offset += SNAPSHOT_RNG.size
+
+    stars = []
+    for i in xrange(num_stars):
+        px, py, vx, vy, size, r, g, b = SNAPSHOT_STAR.unpack_from(data, offset)
+        offset += SNAPSHOT_STAR.size
+        star = game.StarField.Star()
+        star.position.x = px
+        star.position.y = py
+        star.velocity.x = vx
+        star.velocity.y = vy
+        star.size = size
+        star.color = (r, g, b)
+        stars.append(star)
+    star_field.stars = stars
+    star_field.num_stars = num_stars
+    game_.set_quality_level(quality_level)
+
+    player = game_.player
+    unpack_entity(player, SNAPSHOT_ENTITY.unpack_from(data, offset))
+    offset += SNAPSHOT_ENTITY.size
+    unpack_player(player, SNAPSHOT_PLAYER.unpack_from(data, offset))
+    offset += SNAPSHOT_PLAYER.size
+
+    # the Entitys in the game now are reused
+    # for restored ones of the same type
+    unused = {}
+    types = ENTITY_TYPES
+    for ent in game_.entity_list:
+        if ent is not player:
+            unused.setdefault(types[ent.__class__], []).append(ent)
+    # taken from the end, in the order they were in,
+    # so restoring the state the game is in keeps
+    # each Entity's turned geometry
+    for reusable in unused.values():
+        reusable.reverse()
+
+    entity_list = [None]*num_entities
+    unpack_from = SNAPSHOT_ENTITY.unpack_from
+    entity_size = SNAPSHOT_ENTITY.size
+    for i in xrange(num_entities):
+        type_code = ord(data[offset])
+        if type_code == SNAPSHOT_TYPE_PLAYER:
+            entity_list[i] = player
+            offset += 1
+            continue
+
+        reusable = unused.get(type_code)
+        if reusable != None and len(reusable) > 0:
+            ent = copy_prototype(get_prototype(type_code, player), reusable.pop())
+        else:
+            ent = copy_prototype(get_prototype(type_code, player))
+        unpack_entity(ent, unpack_from(data, offset))
+        offset += entity_size
+        if type_code == SNAPSHOT_TYPE_SHOT:
+            ent.damage = SNAPSHOT_SHOT.unpack_from(data, offset)[0]
+            ent.parent = player
+            offset += SNAPSHOT_SHOT.size
+        entity_list[i] = ent
+    game_.entity_list = entity_list
+
+    # SpriteActors are only to be looked at and
+    # don't change how the game plays out, so
+    # they are not stored
+    game_.actor_list = []
+
+    explosions = game_.explosions
+    explosions.clear()
+    unpack_from = SNAPSHOT_EFFECT.unpack_from
+    for i in xrange(num_explosions):
+        x, y, vx, vy, age, frame, effect_id = unpack_from(data, offset)
+        offset += SNAPSHOT_EFFECT.size
+        explosions.x.append(x)
+        explosions.y.append(y)
+        explosions.vx.append(vx)
+        explosions.vy.append(vy)
+        explosions.age.append(age)
+        explosions.frame.append(frame)
+        explosions.ids.append(effect_id)
+    explosions.next_id = next_explosion_id
+
+    shots = game_.shots
+    shots.clear()
+    unpack_from = SNAPSHOT_PROJECTILE.unpack_from
+    for i in xrange(num_shots):
+        x, y, vx, vy, lifetime, damage, angle, shot_id = unpack_from(data, offset)
+        offset += SNAPSHOT_PROJECTILE.size
+        shots.x.append(x)
+        shots.y.append(y)
+        shots.vx.append(vx)
+        shots.vy.append(vy)
+        shots.lifetime.append(lifetime)
+        shots.damage.append(damage)
+        shots.owner.append(player)
+        shots.angle.append(angle)
+        shots.ids.append(shot_id)
+    shots.next_id = next_shot_id
+
+    deferred_spawns = []
+    for i in xrange(num_spawns):
+        kind, periods = SNAPSHOT_SPAWN.unpack_from(data, offset)
+        offset += SNAPSHOT_SPAWN.size
+        deferred_spawns.append([kind, periods])
+    game_.deferred_spawns = deferred_spawns
+
+    game_.player_explosion = None
+    if explosion_id >= 0:
+        game_.player_explosion = explosion_id
+
+    game_.update_distance_display()
+    game_.update_points_display()
+    game_.update_regens_display()
+    game_.update_shield_display()
+    game_.update_weapon_display()
+    game_.hp_bar.set_value(player.get_hp())
+
+    game_.game_over = False
+    if game_over != 0:
+        game_.game_is_over()
+
+def main(argv):
+    '''
+    time save and restore of a large world
+    '''
+    import headless
+
+    num_entities = 1000
+    if len(argv) > 1:
+        num_entities = int(argv[1])
+
+    game_ = headless.create_game(game.GAME_DIFF_HARD, game.GAME_MODE_ENDURANCE, 1)
+    rect = game_.screen_rect
+    while len(game_.entity_list) < num_entities:
+        game_.spawn_asteroid()
+        ent = game_.entity_list[-1]
+        ent.set_position(Vector2D(random.random()*rect.width, random.random()*rect.height))
+        # rotate the geometry without running the collisions
+        ent.update(1.0/60.0)
+
+    repeats = 20
+    start = time.time()
+    for i in xrange(repeats):
+        data = save(game_)
+    save_time = (time.time() - start)/repeats
+
+    # back to the state the game is in, as after a
+    # frame that was thrown away
+    start = time.time()
+    for i in xrange(repeats):
+        restore(game_, data)
+    restore_time = (time.time() - start)/repeats
+
+    # back to an earlier state, after the game moved on
+    rewind_time = 0.0
+    for i in xrange(repeats):
+        for ent in game_.entity_list:
+            ent.update(1.0/60.0)
+        start = time.time()
+        restore(game_, data)
+        rewind_time += time.time() - start
+    rewind_time /= repeats
+
+    # into a new Game, which has nothing to reuse
+    load_time = 0.0
+    for i in xrange(repeats):
+        loaded = headless.create_game(game.GAME_DIFF_HARD, game.GAME_MODE_ENDURANCE, 1)
+        start = time.time()
+        restore(loaded, data)
+        load_time += time.time() - start
+    load_time /= repeats
+
+    print "%d entities, %d bytes: save %.2f ms" % (len(game_.entity_list), len(data), save_time*1000)
+    print "restore %.2f ms, after a step %.2f ms, into a new game %.2f ms" % (
+        restore_time*1000, rewind_time*1000, load_time*1000)
+
+    return 0
+
+if __name__=="__main__":
+    sys.exit(main(sys.argv))
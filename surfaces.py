@@ -0,0 +1,232 @@
+#
+# surfaces.py - images in the quickest format to blit
+#
+# Space Travel
+#     Copyright (C) 2014  Eric Eveleigh
+#
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU General Public License as published by
+#     the Free Software Foundation, either version 3 of the License, or
+#     (at your option) any later version.
+#
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU General Public License for more details.
+#
+#     You should have received a copy of the GNU General Public License
+#     along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+# imports
+import optparse
+import sys
+import time
+
+import pygame
+import pygame.mask
+
+# how a surface is made transparent
+SURFACE_OPAQUE = 'opaque'
+SURFACE_COLORKEY = 'colorkey'
+SURFACE_ALPHA = 'alpha'
+
+# blits timed for each asset in the report
+SURFACE_REPORT_BLITS = 2000
+# the text timed in the report
+SURFACE_REPORT_TEXT = "Distance: 12345"
+
+def choose_mode(surface, colorkey):
+    '''
+    How surface should be made transparent. The
+    colorkey is used if it is given, unless the image
+    has none of it but does have see-through pixels;
+    those keep their alpha. Sprites keep the colorkey
+    even without any of it so that rotating them
+    pads with it.
+    '''
+    width, height = surface.get_size()
+    translucent = False
+    if surface.get_flags() & pygame.SRCALPHA != 0:
+        translucent = pygame.mask.from_surface(surface, 254).count() < width*height
+
+    if colorkey != None:
+        if translucent == True:
+            keyed = pygame.mask.from_threshold(surface, colorkey, (1,1,1,255)).count()
+            if keyed == 0:
+                return SURFACE_ALPHA
+        return SURFACE_COLORKEY
+    if translucent == True:
+        return SURFACE_ALPHA
+    return SURFACE_OPAQUE
+
+def convert(surface, mode, colorkey):
+    '''
+    a copy of surface in the display format for mode
+    '''
+    if mode == SURFACE_ALPHA:
+        result = surface.convert_alpha()
+    else:
+        result = surface.convert()
+        if mode == SURFACE_COLORKEY:
+            result.set_colorkey(colorkey)
+    return result
+
+def encode(surface):
+    '''
+    Run-length encode a see-through surface, which
+    makes blitting it quicker. Reading the pixels
+    decodes it again, so images that are rotated
+    or scaled each frame are left as they are and
+    the copies made from them are encoded.
+    '''
+    colorkey = surface.get_colorkey()
+    if colorkey != None:
+        surface.set_colorkey(colorkey, pygame.RLEACCEL)
+    elif surface.get_flags() & pygame.SRCALPHA != 0:
+        surface.set_alpha(255, pygame.RLEACCEL)
+    return surface
+
+def optimise(surface, colorkey=None, encoded=True):
+    '''
+    surface converted to the quickest format to
+    blit it onto the display; without a colorkey
+    the surface's own is kept
+    '''
+    if colorkey == None:
+        colorkey = surface.get_colorkey()
+    result = convert(surface, choose_mode(surface, colorkey), colorkey)
+    if encoded == True:
+        encode(result)
+    return result
+
+# resized copies of images by (image, scale)
+scaled_images = {}
+
+def get_scaled(surface, scale):
+    '''
+    surface resized by scale, made once and
+    shared like the images loaded; encoded
+    if surface is
+    '''
+    if scale == 1.0:
+        return surface
+    key = (surface, scale)
+    scaled = scaled_images.get(key)
+    if scaled == None:
+        size = (max(int(round(surface.get_width()*scale)), 1),
+                max(int(round(surface.get_height()*scale)), 1))
+        # not smoothed, so the colorkey stays exact at the edges
+        scaled = pygame.transform.scale(surface, size)
+        if surface.get_flags() & (pygame.RLEACCEL | pygame.RLEACCELOK) != 0:
+            encode(scaled)
+        scaled_images[key] = scaled
+    return scaled
+
+# the images loaded so far by (filename, colorkey, encoded),
+# each with the mode it was converted for
+images = {}
+
+def load_image(filename, colorkey=None, encoded=True):
+    '''
+    Load an image file optimised for the display.
+    Every caller shares the one copy of each image,
+    so it must not be drawn on.
+    '''
+    key = (filename, colorkey, encoded)
+    entry = images.get(key)
+    if entry == None:
+        surface = pygame.image.load(filename)
+        mode = choose_mode(surface, colorkey)
+        entry = (optimise(surface, colorkey, encoded), mode)
+        images[key] = entry
+    return entry[0]
+
+def describe(surface):
+    '''
+    the format of surface in a few words
+    '''
+    words = ['%dx%d' % surface.get_size(), '%dbpp' % surface.get_bitsize()]
+    flags = surface.get_flags()
+    if flags & pygame.SRCALPHA != 0:
+        words.append('SRCALPHA')
+    if surface.get_colorkey() != None:
+        words.append('COLORKEY')
+    # RLEACCEL is only set once the first blit has encoded it
+    if flags & (pygame.RLEACCEL | pygame.RLEACCELOK) != 0:
+        words.append('RLEACCEL')
+    return ' '.join(words)
+
+def time_blits(surface, target, blits):
+    '''
+    microseconds a blit of surface onto target takes
+    '''
+    width = max(target.get_width() - surface.get_width(), 1)
+    height = max(target.get_height() - surface.get_height(), 1)
+    # the first blit encodes run-length surfaces
+    target.blit(surface, (0, 0))
+    start = time.time()
+    for i in xrange(blits):
+        target.blit(surface, ((i*37) % width, (i*23) % height))
+    return (time.time() - start)*1000000/blits
+
+def main(argv):
+    '''
+    Report the format each image the game loads is
+    converted to, and how fast it blits as drawn
+    compared with a plain convert and set_colorkey.
+    Images that are rotated before they are drawn
+    are timed as an encoded copy, like the rotated
+    ones.
+    '''
+    parser = optparse.OptionParser(usage="usage: surfaces.py [options]")
+    parser.add_option('-n', '--blits', type='int', default=SURFACE_REPORT_BLITS,
+                      help="blits timed for each image [%default]")
+    options, args = parser.parse_args(argv[1:])
+
+    import headless
+    headless.init()
+    import entity
+    import game
+    from vector import Vector2D
+    # the game's images are kept by the imported
+    # module, not this one when run as a script
+    import surfaces
+
+    # load every sprite image
+    headless.create_game(game.GAME_DIFF_MEDIUM, game.GAME_MODE_NORMAL, 1)
+    zero = Vector2D()
+    for kind in (entity.Asteroid, entity.Hole, entity.ShieldPowerup,
+                 entity.WeaponPowerup):
+        if kind == entity.Asteroid:
+            kind(0, zero, zero, 0.0, 0.0)
+        else:
+            kind(zero, zero, 0.0, 0.0)
+
+    target = pygame.Surface((headless.DISPLAY_WIDTH, headless.DISPLAY_HEIGHT)).convert()
+    rows = []
+    for filename, colorkey, encoded in sorted(surfaces.images.keys()):
+        surface, mode = surfaces.images[(filename, colorkey, encoded)]
+        plain = pygame.image.load(filename).convert()
+        if colorkey != None:
+            plain.set_colorkey(colorkey)
+        name = filename
+        if encoded == False:
+            name += ' (rot)'
+            surface = encode(surface.copy())
+        rows.append((name, mode, describe(surface), plain, surface))
+
+    import screen
+    font = pygame.font.Font(None, 40)
+    plain = font.render(SURFACE_REPORT_TEXT, True, (255,255,255)).convert_alpha()
+    text = screen.RenderedText(font, SURFACE_REPORT_TEXT, (255,255,255)).surface
+    rows.append(('text', SURFACE_ALPHA, describe(text), plain, text))
+
+    print "%-24s %-9s %-40s %9s %9s" % ('image', 'mode', 'format', 'plain us', 'now us')
+    for name, mode, format, plain, surface in rows:
+        print "%-24s %-9s %-40s %9.2f %9.2f" % (name, mode, format,
+                                                time_blits(plain, target, options.blits),
+                                                time_blits(surface, target, options.blits))
+    return 0
+
+if __name__=="__main__":
+    sys.exit(main(sys.argv))